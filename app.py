@@ -1,12 +1,45 @@
+import time
+# startup report: time spent in each phase of importing this module (see /startup-stats)
+STARTUP = {}
+_startup_clock = time.perf_counter()
+
 import dash
-from dash import Dash, html, Input, Output, callback, no_update, State
+import flask
+from dash import Dash, html, dcc, Input, Output, Patch, callback, no_update, State, ALL
 from dash_iconify import DashIconify
 import dash_mantine_components as dmc
 import dash_ag_grid as dag
 import sqlite3
-from pathlib import Path
-import pandas as pd
-import re
+import base64
+import io
+import os
+import tempfile
+import uuid
+import db
+import db_objects
+import edit_journal
+import indexes
+import jobs
+import payroll
+import reports
+import row_model
+import schema
+import search
+import sql_loader
+import table_io
+import tracing
+import wire
+from table_cache import cache as table_cache
+# pandas is imported on first use (read_table), it is the slowest import and not needed to serve the page
+
+# Record the time since the previous mark as a startup phase
+def _startup_mark(phase: str):
+    global _startup_clock
+    now = time.perf_counter()
+    STARTUP[phase] = round((now - _startup_clock) * 1000, 1)
+    _startup_clock = now
+
+_startup_mark("imports_ms")
 
 '''
 -- NOTES REGARDING SQLITE3 -- :
@@ -17,58 +50,299 @@ import re
 2. cur = conn.cursor()
 - Creates a Cursor object bound to that Connection.
 - Use cur.execute(...) to run SQL.
+
+3. The app itself does not call sqlite3.connect directly: connections come from db.pool
+- with db.pool.read() as conn: ...   (pooled read connection)
+- with db.pool.write() as conn: ...  (the single writer, committed on exit)
+- Every pooled connection has WAL, foreign keys and the cache pragmas applied (see db.py).
 '''
 
 # Function to run SQL file and return errors if any
-def run_sql_file(path: str): # path is the specified sql file
-    p = Path(path)
-    if not p.exists():
-        return [f"SQL file not found: {path}"]
-    text = p.read_text(encoding="utf-8")
-    # split into statements by semicolon
-    parts = [s.strip() for s in re.split(r";\s*(?=\n|$)", text) if s.strip()] # split by semicolon followed by newline or end of string
-    errors = [] # to collect errors
-    conn = sqlite3.connect("local.db")
-    cur = conn.cursor()
-    for i, stmt in enumerate(parts, start=1):
+# The whole file runs in one transaction with same-shape INSERTs batched (see sql_loader.py)
+def run_sql_file(path: str, **kwargs): # path is the specified sql file
+    errors, _ = sql_loader.load_sql_file(path, **kwargs)
+    return errors
+
+# Rows applied per executemany call when committing a grid diff
+COMMIT_BATCH_SIZE = 500
+
+# Primary key column(s) of a table, in declared order (from the schema cache)
+def get_primary_key(table_name: str):
+    table = schema.cache.table(table_name)
+    return [k for k in table.pk if k != "rowid"] if table is not None else []
+
+# Row key of a row's primary key values as the grid shows them (whole floats like 4506.0 read as 4506)
+def grid_row_key(values):
+    return edit_journal.row_key(int(v) if isinstance(v, float) and v.is_integer() else v for v in values)
+
+# Compare a stored value with the value coming back from the grid (edited cells come back as strings)
+def _same_value(a, b):
+    if a == b:
+        return True
+    if a is None or b is None:
+        return False
+    return str(a) == str(b)
+
+# Run one batch with executemany; if it fails, replay row by row to report each failing row
+# Returns the number of rows applied
+def _apply_batch(cur, sql: str, params: list, label: str, errors: list):
+    if not params:
+        return 0
+    cur.execute("SAVEPOINT commit_batch;")
+    try:
+        cur.executemany(sql, params)
+        cur.execute("RELEASE commit_batch;")
+        return len(params)
+    except Exception:
+        cur.execute("ROLLBACK TO commit_batch;")
+    applied = 0
+    for vals in params:
         try:
-            # ensure trailing semicolon for executescript
-            cur.executescript(stmt + ";") # execute line by line from specified sql file (that was split into statements)
+            cur.execute(sql, vals)
+            applied += 1
         except Exception as e:
-            errors.append(f"Stmt #{i} error: {e} -- preview: {stmt[:200]!r}")
-            continue
-    conn.commit()
-    conn.close()
-    return errors
+            errors.append(f"{label} {vals!r}: {e}")
+    cur.execute("RELEASE commit_batch;")
+    return applied
+
+# Commit grid rows to a table by applying only the insert/update/delete delta against what is stored
+def commit_table_diff(table_name: str, rows: list, pool: db.ConnectionPool = db.pool, progress=None,
+                      loaded_keys: list = None):
+    """
+    Diff the grid's rowData against the stored rows of table_name, keyed on the
+    table's primary key, and apply only the changes in a single transaction.
+
+    loaded_keys are the row keys (grid_row_key) the grid was loaded with. Only
+    those rows are deleted when they are missing from the grid, so rows added
+    since by someone else (another session, Import, write-through) are kept;
+    without loaded_keys nothing is deleted. A loaded row that was deleted by
+    someone else is reported instead of inserted again. Updates are last
+    writer wins: a row changed by someone else since the grid was loaded is
+    overwritten with the grid's values. Only the stored rows with a key in
+    the grid or in loaded_keys are read.
+
+    Rows added with Add Row (NEW_ROW_FIELD set) get the next numbers of a
+    single numeric primary key, written into their row dicts so the caller
+    can send them back to the grid. Any other row without a primary key is
+    reported and not saved.
+
+    Returns (errors, counts) where counts holds the number of inserted,
+    updated and deleted rows. progress, if given, is called as
+    progress(rows applied, rows to apply) after every batch.
+    """
+    errors = []
+    counts = {"inserted": 0, "updated": 0, "deleted": 0}
+    cols = list(rows[0].keys()) if rows else []
+    with pool.write() as conn:
+        try:
+            cur = conn.cursor()
+            pk = get_primary_key(table_name)
+            if not pk or any(k not in cols for k in pk):
+                errors.append(f"{table_name} has no usable primary key in the grid; nothing committed")
+                return errors, counts
+
+            stored_cols = schema.cache.table(table_name).column_names
+            cols = [c for c in cols if c in stored_cols]
+            col_list_sql = ", ".join([f'"{c}"' for c in cols])
+
+            # One explicit transaction: the stored rows are read in it and batches use savepoints inside it
+            cur.execute("BEGIN;")
+            # Rows added in the grid (Add Row) have no key yet: number them after the largest stored number
+            # (numbers sort before text, so `< ''` skips text keys)
+            keyless = [r for r in rows if any(r.get(k) is None or r.get(k) == "" for k in pk)]
+            numbered = len(pk) == 1 and schema.cache.table(table_name).columns[pk[0]].kind == "number"
+            added = [r for r in keyless if numbered and r.get(NEW_ROW_FIELD)]
+            if added:
+                (last,) = cur.execute(f'SELECT max("{pk[0]}") FROM {table_name} WHERE "{pk[0]}" < \'\';').fetchone()
+                for n, r in enumerate(added, start=int(last or 0) + 1):
+                    r[pk[0]] = n
+            if len(added) < len(keyless):
+                errors.append(f"{len(keyless) - len(added)} row(s) of {table_name} have no primary key; "
+                              f"fill in {', '.join(pk)} to save them")
+                skipped = {id(r) for r in keyless} - {id(r) for r in added}
+                rows = [r for r in rows if id(r) not in skipped]
+
+            # Stored rows for the keys in the grid and the keys it was loaded with (not the whole table)
+            grid_keys = [tuple(r.get(k) for k in pk) for r in rows]
+            grid_texts = [grid_row_key(key) for key in grid_keys]
+            wanted = dict(zip(grid_texts, grid_keys))
+            for text in loaded_keys or []:
+                # loaded keys are the key values joined with "|" (see grid_row_key)
+                wanted.setdefault(text, tuple(text.split("|", len(pk) - 1)))
+            key_cols = [f"k{i}" for i in range(len(pk))]
+            cur.execute(f"CREATE TEMP TABLE commit_keys ({', '.join(key_cols)});")
+            cur.executemany(f"INSERT INTO temp.commit_keys VALUES ({', '.join(['?'] * len(pk))});",
+                            [key for key in wanted.values() if len(key) == len(pk)])
+            # the keys take the table's column affinity in the join ('4506' from the grid matches 4506)
+            join_sql = " AND ".join(f't."{k}" = c.{c}' for k, c in zip(pk, key_cols))
+            stored, stored_by_text = {}, {}
+            for rec in cur.execute("SELECT " + ", ".join(f't."{c}"' for c in cols)
+                                   + f" FROM temp.commit_keys c JOIN {table_name} t ON {join_sql};"):
+                rec = dict(zip(cols, rec))
+                key = tuple(rec[k] for k in pk)
+                stored[key] = rec
+                stored_by_text[grid_row_key(key)] = key
+            cur.execute("DROP TABLE temp.commit_keys;")
+
+            # Match grid rows to stored rows (key values may come back from the grid as strings)
+            loaded = set(loaded_keys or [])
+            inserts, updates, seen = [], [], set()
+            for r, key, text in zip(rows, grid_keys, grid_texts):
+                stored_key = stored_by_text.get(text)
+                if stored_key is None:
+                    if text in loaded:
+                        errors.append(f"Row {text} of {table_name} was deleted by someone else "
+                                      f"since the grid was loaded; not saved")
+                    else:
+                        inserts.append(r)
+                    continue
+                if stored_key in seen:
+                    errors.append(f"Duplicate primary key {key!r} in {table_name}")
+                    continue
+                seen.add(stored_key)
+                old = stored[stored_key]
+                if not all(_same_value(old[c], r.get(c)) for c in cols):
+                    updates.append((stored_key, r))
+            # only rows the grid was loaded with can have been removed in it
+            deletes = [key for text, key in stored_by_text.items() if key not in seen and text in loaded]
+
+            pk_where = " AND ".join([f'"{k}" = ?' for k in pk])
+            delete_sql = f"DELETE FROM {table_name} WHERE {pk_where};"
+            set_cols = [c for c in cols if c not in pk]
+            # primary key columns are included in SET so an edited key is written back too
+            set_sql = ", ".join([f'"{c}" = ?' for c in pk + set_cols])
+            update_sql = f"UPDATE {table_name} SET {set_sql} WHERE {pk_where};"
+            placeholders = ", ".join(["?"] * len(cols))
+            insert_sql = f"INSERT INTO {table_name} ({col_list_sql}) VALUES ({placeholders});"
+
+            total = len(deletes) + len(updates) + len(inserts)
+            done = 0
+
+            def report(n):
+                nonlocal done
+                done += n
+                if progress is not None:
+                    progress(done, total)
+
+            # Deletes first so freed keys / unique values can be reused by updates and inserts
+            for i in range(0, len(deletes), COMMIT_BATCH_SIZE):
+                batch = [list(key) for key in deletes[i:i + COMMIT_BATCH_SIZE]]
+                counts["deleted"] += _apply_batch(cur, delete_sql, batch, "Delete", errors)
+                report(len(batch))
+            for i in range(0, len(updates), COMMIT_BATCH_SIZE):
+                batch = [[r.get(c) for c in pk + set_cols] + list(key)
+                         for key, r in updates[i:i + COMMIT_BATCH_SIZE]]
+                counts["updated"] += _apply_batch(cur, update_sql, batch, "Update", errors)
+                report(len(batch))
+            for i in range(0, len(inserts), COMMIT_BATCH_SIZE):
+                batch = [[r.get(c) for c in cols] for r in inserts[i:i + COMMIT_BATCH_SIZE]]
+                counts["inserted"] += _apply_batch(cur, insert_sql, batch, "Insert", errors)
+                report(len(batch))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            errors.append(str(e))
+    return errors, counts
 
 # Initialize database
 def init_database():
-    db_path = Path("local.db")
-    # connecting will create the file if it doesn't exist
-    conn = sqlite3.connect(str(db_path))
-    try:
-        # enable foreign key enforcement
-        conn.execute("PRAGMA foreign_keys = ON;") 
-        conn.commit()
-    finally:
-        conn.close()
+    # opening the writer creates local.db if it doesn't exist and switches it to WAL
+    # (foreign keys and the other pragmas are applied to every pooled connection, see db.py)
+    with db.pool.write():
+        pass
+    if WRITE_THROUGH:
+        edit_journal.ensure_journal()
+    # report summaries, payroll change tracking, search index and foreign key indexes: only checked here,
+    # missing ones are built in a background thread (`python db_objects.py` builds them ahead, see db_objects.py)
+    db_objects.ensure_in_background()
     return None
 
+# Read a whole table from local.db (uncached)
+def read_table(table_name):
+    import pandas as pd
+    with db.pool.read() as conn:
+        with tracing.span("sql", table_name) as span:
+            cur = conn.execute(f"SELECT * FROM {table_name}")
+            rows = cur.fetchall()
+            span.rows = len(rows)
+    with tracing.span("dataframe", table_name):
+        # what pd.read_sql_query does, with the query and the conversion timed separately
+        return pd.DataFrame.from_records(rows, columns=[d[0] for d in cur.description], coerce_float=True)
+
 # Get data from created local.db for a given table name
+# Served from the per-table versioned cache (see table_cache.py); treat the returned DataFrame as read-only
 def get_table_data(table_name):
     try:
-        conn = sqlite3.connect('local.db')
-        df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
-        conn.close()
-        return df
+        return table_cache.get(table_name, read_table)
     except Exception as e:
         print(f"Error fetching data from {table_name}: {e}")
+        import pandas as pd
         return pd.DataFrame()  # Return empty DataFrame on error
 
+# Row model used by the grids:
+# "clientSide" ships the whole table in rowData, "infinite" pages rows from SQLite on demand (see row_model.py)
+GRID_ROW_MODEL = os.environ.get("GRID_ROW_MODEL", "clientSide")
+
+# How edited cells reach the database:
+# "commit" keeps edits in the grid until the Commit button, "writethrough" writes every edited cell immediately (see edit_journal.py)
+GRID_EDIT_MODE = os.environ.get("GRID_EDIT_MODE", "commit")
+WRITE_THROUGH = GRID_EDIT_MODE == "writethrough"
+
+# How the grids' rows are sent to the browser:
+# "records" as rowData (one object per row), "columnar" as column arrays rebuilt into rows in the browser (see wire.py)
+GRID_WIRE_FORMAT = os.environ.get("GRID_WIRE_FORMAT", "records")
+COLUMNAR = GRID_WIRE_FORMAT == "columnar"
+
+# Stored dates AG Grid's dateString cells can show and edit
+ISO_DATE_RE = r"\d{4}-\d{2}-\d{2}"
+
+# Field holding a temporary row id for rows added in the grid that have no primary key yet
+NEW_ROW_FIELD = "_new_row"
+
+# AG Grid getRowId expression: the primary key values joined with "|" (the same key edit_journal.row_key builds)
+# Rows without a primary key yet (added with Add Row) use their temporary id instead
+def row_id_getter(pk: list):
+    pk = [k for k in pk if k != "rowid"]
+    if not pk:
+        return None
+    missing = " || ".join(f"params.data.{k} == null" for k in pk)
+    key = " + '|' + ".join(f"String(params.data.{k})" for k in pk)
+    return f"({missing}) ? 'new-' + params.data.{NEW_ROW_FIELD} : {key}"
+
+# Create an infinite-model dag.AgGrid: only column definitions are sent, rows arrive through getRowsRequest
+def make_infinite_grid(table_name: str, grid_id: str = None):
+    table = schema.cache.table(table_name)
+    # Commit is not available (the rows are not all in the browser): cells are only editable when every edit is
+    # written right away (write-through)
+    col_defs = schema.column_defs(table, editable=WRITE_THROUGH, sortable=True) if table is not None else []
+    pk = table.pk if table is not None else []
+    grid_options = {
+        "rowSelection": {"mode": "multiRow"},
+        "cacheBlockSize": row_model.BLOCK_SIZE,
+        "maxBlocksInCache": row_model.MAX_BLOCKS_IN_CACHE,
+    }
+    return dag.AgGrid(
+        id=grid_id,
+        rowModelType="infinite",
+        columnDefs=col_defs,
+        # stable row identity from the primary key (needed for selection across blocks)
+        getRowId=row_id_getter(pk),
+        columnSize="sizeToFit",
+        dashGridOptions=grid_options,
+        style={"height": "350px", "width": "100%"})
+
 # Create dag.AgGrid for a table name (shows empty grid if df is empty)
+# Date columns of a table's DataFrame holding values that are not 'YYYY-MM-DD' (e.g. '25-01-05')
+def non_iso_dates(table, df):
+    dates = [c.name for c in table.columns.values() if c.kind == "date" and c.name in df.columns]
+    return [c for c in dates if not df[c].dropna().astype(str).str.fullmatch(ISO_DATE_RE).all()]
+
 def make_grid(table_name: str, grid_id: str = None):
-    df = get_table_data(table_name)
-    if df is None or (df.empty and df.columns.size == 0):
+    if GRID_ROW_MODEL == "infinite":
+        return make_infinite_grid(table_name, grid_id)
+    table = schema.cache.table(table_name)
+    if table is None:
+        # table does not exist (e.g. after Drop)
         return dag.AgGrid(
             id=grid_id,
             rowData=[],
@@ -77,424 +351,891 @@ def make_grid(table_name: str, grid_id: str = None):
             dashGridOptions={"rowSelection": {"mode": "multiRow"}},
             style={"height": "350px", "width": "100%"}
         )
+    df = get_table_data(table_name)
+    if COLUMNAR:
+        # the rows go into a store next to the grid; a clientside callback (wire.DECODE_JS) fills the grid from it
+        with tracing.span("to_columns", table_name):
+            columns = wire.encode_frame(df)
+        row_data = []
+    else:
+        with tracing.span("to_records", table_name):
+            row_data = df.to_dict("records")
+    with tracing.span("make_grid", table_name):
+        grid = dag.AgGrid(
+            id=grid_id,
+            rowData = row_data,
+            # typed columns and dropdowns for CHECK enumerations come from the schema cache, not from the DataFrame
+            columnDefs=schema.column_defs(table, text_dates=non_iso_dates(table, df)),
+            # rows are identified by primary key (selection, removal and transactions work by id)
+            getRowId=row_id_getter(table.pk),
+            columnSize="sizeToFit",
+            dashGridOptions={"rowSelection": {"mode": "multiRow"}},
+            style={"height": "350px", "width": "100%"})
+    if COLUMNAR:
+        return html.Div([grid, dcc.Store(id=f"{grid_id}-columns", data=columns)])
+    return grid
+
+# Row keys of the rows a grid is loaded with (Commit only deletes these, see commit_table_diff)
+def loaded_row_keys(table_name: str):
+    pk = get_primary_key(table_name)
+    df = get_table_data(table_name)
+    if not pk or any(k not in df.columns for k in pk):
+        return []
+    with tracing.span("loaded_keys", table_name):
+        return [grid_row_key(key) for key in zip(*(df[k].tolist() for k in pk))]
+
+# Contents of a tab panel: the grid and the row keys it was loaded with,
+# plus (write-through mode) the row versions the grid was built with
+def grid_panel(table_name: str, grid_id: str):
+    grid = [make_grid(table_name, grid_id)]
+    if GRID_ROW_MODEL != "infinite":
+        # (Commit is not available with the infinite row model)
+        grid.append(dcc.Store(id=f"{grid_id}-loaded-keys", data=loaded_row_keys(table_name)))
+    if not WRITE_THROUGH:
+        return grid
+    try:
+        with db.pool.read() as conn:
+            versions = edit_journal.row_versions(conn, table_name)
+    except Exception as e:
+        print(f"Error reading row versions of {table_name}: {e}")
+        versions = {}
+    return [*grid, dcc.Store(id=f"{grid_id}-row-versions", data=versions)]
+
+# Initialize database
+conn = init_database()
+_startup_mark("database_ms")
+
+# suppress_callback_exceptions: grids (and their stores) only exist once their tab has been opened
+# Drop / Create / Populate / Commit run as background jobs in their own process (see jobs.py)
+app = Dash(__name__, suppress_callback_exceptions=True, background_callback_manager=jobs.make_manager())
+
+# Tab key -> (table name, grid id, panel id, tab label, tab icon)
+TABLES = {
+    "emp": ("EMPLOYEE", "emp-grid", "emp-panel", "Employee", "mdi:account-outline"),
+    "dep": ("DEPARTMENT", "dep-grid", "dep-panel", "Department", "mingcute:department-line"),
+    "lev": ("LEAVE", "lev-grid", "lev-panel", "Leave", "pepicons-pop:leave"),
+    "p_rec": ("PAYROLL_RECORD", "p_rec-grid", "p_rec-panel", "Payroll Record", "mdi:file-outline"),
+    "p_per": ("PAYROLL_PERIOD", "p_per-grid", "p_per-panel", "Payroll Period", "mingcute:time-line"),
+    "adj": ("ADJUSTMENT", "adj-grid", "adj-panel", "Adjustment", "material-symbols:edit-outline"),
+}
+
+# Tables the app shows (the only ones /export and /import accept)
+TABLE_NAMES = {table for table, _, _, _, _ in TABLES.values()}
+
+# Tab shown when the page loads
+DEFAULT_TAB = "emp"
+
+# Table name -> tab key (search results open the row's tab)
+TABLE_TABS = {table: tab_key for tab_key, (table, _, _, _, _) in TABLES.items()}
+
+# Tab with the Run Payroll button (see payroll.py)
+PAYROLL_TAB = "p_per"
+
+# Tab with the payroll reports (see reports.py)
+REPORTS_TAB = "rpt"
+
+# Contents of the Reports tab: the chosen report in a read-only grid
+def report_panel(report_name: str):
+    try:
+        columns, rows = reports.run(report_name)
+    except Exception as e:
+        # e.g. the tables were dropped
+        print(f"Error running report {report_name}: {e}")
+        columns, rows = [], []
     return dag.AgGrid(
-        id=grid_id,
-        rowData = df.to_dict("records"),
-        columnDefs=[{"headerName": col, "field": col, "editable": True} for col in df.columns],
+        id="report-grid",
+        rowData=rows,
+        columnDefs=[{"headerName": c, "field": c, "sortable": True, "filter": True} for c in columns],
         columnSize="sizeToFit",
-        dashGridOptions={"rowSelection": {"mode": "multiRow"}},
         style={"height": "350px", "width": "100%"})
 
-# Initialize database
-conn = init_database()
+# Largest file the Import button accepts (it is sent through the browser; POST bigger files to /import/<table>.<csv|parquet>)
+IMPORT_MAX_BYTES = 64 * 1024 * 1024
+
+# Row actions of one tab (each tab has its own buttons so a click only involves that tab's grid)
+def table_buttons(tab_key: str):
+    return dmc.Group([
+        dmc.Button("Add Row", id=f"{tab_key}-add-row-button", color="green", variant="light", leftSection=DashIconify(icon="gridicons:add-outline")),
+        dmc.Button("Remove Rows", id=f"{tab_key}-remove-rows-button", color="red", variant="light", leftSection=DashIconify(icon="mdi:minus-circle-outline")),
+        dmc.Button("Commit Changes", id=f"{tab_key}-commit-button", color="blue", variant="light", leftSection=DashIconify(icon="fluent:database-plug-connected-20-filled")),
+        *([dmc.Button("Undo Last Edit", id=f"{tab_key}-undo-button", color="gray", variant="light", leftSection=DashIconify(icon="mdi:undo"))]
+          if WRITE_THROUGH else []),
+        # Import streams the uploaded file into the table; Export streams the table from /export (see table_io.py)
+        dcc.Upload(dmc.Button("Import CSV / Parquet", color="teal", variant="light", leftSection=DashIconify(icon="mdi:file-import-outline")),
+                   id=f"{tab_key}-import-upload", accept=".csv,.parquet", max_size=IMPORT_MAX_BYTES),
+        html.A(dmc.Button("Export CSV", color="teal", variant="subtle", leftSection=DashIconify(icon="mdi:file-export-outline")),
+               href=f"/export/{TABLES[tab_key][0]}.csv"),
+        html.A(dmc.Button("Export Parquet", color="teal", variant="subtle", leftSection=DashIconify(icon="mdi:file-export-outline")),
+               href=f"/export/{TABLES[tab_key][0]}.parquet"),
+        *([dmc.Button("Run Payroll", id="run-payroll-button", color="grape", variant="light", leftSection=DashIconify(icon="mdi:calculator-variant-outline")),
+           dmc.Checkbox(id="payroll-full-run", label="Recompute every record")]
+          if tab_key == PAYROLL_TAB else []),
+    ], gap="md", justify="flex-start", mt="sm") # button group
+
+# Main layout of the app, built for every page load
+# Only the default tab's grid is filled here; the other grids are filled when their tab is first opened (open_tab)
+def serve_layout():
+    # table versions currently rendered in the browser
+    versions = {}
+    default_table, default_grid, _, _, _ = TABLES[DEFAULT_TAB]
+    versions[default_table] = table_cache.version(default_table)
+    default_panel = grid_panel(default_table, default_grid)
 
-app = Dash(__name__)
-
-# Tabs for every table
-tabs_layout = dmc.Tabs(
-    [
-        dmc.TabsList(
-            [
-                dmc.TabsTab("Employee", leftSection=DashIconify(icon="mdi:account-outline"), value="emp"),
-                dmc.TabsTab("Department", leftSection=DashIconify(icon="mingcute:department-line"), value="dep"),
-                dmc.TabsTab("Leave", leftSection=DashIconify(icon="pepicons-pop:leave"), value="lev"),
-                dmc.TabsTab("Payroll Record", leftSection=DashIconify(icon="mdi:file-outline"), value="p_rec"),
-                dmc.TabsTab("Payroll Period", leftSection=DashIconify(icon="mingcute:time-line"), value="p_per"),
-                dmc.TabsTab("Adjustment", leftSection=DashIconify(icon="material-symbols:edit-outline"), value="adj"),
+    # Tabs for every table
+    tabs_layout = dmc.Tabs(
+        [
+            dmc.TabsList(
+                [dmc.TabsTab(label, leftSection=DashIconify(icon=icon), value=tab_key)
+                 for tab_key, (_, _, _, label, icon) in TABLES.items()]
+                + [dmc.TabsTab("Reports", leftSection=DashIconify(icon="mdi:chart-box-outline"), value=REPORTS_TAB)]
+            ),
+            *[dmc.TabsPanel([html.Div(default_panel if tab_key == DEFAULT_TAB else [], id=panel_id), table_buttons(tab_key)], value=tab_key)
+              for tab_key, (table, grid_id, panel_id, _, _) in TABLES.items()],
+            # filled when the tab is opened (show_report)
+            dmc.TabsPanel([
+                dmc.Select(id="report-select", value=next(iter(reports.REPORTS)), allowDeselect=False, mt="sm", w=400,
+                           data=[{"value": name, "label": title} for name, (title, _, _) in reports.REPORTS.items()]),
+                html.Div(id="report-panel"),
+            ], value=REPORTS_TAB),
+        ],
+        id="table-tabs", # keeps track of current table
+        color="red", 
+        orientation="horizontal",
+        variant="default", 
+        value=DEFAULT_TAB
+    )
+    # Buttons
+    drop_button = dmc.Button("Drop", id="drop-button", color="red", variant="outline")
+    create_button = dmc.Button("Create", id="create-button", color="blue", variant="outline")
+    populate_button = dmc.Button("Populate", id="populate-button", color="green", variant="outline")
+    cancel_button = dmc.Button("Cancel Job", id="cancel-job-button", color="gray", variant="outline", disabled=True)
+    profile_button = dmc.Button("Profile Next Action", id="profile-button", color="gray", variant="subtle", leftSection=DashIconify(icon="mdi:speedometer"))
+    profile_link = html.A("Latest profile", href="/profiles/latest", target="_blank")
+
+    # Search box: matches from the full-text index, one page at a time (see search.py)
+    search_box = html.Div([
+        dmc.TextInput(id="search-input", placeholder="Search employees, departments, leave and adjustments",
+                      leftSection=DashIconify(icon="mdi:magnify"), debounce=300, w=480),
+        html.Div(id="search-results"),
+        dmc.Pagination(id="search-page", total=0, value=1, hideWithOnePage=True, size="sm", mt="xs"),
+        dcc.Store(id="search-hits"),    # (table, id) of the results shown
+        dcc.Store(id="search-target"),  # row to show after a result is clicked (show_search_target)
+    ], style={"marginTop": "12px", "marginBottom": "12px"})
+
+    # Notification container (sendNotifications in callback)
+    notification_container = dmc.NotificationContainer(
+        id="notification-container",
+        sendNotifications=[]
+    )
+
+    return dmc.MantineProvider(
+            theme={"colorScheme": "light"}, 
+            children=[
+                html.Div(
+                    children=[
+                        html.H1("LAB 9!"), # header
+                        html.H3("Payroll Database Management Interface"), # sub-header
+                        html.P("Drop all tables then create new ones and populate them",
+                               style={"fontStyle": "italic", "color": "#666666", "marginTop": "0"}),
+                        html.Hr(),
+                        dmc.Group([drop_button, create_button, populate_button, cancel_button, profile_button, profile_link], gap="md", justify="flex-start"), # button group
+                        search_box,
+                        notification_container, 
+                        dcc.Store(id="table-versions", data=versions), # table versions currently rendered in the browser
+                        tabs_layout,        # tabs with tables and their row actions
+                    ],
+                    style={"paddingLeft": "28px", "paddingRight": "28px"} 
+                )
             ]
-        ),
-        dmc.TabsPanel(html.Div(id="emp-panel"), value="emp"),
-        dmc.TabsPanel(html.Div(id="dep-panel"), value="dep"),
-        dmc.TabsPanel(html.Div(id="lev-panel"), value="lev"),
-        dmc.TabsPanel(html.Div(id="p_rec-panel"), value="p_rec"),
-        dmc.TabsPanel(html.Div(id="p_per-panel"), value="p_per"),
-        dmc.TabsPanel(html.Div(id="adj-panel"), value="adj"),
-    ],
-    id="table-tabs", # keeps track of current table
-    color="red", 
-    orientation="horizontal",
-    variant="default", 
-    value="emp"
+    )
+
+app.layout = serve_layout
+
+# Time every Dash callback request and profile the one after "Profile Next Action" (see tracing.py)
+tracing.install(app.server)
+
+# Fill a tab's grid the first time the tab is opened
+@app.callback(
+    *[Output(panel_id, "children", allow_duplicate=True) for _, _, panel_id, _, _ in TABLES.values()],
+    Output("table-versions", "data", allow_duplicate=True),
+    Input("table-tabs", "value"),
+    State("table-versions", "data"),
+    prevent_initial_call=True
 )
-# Buttons
-drop_button = dmc.Button("Drop", id="drop-button", color="red", variant="outline")
-create_button = dmc.Button("Create", id="create-button", color="blue", variant="outline")
-populate_button = dmc.Button("Populate", id="populate-button", color="green", variant="outline")
-
-# Notification container (sendNotifications in callback)
-notification_container = dmc.NotificationContainer(
-    id="notification-container",
-    sendNotifications=[]
+@tracing.traced
+def open_tab(tab_key, client_versions):
+    if tab_key not in TABLES:
+        return no_update
+    table, grid_id, _, _, _ = TABLES[tab_key]
+    if table in (client_versions or {}):
+        # already filled (kept up to date by the other callbacks)
+        return no_update
+    versions = Patch()
+    versions[table] = table_cache.version(table)
+    panels = [grid_panel(table, grid_id) if key == tab_key else no_update for key in TABLES]
+    return *panels, versions
+
+# Reports tab: read the chosen report from the summary tables whenever the tab is opened or another report is picked
+@app.callback(
+    Output("report-panel", "children"),
+    Input("report-select", "value"),
+    Input("table-tabs", "value"),
+    prevent_initial_call=True
+)
+@tracing.traced
+def show_report(report_name, tab_key):
+    if tab_key != REPORTS_TAB or report_name not in reports.REPORTS:
+        return no_update
+    return report_panel(report_name)
+
+# Result list of the search box: the number of matches, then one clickable line per row with the matched words marked
+def search_results(found: dict):
+    if not found["total"]:
+        return dmc.Text("No matches.", size="sm", c="dimmed", mt="xs")
+    if found["more"]:
+        summary = (f"More than {search.RANK_LIMIT:,} matches: the first {found['total']:,} are listed, "
+                   f"add words to narrow the search.")
+    else:
+        summary = f"{found['total']:,} match(es), best first."
+    items = []
+    for i, r in enumerate(found["results"]):
+        _, _, _, label, icon = TABLES[TABLE_TABS[r["table"]]]
+        text = [html.Mark(piece) if matched else piece for piece, matched in search.label_parts(r["label"])]
+        items.append(html.Div(
+            [dmc.Badge(f"{label} {r['id']}", leftSection=DashIconify(icon=icon), variant="light", size="sm", mr="xs"), *text],
+            id={"type": "search-result", "index": i}, n_clicks=0,
+            style={"cursor": "pointer", "padding": "2px 0"}))
+    return [dmc.Text(summary, size="sm", c="dimmed", mt="xs"), *items]
+
+# Search box: one page of matches from the full-text index (new text starts again at page 1)
+@app.callback(
+    Output("search-results", "children"),
+    Output("search-page", "total"),
+    Output("search-page", "value"),
+    Output("search-hits", "data"),
+    Input("search-input", "value"),
+    Input("search-page", "value"),
+    prevent_initial_call=True
 )
-# Additional buttons - After tables are created
-add_row_button = dmc.Button("Add Row", id="add-row-button", color="green", variant="light", leftSection=DashIconify(icon="gridicons:add-outline"))
-remove_rows_button = dmc.Button("Remove Rows", id="remove-rows-button", color="red", variant="light", leftSection=DashIconify(icon="mdi:minus-circle-outline"))
-commit_button = dmc.Button("Commit Changes", id="commit-button", color="blue", variant="light",leftSection=DashIconify(icon="fluent:database-plug-connected-20-filled"))
-
-# Main layout of the app
-app.layout = dmc.MantineProvider(
-        theme={"colorScheme": "light"}, 
-        children=[
-            html.Div(
-                children=[
-                    html.H1("LAB 9!"), # header
-                    html.H3("Payroll Database Management Interface"), # sub-header
-                    html.P("Drop all tables then create new ones and populate them",
-                           style={"fontStyle": "italic", "color": "#666666", "marginTop": "0"}),
-                    html.Hr(),
-                    dmc.Group([drop_button, create_button, populate_button], gap="md", justify="flex-start"), # button group
-                    notification_container, 
-                    tabs_layout,        # tabs with tables
-                    html.Div(make_grid("EMPLOYEE", "emp-grid"), style={"display": "none"}),
-                    html.Div(make_grid("DEPARTMENT", "dep-grid"), style={"display": "none"}),
-                    html.Div(make_grid("LEAVE", "lev-grid"), style={"display": "none"}),
-                    html.Div(make_grid("PAYROLL_RECORD", "p_rec-grid"), style={"display": "none"}),
-                    html.Div(make_grid("PAYROLL_PERIOD", "p_per-grid"), style={"display": "none"}),
-                    html.Div(make_grid("ADJUSTMENT", "adj-grid"), style={"display": "none"}),
-                    dmc.Group([add_row_button, remove_rows_button, commit_button], gap="md", justify="flex-start"), # button group
-                ],
-                style={"paddingLeft": "28px", "paddingRight": "28px"} 
-            )
-        ]
+@tracing.traced
+def run_search(text, page):
+    if dash.ctx.triggered_id == "search-input":
+        page = 1
+    if not search.terms(text):
+        return [], 0, 1, []
+    try:
+        found = search.search(text, page)
+    except Exception as e:
+        # e.g. the tables were dropped
+        print(f"Error searching for {text!r}: {e}")
+        return dmc.Text("Search is not available until the tables are created.", size="sm", c="dimmed", mt="xs"), 0, 1, []
+    hits = [[r["table"], r["id"]] for r in found["results"]]
+    return search_results(found), found["pages"], found["page"], hits
+
+# Clicking a search result opens the row's tab; the grid then scrolls to the row (see the clientside callbacks below)
+@app.callback(
+    Output("table-tabs", "value"),
+    Output("search-target", "data", allow_duplicate=True),
+    Input({"type": "search-result", "index": ALL}, "n_clicks"),
+    State("search-hits", "data"),
+    prevent_initial_call=True
 )
+@tracing.traced
+def open_search_result(n_clicks, hits):
+    clicked = dash.ctx.triggered_id
+    # new result lines (n_clicks=0) also fire this callback
+    if clicked is None or not dash.ctx.triggered[0]["value"] or clicked["index"] >= len(hits or []):
+        return no_update, no_update
+    table_name, row_id = hits[clicked["index"]]
+    tab_key = TABLE_TABS[table_name]
+    _, pk, _, _ = search.SOURCES[table_name]
+    return tab_key, {"grid": TABLES[tab_key][1], "column": pk, "id": row_id, "row_id": str(row_id)}
+
+# Notification dict in the format dmc.NotificationContainer expects
+def notification(notif_id: str, title: str, message: str, color: str, icon: str):
+    return [dict(
+        id=notif_id,
+        action="show",
+        title=title,
+        message=message,
+        color=color,
+        icon=DashIconify(icon=icon),
+    )]
 
+# Drop / Create / Populate: every table changes, so every panel whose table version moved is rebuilt
+# Runs as a background job reporting statements done; the buttons are disabled while it runs
 @app.callback(
     Output("notification-container", "sendNotifications"),
-    Output("emp-panel", "children"),
-    Output("dep-panel", "children"),
-    Output("lev-panel", "children"),
-    Output("p_rec-panel", "children"),
-    Output("p_per-panel", "children"),
-    Output("adj-panel", "children"),
+    *[Output(panel_id, "children") for _, _, panel_id, _, _ in TABLES.values()],
+    Output("table-versions", "data"),
     Input("drop-button", "n_clicks"),
     Input("create-button", "n_clicks"),
     Input("populate-button", "n_clicks"),
-    Input("add-row-button", "n_clicks"),
-    Input("remove-rows-button", "n_clicks"),
-    Input("commit-button", "n_clicks"),
-    State("table-tabs", "value"),
-    State("emp-grid", "rowData"),
-    State("dep-grid", "rowData"),
-    State("lev-grid", "rowData"),
-    State("p_rec-grid", "rowData"),
-    State("p_per-grid", "rowData"),
-    State("adj-grid", "rowData"),
-    State("emp-grid", "selectedRows"),
-    State("dep-grid", "selectedRows"),
-    State("lev-grid", "selectedRows"),
-    State("p_rec-grid", "selectedRows"),
-    State("p_per-grid", "selectedRows"),
-    State("adj-grid", "selectedRows"),
+    State("table-versions", "data"),
+    background=True,
+    progress=[Output("notification-container", "sendNotifications", allow_duplicate=True)],
+    running=[
+        (Output("drop-button", "disabled"), True, False),
+        (Output("create-button", "disabled"), True, False),
+        (Output("populate-button", "disabled"), True, False),
+        (Output("cancel-job-button", "disabled", allow_duplicate=True), False, True),
+    ],
+    cancel=[Input("cancel-job-button", "n_clicks")],
+    interval=jobs.POLL_INTERVAL_MS,
     prevent_initial_call=True
 )
-
-def handle_action(drop_n, create_n, populate_n, add_row_n, remove_n, commit_n, current_tab,
-                  emp_rows, dep_rows, lev_rows, p_rec_rows, p_per_rows, adj_rows,
-                  emp_selected, dep_selected, lev_selected, p_rec_selected, p_per_selected, adj_selected):
-    
-    triggered = dash.callback_context.triggered # triggered actions
-    if not triggered:
+def handle_schema_action(set_progress, drop_n, create_n, populate_n, client_versions):
+    trig_id = dash.ctx.triggered_id # get the id of the triggered component
+    if trig_id is None:
         return no_update
-    trig_id = triggered[0]["prop_id"].split(".")[0] # get the id of the triggered component
-
-    # default notification (will be overwritten)
-    notifs = []
-
-    # Mapping tab to corresponding table name
-    tab_map = {
-        "emp": "EMPLOYEE",
-        "dep": "DEPARTMENT",
-        "lev": "LEAVE",
-        "p_rec": "PAYROLL_RECORD",
-        "p_per": "PAYROLL_PERIOD",
-        "adj": "ADJUSTMENT",
-    }
-    # Mapping tab to current rowData state
-    state_map = {
-            "emp": emp_rows,
-            "dep": dep_rows,
-            "lev": lev_rows,
-            "p_rec": p_rec_rows,
-            "p_per": p_per_rows,
-            "adj": adj_rows,
-        }
-    # Mapping tab to selectedRows state
-    selected_map = {
-            "emp": emp_selected,
-            "dep": dep_selected,
-            "lev": lev_selected,
-            "p_rec": p_rec_selected,
-            "p_per": p_per_selected,
-            "adj": adj_selected,
-        }
-    
-    def rebuild_all_from_db(): # Rebuild all grids from database
-        return (
-            make_grid("EMPLOYEE", "emp-grid"),
-            make_grid("DEPARTMENT", "dep-grid"),
-            make_grid("LEAVE", "lev-grid"),
-            make_grid("PAYROLL_RECORD", "p_rec-grid"),
-            make_grid("PAYROLL_PERIOD", "p_per-grid"),
-            make_grid("ADJUSTMENT", "adj-grid"),
-        )
-    
-    def panel_for(tab_key: str, table_name: str, grid_id: str, current_tab: str, rows=None, cols=None):
-        """
-        Return a panel child: the default make_grid(...) for non-selected tabs,
-        or an AgGrid built from the provided rows/cols for the selected tab.
-
-        rows and cols are optional and used for add-row and remove-rows
-        where the client-side row list may be provided as `current_rows`.
-        """
-        if current_tab != tab_key:
-            return make_grid(table_name, grid_id)
-        # if rows not provided, pull from DB
-        if rows is None:
-            df = get_table_data(table_name)
-            rows = df.to_dict("records") if df is not None else []
-
-        # derive cols if not provided
-        if cols is None:
-            if rows and len(rows) > 0:
-                cols = list(rows[0].keys())
-            else:
-                df = get_table_data(table_name)
-                cols = list(df.columns) if df is not None else []
-        col_defs = [{"headerName": c, "field": c, "editable": True} for c in cols]
-        return dag.AgGrid(
-            id=grid_id,
-            rowData=rows,
-            columnDefs=col_defs,
-            columnSize="sizeToFit",
-            dashGridOptions={"rowSelection": {"mode": "multiRow"}},
-            style={"height": "350px", "width": "100%"}
-    )
+    titles = {"drop-button": "Dropping tables", "create-button": "Creating tables", "populate-button": "Populating tables"}
+    if trig_id not in titles:
+        return no_update
+    progress = jobs.Progress(set_progress, titles[trig_id], "statements")
+    progress.start()
+
     # Drop button selected
     if trig_id == "drop-button":
-        errs = run_sql_file("drop.sql")
+        errs = run_sql_file("drop.sql", progress=progress)
         if errs:
-            notifs = [dict(
-                id="drop-notif-error",
-                action="show",
-                title="Drop completed with errors",
-                message="; ".join(errs),
-                color="red",
-                icon=DashIconify(icon="mdi:alert-circle-outline"),
-            )]
+            notifs = notification("drop-notif-error", "Drop completed with errors", "; ".join(errs), "red", "mdi:alert-circle-outline")
         else:
-            notifs = [dict(
-                id="drop-notif-success",
-                action="show",
-                title="Tables dropped",
-                message="All tables were dropped successfully.",
-                color="green",
-                icon=DashIconify(icon="mdi:check-circle-outline"),
-            )]
-        emp_child, dep_child, lev_child, p_rec_child, p_per_child, adj_child = rebuild_all_from_db()
+            notifs = notification("drop-notif-success", "Tables dropped", "All tables were dropped successfully.", "green", "mdi:check-circle-outline")
 
     # Create button selected
     elif trig_id == "create-button":
-        errs = run_sql_file("create.sql")
+        errs = run_sql_file("create.sql", progress=progress)
         if errs:
-            notifs = [dict(
-                id="create-notif-error",
-                action="show",
-                title="Create completed with errors",
-                message="; ".join(errs),
-                color="red",
-                icon=DashIconify(icon="mdi:alert-circle-outline"),
-            )]
+            notifs = notification("create-notif-error", "Create completed with errors", "; ".join(errs), "red", "mdi:alert-circle-outline")
         else:
-            notifs = [dict(
-                id="create-notif-success",
-                action="show",
-                title="Tables created",
-                message="Tables were created (empty).",
-                color="green",
-                icon=DashIconify(icon="mdi:check-circle-outline"),
-            )]
-        emp_child, dep_child, lev_child, p_rec_child, p_per_child, adj_child = rebuild_all_from_db()
+            notifs = notification("create-notif-success", "Tables created", "Tables were created (empty).", "green", "mdi:check-circle-outline")
 
     # Populate button selected
     elif trig_id == "populate-button":
-        errs = run_sql_file("populate.sql")
+        errs = run_sql_file("populate.sql", progress=progress)
         if errs:
-            notifs = [dict(
-                id="populate-notif-error",
-                action="show",
-                title="Populate completed with errors",
-                message="; ".join(errs),
-                color="red",
-                icon=DashIconify(icon="mdi:alert-circle-outline"),
-            )]
+            notifs = notification("populate-notif-error", "Populate completed with errors", "; ".join(errs), "red", "mdi:alert-circle-outline")
         else:
-            notifs = [dict(
-                id="populate-notif-success",
-                action="show",
-                title="Tables populated",
-                message="All tables were populated successfully.",
-                color="green",
-                icon=DashIconify(icon="mdi:check-circle-outline"),
-            )]
-        emp_child, dep_child, lev_child, p_rec_child, p_per_child, adj_child = rebuild_all_from_db()
-    
-    # Add row button selected
-    elif trig_id == "add-row-button":
-        # Determine which table/grid is selected
-        table = tab_map.get(current_tab)
-        if table is None:
-            return no_update
+            notifs = notification("populate-notif-success", "Tables populated", "All tables were populated successfully.", "green", "mdi:check-circle-outline")
+    else:
+        return no_update
 
-        current_rows = state_map.get(current_tab)
-        # If no user-side rowData, pull from DB to get columns (user didnt enter anything)
-        if not current_rows:
-            df = get_table_data(table)
-            cols = list(df.columns) if df is not None else []
-            current_rows = df.to_dict("records") if df is not None else []
+    # report summaries, search index and triggers follow the tables (installed after Create, dropped after Drop)
+    db_objects.ensure_all()
+    table_cache.bump()
+    row_model.reset_cursors()
+    # tables (and so columns / enumerations) may have been dropped or created
+    schema.cache.refresh()
+
+    # Rebuild grids from the database (tables the browser already has at this version are not resent)
+    rendered = dict(client_versions or {})
+    panels = []
+    for table, grid_id, _, _, _ in TABLES.values():
+        version = table_cache.version(table)
+        if table not in rendered or rendered.get(table) == version:
+            # not opened yet (filled when its tab opens) or already current
+            panels.append(no_update)
         else:
-            cols = list(current_rows[0].keys()) if len(current_rows) > 0 else []
-            if not cols:
-                df = get_table_data(table)
-                cols = list(df.columns) if df is not None else []
-
-        # create empty row to add to table
-        empty_row = {c: None for c in cols} if cols else {}
-        current_rows = list(current_rows)  # ensure mutable
-        current_rows.append(empty_row)
-
-        notifs = [dict(
-            id="addrow-notif",
-            action="show",
-            title="Row added",
-            message=f"An empty row was appended to {table}. Commit to persist.",
-            color="green",
-            icon=DashIconify(icon="mdi:plus-circle-outline"),
-        )]
-        # Build all panels: replace only the selected one with the client-side updated data
-        emp_child = panel_for("emp", "EMPLOYEE", "emp-grid", current_tab, current_rows, cols)
-        dep_child = panel_for("dep", "DEPARTMENT", "dep-grid", current_tab, current_rows, cols)
-        lev_child = panel_for("lev", "LEAVE", "lev-grid", current_tab, current_rows, cols)
-        p_rec_child = panel_for("p_rec", "PAYROLL_RECORD", "p_rec-grid", current_tab, current_rows, cols)
-        p_per_child = panel_for("p_per", "PAYROLL_PERIOD", "p_per-grid", current_tab, current_rows, cols)
-        adj_child = panel_for("adj", "ADJUSTMENT", "adj-grid", current_tab, current_rows, cols)
-
-    # Remove rows button selected
-    elif trig_id == "remove-rows-button":
-        table = tab_map.get(current_tab)
-        if table is None:
-            return no_update
+            rendered[table] = version
+            panels.append(grid_panel(table, grid_id))
+    return [progress.finished()] + notifs, *panels, rendered
 
-        current_rows = state_map.get(current_tab) or []
-        selected_rows = selected_map.get(current_tab) or []
+# Cancel Job: the job process is killed by Dash (its transaction is rolled back); close its progress notification
+@app.callback(
+    Output("notification-container", "sendNotifications", allow_duplicate=True),
+    Input("cancel-job-button", "n_clicks"),
+    prevent_initial_call=True
+)
+@tracing.traced
+def cancel_job(n_clicks):
+    return [jobs.progress_notification("Job cancelled", "No changes were saved.", loading=False)]
+
+# Profile Next Action: the cookie makes the next callback request run under the profiler, then it is cleared
+@app.callback(
+    Output("notification-container", "sendNotifications", allow_duplicate=True),
+    Input("profile-button", "n_clicks"),
+    prevent_initial_call=True
+)
+@tracing.traced
+def profile_next_action(n_clicks):
+    dash.ctx.response.set_cookie(tracing.PROFILE_COOKIE, "1", max_age=600, samesite="Lax")
+    return notification("profile-notif", "Profiling the next action",
+                        "The next click is profiled; open \"Latest profile\" afterwards.", "blue", "mdi:speedometer")
+
+# Run Payroll: recompute Total_Adjustment / Net_Pay of the selected payroll periods (every period if none is selected)
+# Runs as a background job reporting periods done; only records whose adjustments changed are recomputed unless
+# "Recompute every record" is checked
+@app.callback(
+    Output("notification-container", "sendNotifications", allow_duplicate=True),
+    Output(TABLES["p_rec"][2], "children", allow_duplicate=True),
+    Output("table-versions", "data", allow_duplicate=True),
+    Input("run-payroll-button", "n_clicks"),
+    State(TABLES[PAYROLL_TAB][1], "selectedRows"),
+    State("payroll-full-run", "checked"),
+    State("table-versions", "data"),
+    background=True,
+    progress=[Output("notification-container", "sendNotifications", allow_duplicate=True)],
+    running=[
+        (Output("run-payroll-button", "disabled"), True, False),
+        (Output("cancel-job-button", "disabled", allow_duplicate=True), False, True),
+    ],
+    cancel=[Input("cancel-job-button", "n_clicks")],
+    interval=jobs.POLL_INTERVAL_MS,
+    prevent_initial_call=True
+)
+def run_payroll(set_progress, n_clicks, selected_rows, full, client_versions):
+    periods = [r.get("Payroll_Period_Id") for r in (selected_rows or []) if r.get("Payroll_Period_Id") is not None]
+    try:
+        periods = periods or payroll.period_ids()
+    except Exception as e:
+        notifs = notification("payroll-error", "Payroll run failed", str(e), "red", "mdi:alert-circle-outline")
+        return notifs, no_update, no_update
+    progress = jobs.Progress(set_progress, "Running payroll", "periods")
+    progress.start()
+    results, errors = [], []
+    for i, period in enumerate(periods):
+        try:
+            results.append(payroll.run_period(period, incremental=not full))
+        except Exception as e:
+            errors.append(f"Period {period}: {e}")
+        progress(i + 1, len(periods))
+
+    updated = sum(r["updated"] for r in results)
+    panel, versions = no_update, no_update
+    if updated:
+        table_cache.bump("PAYROLL_RECORD")
+        row_model.reset_cursors()
+        if "PAYROLL_RECORD" in (client_versions or {}):
+            # the Payroll Record grid is open: show the new values (an unopened tab is filled when opened)
+            versions = Patch()
+            versions["PAYROLL_RECORD"] = table_cache.version("PAYROLL_RECORD")
+            panel = grid_panel("PAYROLL_RECORD", TABLES["p_rec"][1])
+    message = (f"{len(results)} period(s): {sum(r['records'] for r in results)} record(s) recomputed, "
+               f"{updated} updated.")
+    if errors:
+        notifs = notification("payroll-error", "Payroll run completed with errors", message + " " + "; ".join(errors),
+                              "red", "mdi:alert-circle-outline")
+    else:
+        notifs = notification("payroll-success", "Payroll run complete", message, "green", "mdi:check-circle-outline")
+    return [progress.finished()] + notifs, panel, versions
 
+# Notification shown for Add/Remove/Commit when the grids use the infinite row model
+def infinite_notification():
+    return notification("infinite-notif", "Not available",
+                        "Add/Remove/Commit use the grid's rowData, which is not loaded with GRID_ROW_MODEL=infinite.",
+                        "orange", "mdi:alert-circle-outline")
+
+# Add Row / Remove Rows / Commit for one tab
+# Each button has its own callback that only sends the state it needs and only updates this tab's grid
+def register_table_actions(tab_key: str, table_name: str, grid_id: str):
+    # Add row button selected: the grid appends the row itself (rowTransaction), no row data is sent
+    @app.callback(
+        Output("notification-container", "sendNotifications", allow_duplicate=True),
+        Output(grid_id, "rowTransaction"),
+        Output("table-versions", "data", allow_duplicate=True),
+        Input(f"{tab_key}-add-row-button", "n_clicks"),
+        prevent_initial_call=True
+    )
+    @tracing.traced
+    def add_row(n_clicks):
+        if GRID_ROW_MODEL == "infinite":
+            return infinite_notification(), no_update, no_update
+        # column names come from the schema cache, not from the grid's rows or a table scan
+        table = schema.cache.table(table_name)
+        # create empty row to add to table, with a temporary id until it has a primary key
+        empty_row = {c: None for c in (table.column_names if table is not None else [])}
+        empty_row[NEW_ROW_FIELD] = uuid.uuid4().hex
+        notifs = notification("addrow-notif", "Row added", f"An empty row was appended to {table_name}. Commit to persist.", "green", "mdi:plus-circle-outline")
+        # the grid now has unsaved rows: rebuild it from the database on the next Drop/Create/Populate
+        versions = Patch()
+        versions[table_name] = None
+        return notifs, {"add": [empty_row]}, versions
+
+    # Remove rows button selected: the grid drops its own selected rows
+    @app.callback(
+        Output("notification-container", "sendNotifications", allow_duplicate=True),
+        Output(grid_id, "deleteSelectedRows"),
+        Output("table-versions", "data", allow_duplicate=True),
+        Input(f"{tab_key}-remove-rows-button", "n_clicks"),
+        State(grid_id, "selectedRows"),
+        prevent_initial_call=True
+    )
+    @tracing.traced
+    def remove_rows(n_clicks, selected_rows):
+        if GRID_ROW_MODEL == "infinite":
+            return infinite_notification(), no_update, no_update
         if not selected_rows:
-            notifs = [dict(
-                id="remove-none",
-                action="show",
-                title="No rows selected",
-                message="Select one or more rows in the grid to remove.",
-                color="orange",
-                icon=DashIconify(icon="mdi:alert-circle-outline"),
-            )]
-            emp_child, dep_child, lev_child, p_rec_child, p_per_child, adj_child = rebuild_all_from_db()
-            return notifs, emp_child, dep_child, lev_child, p_rec_child, p_per_child, adj_child
-
-        # determine columns
-        if current_rows and len(current_rows) > 0:
-            cols = list(current_rows[0].keys())
+            notifs = notification("remove-none", "No rows selected", "Select one or more rows in the grid to remove.", "orange", "mdi:alert-circle-outline")
+            return notifs, no_update, no_update
+        if WRITE_THROUGH:
+            # delete the selected rows by primary key in one statement (rows without a key only exist in the grid)
+            pk = schema.cache.table(table_name).pk
+            keys = [[r.get(k) for k in pk] for r in selected_rows]
+            keys = [k for k in keys if all(v is not None and v != "" for v in k)]
+            try:
+                deleted = edit_journal.delete_rows(table_name, keys)
+            except Exception as e:
+                notifs = notification("remove-error", "Rows not removed", str(e), "red", "mdi:alert-circle-outline")
+                return notifs, no_update, no_update
+            table_cache.bump(table_name)
+            row_model.reset_cursors()
+            notifs = notification("remove-success", "Rows removed", f"{deleted} row(s) deleted from {table_name}.", "green", "mdi:trash-can-outline")
+            return notifs, True, no_update
+        notifs = notification("remove-success", "Rows removed (client-side)", f"{len(selected_rows)} row(s) removed from {table_name}. Commit to persist.", "green", "mdi:trash-can-outline")
+        versions = Patch()
+        versions[table_name] = None
+        return notifs, True, versions
+
+    # Commit button selected: only this grid's rows are sent
+    # Runs as a background job reporting rows applied
+    @app.callback(
+        Output("notification-container", "sendNotifications", allow_duplicate=True),
+        Output(grid_id, "rowData"),
+        Output(f"{grid_id}-loaded-keys", "data"),
+        Output("table-versions", "data", allow_duplicate=True),
+        Input(f"{tab_key}-commit-button", "n_clicks"),
+        State(grid_id, "rowData"),
+        State(f"{grid_id}-loaded-keys", "data"),
+        background=True,
+        progress=[Output("notification-container", "sendNotifications", allow_duplicate=True)],
+        running=[
+            (Output(f"{tab_key}-commit-button", "disabled"), True, False),
+            (Output("cancel-job-button", "disabled", allow_duplicate=True), False, True),
+        ],
+        cancel=[Input("cancel-job-button", "n_clicks")],
+        interval=jobs.POLL_INTERVAL_MS,
+        prevent_initial_call=True
+    )
+    def commit(set_progress, n_clicks, current_rows, loaded_keys):
+        if GRID_ROW_MODEL == "infinite":
+            return infinite_notification(), no_update, no_update, no_update
+        if not current_rows:
+            notifs = notification("commit-empty", "Nothing to commit", "No rows present in the selected grid to commit.", "orange", "mdi:alert-circle-outline")
+            return notifs, no_update, no_update, no_update
+
+        pk = get_primary_key(table_name)
+        added = any(r.get(k) is None or r.get(k) == "" for r in current_rows for k in pk)
+        progress = jobs.Progress(set_progress, f"Committing {table_name}", "rows")
+        progress.start()
+        # Apply only the inserted/updated/deleted rows (keyed on primary key)
+        errors, counts = commit_table_diff(table_name, current_rows, progress=progress, loaded_keys=loaded_keys)
+        table_cache.bump(table_name)
+        row_model.reset_cursors()
+        # only the entry for this table changes in the versions store
+        versions = Patch()
+        versions[table_name] = table_cache.version(table_name)
+
+        if errors:
+            notifs = notification("commit-error", "Commit completed with errors", "; ".join(errors), "red", "mdi:alert-circle-outline")
+            # some rows were not written: show what the database actually holds
+            df = get_table_data(table_name)
+            return [progress.finished()] + notifs, df.to_dict("records"), loaded_row_keys(table_name), versions
+        notifs = notification("commit-success", "Commit successful",
+                              (f"Changes to {table_name} have been persisted "
+                               f"({counts['inserted']} inserted, {counts['updated']} updated, {counts['deleted']} deleted)."),
+                              "green", "mdi:check-circle-outline")
+        # the grid already shows what was written (apart from the keys given to added rows), and now holds
+        # exactly the stored rows
+        keys = [grid_row_key(r.get(k) for k in pk) for r in current_rows]
+        return [progress.finished()] + notifs, current_rows if added else no_update, keys, versions
+
+    return add_row, remove_rows, commit
+
+for _tab_key, (_table, _grid_id, _, _, _) in TABLES.items():
+    register_table_actions(_tab_key, _table, _grid_id)
+
+# Import CSV / Parquet for one tab: the uploaded file is inserted chunk by chunk in one transaction (see table_io.py)
+# Runs as a background job reporting rows read; rows that break a constraint are skipped and listed
+def register_table_import(tab_key: str, table_name: str, grid_id: str, panel_id: str):
+    @app.callback(
+        Output("notification-container", "sendNotifications", allow_duplicate=True),
+        Output(panel_id, "children", allow_duplicate=True),
+        Output("table-versions", "data", allow_duplicate=True),
+        Input(f"{tab_key}-import-upload", "contents"),
+        State(f"{tab_key}-import-upload", "filename"),
+        State("table-versions", "data"),
+        background=True,
+        progress=[Output("notification-container", "sendNotifications", allow_duplicate=True)],
+        running=[(Output("cancel-job-button", "disabled", allow_duplicate=True), False, True)],
+        cancel=[Input("cancel-job-button", "n_clicks")],
+        interval=jobs.POLL_INTERVAL_MS,
+        prevent_initial_call=True
+    )
+    def import_file(set_progress, contents, filename, client_versions):
+        if not contents:
+            return no_update, no_update, no_update
+        try:
+            fmt = table_io.file_format(filename or "")
+        except ValueError as e:
+            return notification("import-error", "Import failed", str(e), "red", "mdi:alert-circle-outline"), no_update, no_update
+        progress = jobs.Progress(set_progress, f"Importing {filename} into {table_name}", "rows")
+        progress.start()
+        # the upload arrives base64-encoded: write it to a temporary file and stream from there
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, f"upload.{fmt}")
+            with open(path, "wb") as f:
+                f.write(base64.b64decode(contents.split(",", 1)[1]))
+            del contents
+            errors, stats = table_io.import_table(table_name, path, fmt, progress=progress)
+        panel, versions = no_update, no_update
+        if stats["inserted"]:
+            table_cache.bump(table_name)
+            row_model.reset_cursors()
+            if table_name in (client_versions or {}):
+                # the grid is open: show the imported rows (an unopened tab is filled when opened)
+                versions = Patch()
+                versions[table_name] = table_cache.version(table_name)
+                panel = grid_panel(table_name, grid_id)
+        message = f"{stats['inserted']:,} of {stats['rows']:,} row(s) of {filename} inserted into {table_name}."
+        if errors:
+            notifs = notification("import-error", "Import completed with errors", message + " " + "; ".join(errors),
+                                  "red", "mdi:alert-circle-outline")
         else:
-            df = get_table_data(table)
-            cols = list(df.columns) if df is not None else []
-            current_rows = df.to_dict("records") if df is not None else []
-
-        # create a set of tuples for selected rows for robust comparison
-        sel_tuples = set(tuple(s.get(c) for c in cols) for s in selected_rows)
-        # filter out rows that match any selected tuple
-        new_rows = [r for r in current_rows if tuple(r.get(c) for c in cols) not in sel_tuples]
-
-        notifs = [dict(
-            id="remove-success",
-            action="show",
-            title="Rows removed (client-side)",
-            message=f"{len(current_rows) - len(new_rows)} row(s) removed from {table}. Commit to persist.",
-            color="green",
-            icon=DashIconify(icon="mdi:trash-can-outline"),
-        )]
-        emp_child = panel_for("emp", "EMPLOYEE", "emp-grid", current_tab, new_rows, cols)
-        dep_child = panel_for("dep", "DEPARTMENT", "dep-grid", current_tab, new_rows, cols)
-        lev_child = panel_for("lev", "LEAVE", "lev-grid", current_tab, new_rows, cols)
-        p_rec_child = panel_for("p_rec", "PAYROLL_RECORD", "p_rec-grid", current_tab, new_rows, cols)
-        p_per_child = panel_for("p_per", "PAYROLL_PERIOD", "p_per-grid", current_tab, new_rows, cols)
-        adj_child = panel_for("adj", "ADJUSTMENT", "adj-grid", current_tab, new_rows, cols)
-
-    # Commit button selected
-    elif trig_id == "commit-button":
-        table = tab_map.get(current_tab)
-        if table is None:
-            return no_update
-        
-        rows_to_commit = state_map.get(current_tab)
-        if not rows_to_commit:
-            notifs = [dict(
-                id="commit-empty",
-                action="show",
-                title="Nothing to commit",
-                message="No rows present in the selected grid to commit.",
-                color="orange",
-                icon=DashIconify(icon="mdi:alert-circle-outline"),
-            )]
-            emp_child, dep_child, lev_child, p_rec_child, p_per_child, adj_child = rebuild_all_from_db()
-            return notifs, emp_child, dep_child, lev_child, p_rec_child, p_per_child, adj_child
-
-        # Determine columns to commit
-        cols = list(rows_to_commit[0].keys()) if len(rows_to_commit) > 0 else []
-        errors = []
+            notifs = notification("import-success", "Import complete", message, "green", "mdi:check-circle-outline")
+        return [progress.finished()] + notifs, panel, versions
+    return import_file
+
+for _tab_key, (_table, _grid_id, _panel_id, _, _) in TABLES.items():
+    register_table_import(_tab_key, _table, _grid_id, _panel_id)
+
+# Write-through editing for one tab: every edited cell is written (and journaled) right away
+def register_write_through(tab_key: str, table_name: str, grid_id: str, panel_id: str):
+    @app.callback(
+        Output("notification-container", "sendNotifications", allow_duplicate=True),
+        Output(f"{grid_id}-row-versions", "data"),
+        Output(panel_id, "children", allow_duplicate=True),
+        Input(grid_id, "cellValueChanged"),
+        State(f"{grid_id}-row-versions", "data"),
+        prevent_initial_call=True
+    )
+    @tracing.traced
+    def write_cells(changes, known_versions):
+        if not changes:
+            return no_update, no_update, no_update
+        known_versions = known_versions or {}
+        pk = schema.cache.table(table_name).pk
+        edits = []
+        for change in changes:
+            data = change.get("data") or {}
+            key = [data.get(k) for k in pk]
+            edits.append({
+                "table": table_name,
+                "column": change.get("colId"),
+                "key": key,
+                "old": change.get("oldValue"),
+                "new": change.get("newValue"),
+                "version": known_versions.get(edit_journal.row_key(key), 0),
+            })
+        # one grid event (e.g. a paste over several cells) is one edit group in the journal
         try:
-            conn = sqlite3.connect("local.db")
-            cur = conn.cursor()
-            #cur.execute("PRAGMA foreign_keys = ON;")
-            # Clear table
-            cur.execute(f"DELETE FROM {table};")
-            if cols:
-                placeholders = ", ".join(["?"] * len(cols))
-                col_list_sql = ", ".join([f'"{c}"' for c in cols])
-                insert_sql = f"INSERT INTO {table} ({col_list_sql}) VALUES ({placeholders});"
-                for r in rows_to_commit:
-                    vals = [r.get(c) for c in cols]
-                    try:
-                        cur.execute(insert_sql, vals)
-                    except Exception as e:
-                        errors.append(str(e))
-            conn.commit()
+            results = edit_journal.writer.submit(edits)
         except Exception as e:
-            errors.append(str(e))
-        finally:
-            conn.close()
+            # the batch could not be written (e.g. the database is locked): show what the database holds
+            notifs = notification("writethrough-error", "Edit not saved", str(e), "red", "mdi:alert-circle-outline")
+            return notifs, no_update, grid_panel(table_name, grid_id)
 
-        if errors:
-            notifs = [dict(
-                id="commit-error",
-                action="show",
-                title="Commit completed with errors",
-                message="; ".join(errors),
-                color="red",
-                icon=DashIconify(icon="mdi:alert-circle-outline"),
-            )]
+        written = [r for r in results if r["status"] == "ok"]
+        if written:
+            table_cache.bump(table_name)
+            row_model.reset_cursors()
+        problems = [r for r in results if r["status"] in ("stale", "error")]
+        if problems:
+            # the grid shows values the database does not hold: reload it from the database
+            notifs = notification("writethrough-error", "Edit not saved", "; ".join(r["error"] for r in problems),
+                                  "red", "mdi:alert-circle-outline")
+            return notifs, no_update, grid_panel(table_name, grid_id)
+
+        versions = Patch()
+        for r in written:
+            versions[r["key"]] = r["version"]
+        if any(r["status"] == "pending" for r in results):
+            notifs = notification("writethrough-pending", "Saved on Commit", "; ".join(
+                sorted({r["error"] for r in results if r["status"] == "pending"})), "orange", "mdi:alert-circle-outline")
+            return notifs, versions, no_update
+        return no_update, versions, no_update
+
+    # Undo the newest edit group of this table that has not been undone yet
+    @app.callback(
+        Output("notification-container", "sendNotifications", allow_duplicate=True),
+        Output(panel_id, "children", allow_duplicate=True),
+        Input(f"{tab_key}-undo-button", "n_clicks"),
+        prevent_initial_call=True
+    )
+    @tracing.traced
+    def undo_last_edit(n_clicks):
+        with db.pool.read() as conn:
+            groups = edit_journal.undoable_groups(conn, table_name, limit=1)
+        if not groups:
+            notifs = notification("undo-none", "Nothing to undo", f"No journaled edits to {table_name}.", "orange", "mdi:alert-circle-outline")
+            return notifs, no_update
+        results = edit_journal.undo_group(groups[0])
+        table_cache.bump(table_name)
+        row_model.reset_cursors()
+        problems = [r["error"] for r in results if r["status"] != "ok"]
+        if problems:
+            notifs = notification("undo-error", "Undo completed with errors", "; ".join(problems), "red", "mdi:alert-circle-outline")
         else:
-            notifs = [dict(
-                id="commit-success",
-                action="show",
-                title="Commit successful",
-                message=f"Changes to {table} have been persisted.",
-                color="green",
-                icon=DashIconify(icon="mdi:check-circle-outline"),
-            )]
-        emp_child, dep_child, lev_child, p_rec_child, p_per_child, adj_child = rebuild_all_from_db()
+            notifs = notification("undo-success", "Edit undone", f"{len(results)} cell(s) of {table_name} restored.", "green", "mdi:undo")
+        return notifs, grid_panel(table_name, grid_id)
+
+    return write_cells, undo_last_edit
+
+if WRITE_THROUGH:
+    for _tab_key, (_table, _grid_id, _panel_id, _, _) in TABLES.items():
+        register_write_through(_tab_key, _table, _grid_id, _panel_id)
 
+# Infinite row model: answer each grid's block requests with paged/sorted/filtered SQL
+def register_row_source(table_name: str, grid_id: str):
+    @app.callback(
+        Output(grid_id, "getRowsResponse"),
+        Input(grid_id, "getRowsRequest"),
+        prevent_initial_call=True
+    )
+    @tracing.traced
+    def serve_rows(request):
+        if not request:
+            return no_update
+        try:
+            return row_model.get_rows(table_name, request)
+        except Exception as e:
+            print(f"Error fetching rows from {table_name}: {e}")
+            return {"rowData": [], "rowCount": 0}
+    return serve_rows
+
+# Hit/miss counts of the table cache
+@app.server.route("/cache-stats")
+def cache_stats():
+    return table_cache.stats()
+
+# Connection pool checkout wait times
+@app.server.route("/db-stats")
+def db_stats():
+    return db.pool.stats()
+
+# Table scans in the queries this worker has run on read connections, with the indexes that would avoid them
+# (see indexes.py). GET only reads the schema; POST also creates the suggested indexes
+@app.server.route("/index-advice", methods=["GET", "POST"])
+def index_advice():
+    advice = indexes.advise(apply=flask.request.method == "POST")
+    return {"advice": advice, "queries_not_recorded": indexes.log.dropped}
+
+# Request, span and SQLite statement metrics of this worker in the Prometheus text format (see tracing.py)
+@app.server.route("/metrics")
+def metrics():
+    cache = table_cache.stats()
+    pool = db.pool.stats()
+    extra = [
+        ("payroll_table_cache_hits_total", "counter", "Table cache hits", cache["hits"]),
+        ("payroll_table_cache_misses_total", "counter", "Table cache misses", cache["misses"]),
+        ("payroll_table_cache_rows", "gauge", "Rows held by the table cache", cache["rows"]),
+        ("payroll_db_readers_open", "gauge", "Open pooled read connections", pool["readers_open"]),
+        ("payroll_db_read_wait_max_seconds", "gauge", "Longest read connection checkout wait", pool["read"]["wait_max_ms"] / 1000),
+        ("payroll_db_write_wait_max_seconds", "gauge", "Longest writer checkout wait", pool["write"]["wait_max_ms"] / 1000),
+    ]
+    return tracing.metrics.render(extra), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+# Profiles taken with Profile Next Action, newest last
+@app.server.route("/profiles")
+def profile_list():
+    return {"profiles": [{k: p[k] for k in ("id", "action", "ms", "profiler")} for p in tracing.profiles]}
+
+# One profile report ("latest" for the newest one)
+@app.server.route("/profiles/<profile_id>")
+def profile_report(profile_id):
+    found = [p for p in tracing.profiles if profile_id in (p["id"], "latest")]
+    if not found:
+        return "No profile yet: click Profile Next Action, then the action to profile.", 404, {"Content-Type": "text/plain"}
+    profile = found[-1]
+    return profile["report"], 200, {"Content-Type": f"{profile['content_type']}; charset=utf-8"}
+
+# Stream a table as CSV (chunk by chunk) or Parquet (written to a temporary file first): /export/EMPLOYEE.csv
+@app.server.route("/export/<file_name>")
+def export_table(file_name):
+    table_name, _, _ = file_name.rpartition(".")
+    try:
+        fmt = table_io.file_format(file_name)
+    except ValueError as e:
+        return str(e), 400, {"Content-Type": "text/plain"}
+    if table_name.upper() not in TABLE_NAMES or schema.cache.table(table_name) is None:
+        return f"No table {table_name}", 404, {"Content-Type": "text/plain"}
+    if fmt == "csv":
+        return flask.Response(flask.stream_with_context(table_io.iter_csv(table_name)), mimetype="text/csv",
+                              headers={"Content-Disposition": f'attachment; filename="{file_name}"'})
+    f = tempfile.TemporaryFile()
+    try:
+        table_io.write_parquet(table_name, f)
+    except Exception as e:
+        f.close()
+        return f"Export failed: {e}", 500, {"Content-Type": "text/plain"}
+    f.seek(0)
+    return flask.send_file(f, mimetype="application/vnd.apache.parquet", as_attachment=True, download_name=file_name)
+
+# Import a file posted as multipart "file" into a table: curl -F file=@emp.csv http://127.0.0.1:8050/import/EMPLOYEE.csv
+# Large uploads are spooled to disk by the server, the file is then read chunk by chunk (see table_io.py)
+@app.server.route("/import/<file_name>", methods=["POST"])
+def import_table(file_name):
+    table_name, _, _ = file_name.rpartition(".")
+    upload = flask.request.files.get("file")
+    try:
+        fmt = table_io.file_format(file_name)
+    except ValueError as e:
+        return {"errors": [str(e)]}, 400
+    if upload is None or table_name.upper() not in TABLE_NAMES:
+        return {"errors": ["POST the file as multipart field 'file' to /import/<table>.<csv|parquet>"]}, 400
+    source = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="") if fmt == "csv" else upload.stream
+    errors, stats = table_io.import_table(table_name, source, fmt)
+    if stats["inserted"]:
+        table_cache.bump(table_name)
+        row_model.reset_cursors()
+    return {"errors": errors, "stats": stats}
+
+# Time spent starting this worker, per phase
+@app.server.route("/startup-stats")
+def startup_stats():
+    return STARTUP
+
+if GRID_ROW_MODEL == "infinite":
+    for _table, _grid_id, _, _, _ in TABLES.values():
+        register_row_source(_table, _grid_id)
+
+# Columnar wire format: every grid's rows are rebuilt in the browser from the column arrays in its store
+if COLUMNAR:
+    for _table, _grid_id, _, _, _ in TABLES.values():
+        app.clientside_callback(
+            wire.DECODE_JS,
+            Output(_grid_id, "rowData", allow_duplicate=True),
+            Input(f"{_grid_id}-columns", "data"),
+            prevent_initial_call="initial_duplicate"
+        )
+
+# Search results: the clicked row's grid scrolls to the row and selects it, or is filtered to it (infinite row model)
+for _table, _grid_id, _, _, _ in TABLES.values():
+    if _table not in search.SOURCES:
+        continue
+    if GRID_ROW_MODEL == "infinite":
+        app.clientside_callback(
+            search.FILTER_ROW_JS,
+            Output(_grid_id, "filterModel"),
+            Output("search-target", "data", allow_duplicate=True),
+            Input("search-target", "data"),
+            Input(_grid_id, "columnDefs"),
+            State(_grid_id, "id"),
+            prevent_initial_call="initial_duplicate"
+        )
     else:
-        return no_update
+        app.clientside_callback(
+            search.SHOW_ROW_JS,
+            Output(_grid_id, "scrollTo"),
+            Output(_grid_id, "selectedRows"),
+            Output("search-target", "data", allow_duplicate=True),
+            Input("search-target", "data"),
+            Input(_grid_id, "rowData"),
+            State(_grid_id, "id"),
+            prevent_initial_call="initial_duplicate"
+        )
 
-    return notifs, emp_child, dep_child, lev_child, p_rec_child, p_per_child, adj_child
+_startup_mark("app_ms")
+STARTUP["total_ms"] = round(sum(STARTUP.values()), 1)
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
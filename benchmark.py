@@ -0,0 +1,380 @@
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlencode
+
+import numpy as np
+
+# Plotly/Dash JSON encoder (handles components and NumPy values)
+try:
+    from plotly.utils import PlotlyJSONEncoder as _Encoder
+except ImportError:  # pragma: no cover
+    _Encoder = json.JSONEncoder
+
+'''
+-- END-TO-END BENCHMARKS -- :
+Generates a synthetic database (generate_data.py), points the app at it (PAYROLL_DB) and runs the
+app's hot paths without a browser: callbacks are fired through the Flask test client exactly like
+the Dash front end would post them, so routing, the callback and JSON serialization are all measured.
+
+    python benchmark.py --payroll-records 100000 --repeat 5
+    python benchmark.py --payroll-records 100000 --compare bench_results/<older run>.json
+
+For every action it reports latency percentiles, peak RSS during the action and request/response
+payload sizes, and saves everything to bench_results/<time>_<commit>.json for comparison across commits.
+'''
+
+DATA_DIR = Path("bench_data")
+RESULTS_DIR = Path("bench_results")
+
+# Tab key and grid id of every table
+TABLES = {
+    "EMPLOYEE": ("emp", "emp-grid"),
+    "DEPARTMENT": ("dep", "dep-grid"),
+    "LEAVE": ("lev", "lev-grid"),
+    "PAYROLL_RECORD": ("p_rec", "p_rec-grid"),
+    "PAYROLL_PERIOD": ("p_per", "p_per-grid"),
+    "ADJUSTMENT": ("adj", "adj-grid"),
+}
+
+
+# Resident set size of this process in bytes
+def current_rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+# Samples RSS in the background to find the peak while an action runs
+class RssSampler:
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+# Fires Dash callbacks through the Flask test client
+# Background callbacks are polled until their job finishes, like the browser does
+class CallbackClient:
+    def __init__(self, dash_app, poll_interval: float = 0.05):
+        self.dash_app = dash_app
+        self.client = dash_app.server.test_client()
+        self.poll_interval = poll_interval
+        self._end_id = None
+
+    # Signed page-load token the renderer sends with every callback (background jobs are bound to it)
+    def end_id(self):
+        if self._end_id is None:
+            page = self.client.get("/").get_data(as_text=True)
+            m = re.search(r'<script id="_dash-config" type="application/json">(.*?)</script>', page, re.S)
+            self._end_id = json.loads(m.group(1)).get("end_id") if m else ""
+        return self._end_id
+
+    def _find(self, trigger: str):
+        for key, spec in self.dash_app.callback_map.items():
+            if any(f"{i['id']}.{i['property']}" == trigger for i in spec["inputs"]):
+                return key, spec
+        raise KeyError(f"No callback is triggered by {trigger}")
+
+    # Request body for a click on trigger ("component.prop"); values maps "component.prop" -> value
+    def body(self, trigger: str, values: dict):
+        key, spec = self._find(trigger)
+        outputs = spec["output"] if isinstance(spec["output"], list) else [spec["output"]]
+        out_specs = [{"id": o.component_id, "property": o.component_property} for o in outputs]
+
+        def with_value(item):
+            prop = f"{item['id']}.{item['property']}"
+            # the trigger defaults to one click unless a value is given (e.g. cellValueChanged events)
+            return {**item, "value": values.get(prop, 1) if prop == trigger else values.get(prop)}
+
+        return {
+            "output": key,
+            "outputs": out_specs if key.startswith("..") else out_specs[0],
+            "inputs": [with_value(i) for i in spec["inputs"]],
+            "state": [with_value(s) for s in spec.get("state", [])],
+            "changedPropIds": [trigger],
+        }
+
+    def _post(self, trigger: str, payload: str, **params):
+        url = "/_dash-update-component?" + urlencode({"endId": self.end_id(), **params})
+        r = self.client.post(url, data=payload, content_type="application/json")
+        if r.status_code not in (200, 204):
+            raise RuntimeError(f"{trigger} returned HTTP {r.status_code}: {r.data[:300]!r}")
+        return r
+
+    # Post one callback; returns (request bytes, response bytes, parsed response)
+    def fire(self, trigger: str, values: dict):
+        payload = json.dumps(self.body(trigger, values))
+        r = self._post(trigger, payload)
+        data = r.get_json() if r.status_code == 200 else None
+        if data and "cacheKey" in data:
+            # background job started: poll until it has a result
+            job = {"cacheKey": data["cacheKey"], "job": data["job"]}
+            while True:
+                time.sleep(self.poll_interval)
+                r = self._post(trigger, payload, **job)
+                data = r.get_json() if r.status_code == 200 else None
+                if data is None or "response" in data:
+                    break
+        return len(payload), len(r.data), data
+
+
+def percentiles(samples: list):
+    a = np.array(samples) * 1000
+    return {
+        "n": len(samples),
+        "min_ms": float(a.min()),
+        "mean_ms": float(a.mean()),
+        "p50_ms": float(np.percentile(a, 50)),
+        "p90_ms": float(np.percentile(a, 90)),
+        "p99_ms": float(np.percentile(a, 99)),
+        "max_ms": float(a.max()),
+    }
+
+
+# Run fn `repeat` times (setup() before each run is not timed); fn returns (request bytes, response bytes)
+def measure(name: str, fn, repeat: int, setup=None):
+    times, peak, sizes = [], 0, (0, 0)
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with RssSampler() as rss:
+            start = time.perf_counter()
+            sizes = fn() or (0, 0)
+            times.append(time.perf_counter() - start)
+        peak = max(peak, rss.peak)
+    result = {
+        "action": name,
+        **percentiles(times),
+        "peak_rss_mb": peak / 2**20,
+        "request_bytes": sizes[0],
+        "response_bytes": sizes[1],
+    }
+    print(f"  {name:<32} p50 {result['p50_ms']:>9.1f} ms  p99 {result['p99_ms']:>9.1f} ms  "
+          f"rss {result['peak_rss_mb']:>7.1f} MB  resp {result['response_bytes'] / 1024:>10.1f} KiB")
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# Run every benchmark against a freshly generated database
+def run(payroll_records: int, repeat: int, sql_records: int, seed: int):
+    DATA_DIR.mkdir(exist_ok=True)
+    db_path = str(DATA_DIR / f"bench_{payroll_records}.db")
+    # the app reads PAYROLL_DB when db.py is first imported, so set it before importing anything from the app
+    os.environ["PAYROLL_DB"] = db_path
+    import generate_data
+    import db
+    if db.DB_PATH != db_path:
+        raise RuntimeError("db.py was imported before PAYROLL_DB was set; run benchmark.py as a script")
+
+    print(f"Generating {payroll_records:,} payroll records into {db_path} ...")
+    counts = generate_data.build_database(db_path, payroll_records, seed=seed)
+    sql_path = str(DATA_DIR / f"populate_{sql_records}.sql")
+    sql_counts = generate_data.write_sql(sql_path, sql_records, seed=seed)
+    # the deploy step: report summaries, search index etc. are built before any worker starts
+    import db_objects
+    db_objects.ensure_all()
+
+    # Worker start-up in a fresh interpreter (python start + importing app.py), and app.py's own phase report
+    startup_phases = {}
+
+    def boot():
+        out = subprocess.run([sys.executable, "-c", "import json, app; print(json.dumps(app.STARTUP))"],
+                             capture_output=True, text=True, check=True, env=os.environ.copy())
+        startup_phases.update(json.loads(out.stdout.strip().splitlines()[-1]))
+        return 0, 0
+
+    print("Start-up:")
+    results = [measure("startup (new process)", boot, repeat)]
+
+    import app
+    import sql_loader
+    import wire
+    from table_cache import cache as table_cache
+
+    client = CallbackClient(app.app)
+
+    def rows_of(table: str):
+        with db.pool.read() as conn:
+            cur = conn.execute(f"SELECT * FROM {table}")
+            cols = [d[0] for d in cur.description]
+            return [dict(zip(cols, r)) for r in cur]
+
+    def grid_state(table: str, rows=None, selected=None):
+        _, grid_id = TABLES[table]
+        return {f"{grid_id}.rowData": rows, f"{grid_id}.selectedRows": selected}
+
+    print("Actions:")
+    # Layout served for a page load (only the default tab's grid is filled)
+    results.append(measure("serve_layout", lambda: (0, len(json.dumps(app.serve_layout().to_plotly_json(), cls=_Encoder))),
+                           repeat, setup=table_cache.bump))
+    # make_grid for every table with a cold cache (full read + component build + JSON encoding)
+    for table, (_, grid_id) in TABLES.items():
+        def load(table=table, grid_id=grid_id):
+            grid = app.make_grid(table, grid_id)
+            return 0, len(json.dumps(grid.to_plotly_json(), cls=_Encoder))
+        results.append(measure(f"make_grid {table}", load, repeat, setup=table_cache.bump))
+
+    # Grid rows encoded from the cached DataFrame to JSON: records (rowData) against the columnar format (wire.py)
+    for table in ("EMPLOYEE", "LEAVE", "PAYROLL_RECORD", "ADJUSTMENT"):
+        df = app.get_table_data(table)
+        results.append(measure(f"encode {table} records", lambda df=df: (
+            0, len(json.dumps(df.to_dict("records"), cls=_Encoder))), repeat))
+        results.append(measure(f"encode {table} columnar", lambda df=df: (
+            0, len(json.dumps(wire.encode_frame(df), cls=_Encoder))), repeat))
+
+    p_rec_rows = rows_of("PAYROLL_RECORD")
+
+    # Add Row / Remove Rows / Commit on the PAYROLL_RECORD tab, posting that grid's state like the browser does
+    results.append(measure("add-row PAYROLL_RECORD", lambda: client.fire(
+        "p_rec-add-row-button.n_clicks", grid_state("PAYROLL_RECORD", p_rec_rows))[:2], repeat))
+    results.append(measure("remove-rows PAYROLL_RECORD (10)", lambda: client.fire(
+        "p_rec-remove-rows-button.n_clicks", grid_state("PAYROLL_RECORD", p_rec_rows, p_rec_rows[:10]))[:2], repeat))
+
+    edited = [dict(r) for r in p_rec_rows]
+
+    def edit_one_cell():
+        edited[0]["Gross_Pay"] = round((edited[0]["Gross_Pay"] or 0) + 1, 2)
+
+    results.append(measure("commit PAYROLL_RECORD (1 cell)", lambda: client.fire(
+        "p_rec-commit-button.n_clicks", grid_state("PAYROLL_RECORD", edited))[:2], repeat, setup=edit_one_cell))
+
+    # Write-through Remove Rows: batched DELETE by primary key (a different 1,000 adjustments each run)
+    import edit_journal
+    adjustment_ids = [r["Adjustment_Id"] for r in rows_of("ADJUSTMENT")]
+    next_batch = iter(range(0, len(adjustment_ids), 1000))
+
+    def delete_batch():
+        lo = next(next_batch)
+        edit_journal.delete_rows("ADJUSTMENT", [[k] for k in adjustment_ids[lo:lo + 1000]])
+        return 0, 0
+
+    results.append(measure("delete_rows ADJUSTMENT (1,000)", delete_batch, repeat))
+
+    # Reports tab: read from the summary tables vs computed from the base tables
+    import reports
+    for name in reports.REPORTS:
+        results.append(measure(f"report {name}", lambda name=name: (0, len(json.dumps(reports.run(name)[1]))), repeat))
+        results.append(measure(f"report {name} (live)",
+                               lambda name=name: (0, len(json.dumps(reports.run(name, live=True)[1]))), repeat))
+
+    # Search box (search.py): a ranked name prefix, two words, and a word with more matches than are ranked
+    for text in ("pri", "lana roy", "sick"):
+        results.append(measure(f"search {text!r}", lambda text=text: client.fire(
+            "search-input.value", {"search-input.value": text, "search-page.value": 1})[:2], repeat))
+
+    # Payroll run engine on period 1: full recompute, and incremental after 10 adjustments changed
+    import payroll
+    results.append(measure("payroll run period 1 (full)",
+                           lambda: (payroll.run_period(1, incremental=False), (0, 0))[1], repeat))
+
+    def change_adjustments():
+        with db.pool.write() as conn:
+            conn.execute("UPDATE ADJUSTMENT SET Amount = Amount - 1 WHERE Payroll_Record_Id IN "
+                         "(SELECT Payroll_Record_Id FROM PAYROLL_RECORD WHERE Payroll_Period_Id = 1 LIMIT 10);")
+
+    results.append(measure("payroll run period 1 (incremental)",
+                           lambda: (payroll.run_period(1), (0, 0))[1], repeat, setup=change_adjustments))
+
+    # Bulk SQL load: drop/create (untimed) then load the generated populate file
+    def reset_schema():
+        sql_loader.load_sql_file("drop.sql")
+        sql_loader.load_sql_file("create.sql")
+        # like the Create button: the report triggers are part of the load cost
+        db_objects.ensure_all()
+
+    def load_file():
+        errors = app.run_sql_file(sql_path)
+        if errors:
+            raise RuntimeError(errors[0])
+        return 0, 0
+
+    results.append(measure(f"run_sql_file ({sql_records:,} records)", load_file, repeat, setup=reset_schema))
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "payroll_records": payroll_records,
+        "row_counts": counts,
+        "sql_file_row_counts": sql_counts,
+        "repeat": repeat,
+        "startup_phases_ms": startup_phases,
+        "results": results,
+    }
+
+
+# Print p50 / payload changes against an earlier results file
+def compare(current: dict, baseline_path: str, threshold: float = 0.10):
+    baseline = json.loads(Path(baseline_path).read_text())
+    old = {r["action"]: r for r in baseline["results"]}
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')}):")
+    regressions = 0
+    for r in current["results"]:
+        b = old.get(r["action"])
+        if b is None:
+            continue
+        ratio = r["p50_ms"] / b["p50_ms"] if b["p50_ms"] else float("inf")
+        flag = "  REGRESSION" if ratio > 1 + threshold else ""
+        regressions += bool(flag)
+        print(f"  {r['action']:<32} p50 {b['p50_ms']:>9.1f} -> {r['p50_ms']:>9.1f} ms ({ratio:5.2f}x)  "
+              f"resp {b['response_bytes']:>10} -> {r['response_bytes']:>10} B{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the payroll app's hot paths")
+    parser.add_argument("--payroll-records", type=int, default=10_000)
+    parser.add_argument("--sql-records", type=int, default=10_000,
+                        help="payroll records in the generated .sql file used for run_sql_file")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=510)
+    parser.add_argument("--out", default=None, help="results file (default bench_results/<time>_<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    report = run(args.payroll_records, args.repeat, args.sql_records, args.seed)
+    RESULTS_DIR.mkdir(exist_ok=True)
+    out = Path(args.out) if args.out else RESULTS_DIR / (
+        f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_{report['commit']}_{args.payroll_records}.json")
+    out.write_text(json.dumps(report, indent=2))
+    print(f"\nSaved {out}")
+    if args.compare:
+        sys.exit(1 if compare(report, args.compare) else 0)
@@ -58,3 +58,14 @@ Adjustment_Id NUMBER PRIMARY KEY,
 Adjustment_Type VARCHAR(10) CHECK(Adjustment_Type IN ('Overtime', 'CPP', 'Insurance',
 'Tax')),
 Payroll_Record_Id NUMBER REFERENCES Payroll_Record(Payroll_Record_Id),Amount NUMBER);
+
+
+--- INDEXES
+-- Foreign key columns (and PAYROLL_RECORD.Payroll_Period_Id) are indexed so joins, per-employee lookups and
+-- the foreign key checks on delete are searches instead of table scans. The second column covers the
+-- column the reports read with the key (see reports.py).
+CREATE INDEX EMPLOYEE_DEPARTMENT ON EMPLOYEE(Department_Id);
+CREATE INDEX LEAVE_EMPLOYEE ON LEAVE(Employee_Id, Request_Status);
+CREATE INDEX PAYROLL_RECORD_EMPLOYEE ON PAYROLL_RECORD(Employee_Id, Net_Pay);
+CREATE INDEX PAYROLL_RECORD_PERIOD ON PAYROLL_RECORD(Payroll_Period_Id);
+CREATE INDEX ADJUSTMENT_PAYROLL_RECORD ON ADJUSTMENT(Payroll_Record_Id, Adjustment_Type);
@@ -0,0 +1,223 @@
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from queue import Queue, Empty
+
+'''
+-- SHARED DATABASE ACCESS LAYER -- :
+All database access in the app goes through `pool` (a ConnectionPool for local.db):
+
+    with pool.read() as conn:    # pooled read connection, one thread at a time
+        conn.execute("SELECT ...")
+
+    with pool.write() as conn:   # the single writer connection (serialized with a lock)
+        conn.execute("INSERT ...")   # committed on exit, rolled back on exception
+
+1. Every connection is configured once when it is opened (see PRAGMAS): WAL journal so readers
+   do not block the writer (no more "database is locked" between Dash workers), synchronous=NORMAL
+   (safe with WAL, one fsync per checkpoint instead of per commit), memory-mapped I/O, a larger
+   page cache, a busy timeout and foreign key enforcement (foreign_keys is per connection, so it
+   has to be set on every connection rather than once at start-up).
+2. A thread keeps the same read connection for nested pool.read() calls.
+3. pool.stats() reports how long callers waited to check out a connection, to help size max_readers.
+4. Connections must not be shared with a forked child (background jobs run in one): after a fork the
+   child's pools forget the inherited connections and open their own.
+5. Every statement run on a pooled read connection is passed to the functions in statement_listeners
+   (e.g. the query log of indexes.py). The writer is not traced: SQLite reports every trigger run
+   as a statement, which would slow bulk writes down.
+   Read connections also call the functions in progress_listeners every PROGRESS_STEPS virtual machine
+   steps (SQLite's progress handler), which measures how much work the queries do (see tracing.py).
+'''
+
+# Database file (PAYROLL_DB lets benchmarks and scripts point the app at another file)
+DB_PATH = os.environ.get("PAYROLL_DB", "local.db")
+
+# Applied to every new connection, in order
+PRAGMAS = [
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("foreign_keys", "ON"),
+    ("busy_timeout", 5000),      # ms to wait for a lock before raising "database is locked"
+    ("cache_size", -65536),      # negative = KiB, i.e. 64 MiB page cache per connection
+    ("mmap_size", 268435456),    # 256 MiB memory-mapped reads
+    ("temp_store", "MEMORY"),
+]
+
+
+# Called with the SQL text of every statement run on a traced connection (literals included)
+statement_listeners = []
+
+
+def _trace(sql: str):
+    for listener in statement_listeners:
+        listener(sql)
+
+
+# Called every PROGRESS_STEPS virtual machine steps on a traced connection
+progress_listeners = []
+PROGRESS_STEPS = 10_000
+
+
+def _progress():
+    for listener in progress_listeners:
+        listener()
+    # non-zero would interrupt the statement
+    return 0
+
+
+# Open a connection to db_path with the standard pragmas applied
+def connect(db_path: str = DB_PATH, check_same_thread: bool = False, trace: bool = False):
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value};")
+    if trace:
+        conn.set_trace_callback(_trace)
+        conn.set_progress_handler(_progress, PROGRESS_STEPS)
+    return conn
+
+
+# Checkout wait times for one kind of connection
+class _WaitStats:
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=window)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self._recent.append(seconds)
+
+    def as_dict(self):
+        recent = sorted(self._recent)
+        p95 = recent[int(len(recent) * 0.95) - 1] if recent else 0.0
+        return {
+            "checkouts": self.count,
+            "wait_mean_ms": (self.total / self.count * 1000) if self.count else 0.0,
+            "wait_p95_ms": p95 * 1000,
+            "wait_max_ms": self.max * 1000,
+        }
+
+
+# Every pool, so forked children can reset them
+_pools = weakref.WeakSet()
+
+
+class ConnectionPool:
+    def __init__(self, db_path: str = DB_PATH, max_readers: int = 8):
+        self.db_path = db_path
+        self.max_readers = max_readers
+        self._reset()
+        _pools.add(self)
+
+    # Fresh (empty) pool state; also used in a forked child, where the inherited connections are abandoned
+    def _reset(self):
+        self._idle = Queue()
+        self._created = 0
+        self._create_lock = threading.Lock()
+        self._local = threading.local()
+        self._writer = None
+        self._writer_lock = threading.RLock()
+        self._stats_lock = threading.Lock()
+        self._read_waits = _WaitStats()
+        self._write_waits = _WaitStats()
+
+    # Take an idle read connection, open a new one while under max_readers, else wait for one
+    def _checkout_reader(self):
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        with self._create_lock:
+            if self._created < self.max_readers:
+                self._created += 1
+                return connect(self.db_path, trace=True)
+        return self._idle.get()
+
+    @contextmanager
+    def read(self):
+        held = getattr(self._local, "reader", None)
+        if held is not None:
+            # nested read in the same thread: reuse the connection it already holds
+            yield held
+            return
+        start = time.perf_counter()
+        conn = self._checkout_reader()
+        with self._stats_lock:
+            self._read_waits.add(time.perf_counter() - start)
+        self._local.reader = conn
+        try:
+            yield conn
+        finally:
+            self._local.reader = None
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    @contextmanager
+    def write(self):
+        start = time.perf_counter()
+        with self._writer_lock:
+            with self._stats_lock:
+                self._write_waits.add(time.perf_counter() - start)
+            if self._writer is None:
+                self._writer = connect(self.db_path)
+            conn = self._writer
+            try:
+                yield conn
+                if conn.in_transaction:
+                    conn.commit()
+            except Exception:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+
+    # Checkout wait times, for sizing max_readers
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "max_readers": self.max_readers,
+                "readers_open": self._created,
+                "readers_idle": self._idle.qsize(),
+                "read": self._read_waits.as_dict(),
+                "write": self._write_waits.as_dict(),
+            }
+
+    # Close every idle reader and the writer (e.g. before replacing the database file)
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                break
+            conn.close()
+            with self._create_lock:
+                self._created -= 1
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+# Connections inherited from the parent process; kept referenced so the child never closes them
+_inherited = []
+
+
+def _reset_pools_after_fork():
+    for p in list(_pools):
+        _inherited.extend(list(p._idle.queue))
+        if p._writer is not None:
+            _inherited.append(p._writer)
+        p._reset()
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+# Shared pool for local.db
+pool = ConnectionPool()
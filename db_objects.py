@@ -0,0 +1,86 @@
+import argparse
+import logging
+import threading
+
+import db
+import indexes
+import payroll
+import reports
+import search
+
+'''
+-- DERIVED DATABASE OBJECTS -- :
+The report summaries (reports.py), the payroll engine's change tracking (payroll.py), the full-text search
+index (search.py) and the foreign key indexes (indexes.py) are built from the tables. Building them reads
+whole tables, so it is not done while a worker starts:
+
+1. pending() only looks at sqlite_master (and the foreign keys of the tables) for objects that are missing,
+   which takes the same time whatever the size of the database.
+2. ensure_all() builds them (each module's ensure() does nothing when its objects exist). Run it once after
+   deploying a new version or pointing the app at another database:
+       python db_objects.py
+   Drop / Create / Populate run it too, after the tables changed.
+3. A worker that starts while objects are missing builds them in a background thread (ensure_in_background),
+   so the app is served right away; reports and search are incomplete until the build has finished.
+'''
+
+logger = logging.getLogger(__name__)
+
+# Name -> (ensure function, tables the objects are built from, tables and triggers they consist of)
+OBJECTS = {
+    "reports": (reports.ensure, reports.SOURCE_TABLES, reports.SUMMARY_TABLES, reports.TRIGGERS),
+    "payroll": (payroll.ensure, payroll.SOURCE_TABLES, payroll.ENGINE_TABLES, payroll.TRIGGERS),
+    "search": (search.ensure, tuple(search.SOURCES), search.INDEX_TABLES, search.TRIGGERS),
+}
+
+
+def _existing(conn, kind: str):
+    return {name.upper() for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = ?;", (kind,)).fetchall()}
+
+
+# Names of the objects that are missing although the tables they are built from exist
+def pending(pool: db.ConnectionPool = db.pool):
+    with pool.read() as conn:
+        tables = _existing(conn, "table")
+        triggers = _existing(conn, "trigger")
+        missing = [name for name, (_, sources, built, trigger_names) in OBJECTS.items()
+                   if all(t in tables for t in sources)
+                   and not (all(t in tables for t in built) and all(t in triggers for t in trigger_names))]
+        if indexes.missing_fk_indexes(conn):
+            missing.append("fk_indexes")
+    return missing
+
+
+# Install (or, without their tables, drop) every derived object; returns {name: what was done}
+def ensure_all(pool: db.ConnectionPool = db.pool):
+    done = {name: ensure(pool) for name, (ensure, _, _, _) in OBJECTS.items()}
+    done["fk_indexes"] = "installed" if indexes.ensure_fk_indexes(pool) else None
+    return done
+
+
+# Build the missing objects in a daemon thread; returns the thread, or None if nothing is missing
+def ensure_in_background(pool: db.ConnectionPool = db.pool):
+    missing = pending(pool)
+    if not missing:
+        return None
+
+    def build():
+        try:
+            ensure_all(pool)
+            logger.info("Built %s", ", ".join(missing))
+        except Exception:
+            logger.exception("Building %s failed", ", ".join(missing))
+
+    logger.info("Building %s in the background", ", ".join(missing))
+    thread = threading.Thread(target=build, name="db-objects", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the report summaries, search index and foreign key "
+                                                 "indexes the app needs (once, after a deploy)")
+    parser.parse_args()
+    for name, result in ensure_all().items():
+        print(f"{name:<12} {result or 'up to date'}")
@@ -1,6 +1,6 @@
-DROP TABLE EMPLOYEE;
-DROP TABLE DEPARTMENT;
-DROP TABLE LEAVE;
 DROP TABLE ADJUSTMENT;
+DROP TABLE LEAVE;
 DROP TABLE PAYROLL_RECORD;
+DROP TABLE EMPLOYEE;
+DROP TABLE DEPARTMENT;
 DROP TABLE PAYROLL_PERIOD;
@@ -0,0 +1,289 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+import db
+import schema
+
+'''
+-- WRITE-THROUGH CELL EDITS AND THE EDIT JOURNAL -- :
+With GRID_EDIT_MODE=writethrough every edited cell is written to the database as soon as the
+grid reports it (cellValueChanged), instead of waiting for the Commit button.
+
+1. Each edit is one parameterized "UPDATE <table> SET <column> = ? WHERE <primary key> = ?".
+2. Every applied edit is also appended to EDIT_JOURNAL (never updated or deleted), so edits can be
+   grouped (one grid event = one Edit_Group), undone (undo_group appends the reverse edits) or
+   replayed onto another copy of the database (replay).
+3. Optimistic row versions: the version of a row is the number of journaled edits to it
+   (MAX(Row_Version) in the journal, 0 if it was never edited). The browser sends the version it
+   last saw; if the row has changed since, the edit is rejected as stale instead of overwriting.
+   Only journaled cell edits (and their undos) advance a row's version: rows changed by Commit, Import,
+   Run Payroll or Remove Rows are not detected as stale (a row deleted since is, "no longer exists").
+4. Edits are not written one transaction each: EditWriter collects everything submitted within
+   FLUSH_MS and applies it in one transaction (each edit in its own SAVEPOINT so a failing edit, e.g. on an
+   unknown table, only rejects itself; the other edits of the batch are still written).
+
+Remove Rows in write-through mode deletes the selected rows by primary key with batched
+"DELETE ... WHERE <primary key> IN (...)" statements in one transaction (delete_rows).
+
+Row keys are the primary key values joined with "|" (the same string the grids use as row id).
+'''
+
+# How long the writer waits for more edits before committing a batch
+FLUSH_MS = 5
+
+JOURNAL_TABLE = "EDIT_JOURNAL"
+
+JOURNAL_SQL = f"""
+CREATE TABLE IF NOT EXISTS {JOURNAL_TABLE} (
+    Edit_Id INTEGER PRIMARY KEY AUTOINCREMENT,
+    Edit_Group TEXT NOT NULL,
+    Table_Name TEXT NOT NULL,
+    Row_Key TEXT NOT NULL,
+    Column_Name TEXT NOT NULL,
+    Old_Value,
+    New_Value,
+    Row_Version INTEGER NOT NULL,
+    Undoes INTEGER REFERENCES {JOURNAL_TABLE}(Edit_Id),
+    Edited_At TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS {JOURNAL_TABLE}_ROW ON {JOURNAL_TABLE}(Table_Name, Row_Key, Row_Version);
+CREATE INDEX IF NOT EXISTS {JOURNAL_TABLE}_GROUP ON {JOURNAL_TABLE}(Edit_Group);
+"""
+
+
+# Create the journal table and its indexes if they do not exist
+def ensure_journal(pool: db.ConnectionPool = db.pool):
+    with pool.write() as conn:
+        conn.executescript(JOURNAL_SQL)
+
+
+# Row key string of a row's primary key values
+def row_key(values):
+    return "|".join(str(v) for v in values)
+
+
+# Current version of every edited row of a table: {row key: version}
+def row_versions(conn, table_name: str):
+    return dict(conn.execute(
+        f"SELECT Row_Key, MAX(Row_Version) FROM {JOURNAL_TABLE} WHERE Table_Name = ? GROUP BY Row_Key;",
+        (table_name,)).fetchall())
+
+
+def _current_version(cur, table_name: str, key: str):
+    found = cur.execute(
+        f"SELECT MAX(Row_Version) FROM {JOURNAL_TABLE} WHERE Table_Name = ? AND Row_Key = ?;",
+        (table_name, key)).fetchone()[0]
+    return found or 0
+
+
+def _pk_columns(cur, table_name: str):
+    table = schema.cache.table(table_name, cur.connection if cur is not None else None)
+    if table is None:
+        raise ValueError(f"no such table: {table_name}")
+    return table.pk, set(table.column_names)
+
+
+# Apply one edit inside the caller's transaction; returns the result dict for the edit
+def _apply_edit(cur, group: str, edit: dict, versions: dict, undoes=None):
+    table, column, key_values = edit["table"], edit["column"], edit["key"]
+    key = row_key(key_values)
+    result = {"key": key, "column": column, "status": "ok", "version": None, "error": None}
+    try:
+        pk, columns = _pk_columns(cur, table)
+    except Exception as e:
+        return {**result, "status": "error", "error": str(e)}
+    if not [k for k in pk if k != "rowid"]:
+        return {**result, "status": "error", "error": f"{table} has no primary key; edits are saved by Commit"}
+    if column not in columns:
+        return {**result, "status": "error", "error": f"{table} has no column {column}"}
+    if column in pk:
+        return {**result, "status": "pending", "error": "primary key changes are saved by Commit"}
+    if len(key_values) != len(pk) or any(v is None or v == "" for v in key_values):
+        return {**result, "status": "pending", "error": "row has no primary key yet (saved by Commit)"}
+
+    # a group may edit the same row more than once: later edits build on the earlier ones
+    current = _current_version(cur, table, key)
+    expected = versions.get((table, key), edit.get("version") or 0)
+    if current != expected:
+        return {**result, "status": "stale", "version": current,
+                "error": f"row {key} of {table} was changed by someone else (version {current}, you had {expected})"}
+
+    where = " AND ".join(f'"{k}" = ?' for k in pk)
+    cur.execute("SAVEPOINT cell_edit;")
+    try:
+        cur.execute(f'UPDATE {table} SET "{column}" = ? WHERE {where};', [edit["new"], *key_values])
+        if cur.rowcount == 0:
+            cur.execute("ROLLBACK TO cell_edit;")
+            cur.execute("RELEASE cell_edit;")
+            return {**result, "status": "stale", "version": current, "error": f"row {key} no longer exists in {table}"}
+        cur.execute(
+            f"INSERT INTO {JOURNAL_TABLE} (Edit_Group, Table_Name, Row_Key, Column_Name, Old_Value, New_Value, "
+            f"Row_Version, Undoes) VALUES (?, ?, ?, ?, ?, ?, ?, ?);",
+            (group, table, key, column, edit.get("old"), edit["new"], current + 1, undoes))
+        cur.execute("RELEASE cell_edit;")
+    except Exception as e:
+        cur.execute("ROLLBACK TO cell_edit;")
+        cur.execute("RELEASE cell_edit;")
+        return {**result, "status": "error", "version": current, "error": str(e)}
+    versions[(table, key)] = current + 1
+    return {**result, "version": current + 1}
+
+
+# _apply_edit for one edit of a coalesced batch: an unexpected error only fails this edit
+def _apply_safely(cur, group: str, edit: dict, versions: dict):
+    try:
+        return _apply_edit(cur, group, edit, versions)
+    except Exception as e:
+        return {"key": row_key(edit.get("key") or []), "column": edit.get("column"), "status": "error",
+                "version": None, "error": str(e)}
+
+
+# Applies submitted edit groups in coalesced transactions on a background thread
+class EditWriter:
+    def __init__(self, pool: db.ConnectionPool = db.pool, flush_ms: float = FLUSH_MS):
+        self.pool = pool
+        self.flush_ms = flush_ms
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self.flushes = 0
+        self.edits = 0
+
+    # Queue a group of edits ({"table", "column", "key": [pk values], "old", "new", "version"})
+    # and wait for its results (one dict per edit, in order)
+    def submit(self, edits: list, group: str = None, timeout: float = 30.0):
+        future = Future()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="edit-writer", daemon=True)
+                self._thread.start()
+            self._pending.append((group or uuid.uuid4().hex, edits, future))
+            self._cond.notify()
+        return future.result(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # let a burst of edits arrive, then take everything queued so far
+            time.sleep(self.flush_ms / 1000)
+            with self._cond:
+                batch, self._pending = self._pending, []
+            self._flush(batch)
+
+    def _flush(self, batch: list):
+        try:
+            with self.pool.write() as conn:
+                cur = conn.cursor()
+                cur.execute("BEGIN;")
+                results = []
+                for group, edits, _ in batch:
+                    versions = {}
+                    results.append([_apply_safely(cur, group, e, versions) for e in edits])
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        self.flushes += 1
+        self.edits += sum(len(edits) for _, edits, _ in batch)
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+    # In a forked child the writer thread does not exist: start over with an empty queue
+    def _reset_after_fork(self):
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+
+
+# Shared writer for the app
+writer = EditWriter()
+os.register_at_fork(after_in_child=writer._reset_after_fork)
+
+
+# Primary key values per DELETE statement
+DELETE_BATCH_SIZE = 500
+
+
+# Delete rows by primary key ([[pk values], ...]) with batched "DELETE ... WHERE pk IN (...)" in one transaction
+# Returns the number of rows deleted; any failure (e.g. a foreign key) rolls back the whole delete
+def delete_rows(table_name: str, keys: list, pool: db.ConnectionPool = db.pool):
+    pk, _ = _pk_columns(None, table_name)
+    if len(pk) == 1:
+        target = f'"{pk[0]}"'
+    else:
+        # composite key: row value comparison
+        target = "(" + ", ".join(f'"{k}"' for k in pk) + ")"
+    deleted = 0
+    with pool.write() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN;")
+        for i in range(0, len(keys), DELETE_BATCH_SIZE):
+            batch = keys[i:i + DELETE_BATCH_SIZE]
+            if len(pk) == 1:
+                values = ", ".join(["?"] * len(batch))
+            else:
+                values = "VALUES " + ", ".join(["(" + ", ".join(["?"] * len(pk)) + ")"] * len(batch))
+            cur.execute(f"DELETE FROM {table_name} WHERE {target} IN ({values});", [v for key in batch for v in key])
+            deleted += cur.rowcount
+    return deleted
+
+
+# Edit group ids of a table, newest first, that have not been undone
+def undoable_groups(conn, table_name: str, limit: int = 20):
+    return [g for (g,) in conn.execute(
+        f"SELECT Edit_Group FROM {JOURNAL_TABLE} j WHERE Table_Name = ? AND Undoes IS NULL "
+        f"AND NOT EXISTS (SELECT 1 FROM {JOURNAL_TABLE} u WHERE u.Undoes = j.Edit_Id) "
+        f"GROUP BY Edit_Group ORDER BY MAX(Edit_Id) DESC LIMIT ?;", (table_name, limit))]
+
+
+# Undo an edit group by appending the reverse edits (newest first); returns the results
+def undo_group(group: str, pool: db.ConnectionPool = db.pool):
+    results = []
+    undo = uuid.uuid4().hex
+    with pool.write() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN;")
+        entries = cur.execute(
+            f"SELECT Edit_Id, Table_Name, Row_Key, Column_Name, Old_Value, New_Value FROM {JOURNAL_TABLE} "
+            f"WHERE Edit_Group = ? ORDER BY Edit_Id DESC;", (group,)).fetchall()
+        versions = {}
+        for edit_id, table, key, column, old, new in entries:
+            pk, _ = _pk_columns(cur, table)
+            key_values = key.split("|")
+            where = " AND ".join(f'"{k}" = ?' for k in pk)
+            row = cur.execute(f'SELECT "{column}" FROM {table} WHERE {where};', key_values).fetchone()
+            # only undo cells that still hold the value the edit wrote
+            if row is None or str(row[0]) != str(new):
+                results.append({"key": key, "column": column, "status": "stale", "version": None,
+                                "error": f"row {key} of {table} changed after the edit; not undone"})
+                continue
+            edit = {"table": table, "column": column, "key": key_values, "old": new, "new": old,
+                    "version": _current_version(cur, table, key)}
+            results.append(_apply_edit(cur, undo, edit, versions, undoes=edit_id))
+    return results
+
+
+# Re-apply journaled edits after since_id, in order, to the database behind pool (e.g. a restored copy)
+def replay(journal_pool: db.ConnectionPool = db.pool, target_pool: db.ConnectionPool = None, since_id: int = 0):
+    target_pool = target_pool or journal_pool
+    with journal_pool.read() as conn:
+        entries = conn.execute(
+            f"SELECT Edit_Id, Table_Name, Row_Key, Column_Name, New_Value FROM {JOURNAL_TABLE} "
+            f"WHERE Edit_Id > ? ORDER BY Edit_Id;", (since_id,)).fetchall()
+    errors = []
+    with target_pool.write() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN;")
+        for edit_id, table, key, column, new in entries:
+            pk, _ = _pk_columns(cur, table)
+            where = " AND ".join(f'"{k}" = ?' for k in pk)
+            try:
+                cur.execute(f'UPDATE {table} SET "{column}" = ? WHERE {where};', [new, *key.split("|")])
+            except Exception as e:
+                errors.append(f"Edit #{edit_id} error: {e}")
+    return len(entries), errors
@@ -0,0 +1,246 @@
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+import db
+import indexes
+import sql_loader
+
+'''
+-- SYNTHETIC PAYROLL DATA GENERATOR -- :
+Fills the six tables from create.sql with referentially consistent data at a chosen scale:
+
+    python generate_data.py --payroll-records 100000 --db bench.db
+    python generate_data.py --payroll-records 10000 --sql-out big_populate.sql   # populate.sql-style file
+
+1. Scale is driven by the number of PAYROLL_RECORD rows (10k .. 10M). Every employee is paid once
+   per payroll period, so employees = payroll records / periods.
+2. Every PAYROLL_RECORD gets 0-4 ADJUSTMENT rows (mean ~2.5): CPP and Tax on most records,
+   Insurance on some, Overtime on a few. Total_Adjustment and Net_Pay are consistent with them.
+3. Rows are generated and written in chunks, so memory stays flat at any scale.
+4. The same --seed always produces the same data.
+'''
+
+CHUNK = 50_000
+
+DEPARTMENT_NAMES = ["Marketing", "Engineering", "Operations", "Human Resources", "Finance", "Sales",
+                    "Legal", "Support", "Research", "Facilities"]
+JOB_TITLES = ["Developer", "Manager", "Consultant", "Director", "Recruiter", "Analyst", "Accountant",
+              "Designer", "Technician", "Coordinator"]
+FIRST_NAMES = ["Bob", "Alice", "Shelly", "Isabelle", "Mark", "Lana", "Jerry", "Daniel", "Andy", "Sofia",
+               "Omar", "Priya", "Chen", "Maria", "Liam", "Noah", "Emma", "Ava", "Lucas", "Mia"]
+LAST_NAMES = ["Johnson", "Cook", "Smith", "Young", "Fisher", "Tran", "Lee", "Riccardo", "Willow", "Cain",
+              "Khan", "Patel", "Wang", "Garcia", "Brown", "Martin", "Roy", "Wilson", "Taylor", "Singh"]
+LEAVE_TYPES = ["Paid", "Unpaid", "Sick"]
+REQUEST_STATUSES = ["Approved", "Denied", "Pending"]
+
+# Probability that a payroll record carries each adjustment type
+ADJUSTMENT_RATES = {"CPP": 0.95, "Tax": 0.98, "Insurance": 0.45, "Overtime": 0.15}
+
+
+# Row counts for each table at a given number of payroll records
+def plan_scale(payroll_records: int, periods: int = 26):
+    periods = max(1, min(periods, payroll_records))
+    employees = max(10, payroll_records // periods)
+    departments = min(len(DEPARTMENT_NAMES) * 10, max(4, employees // 200))
+    return {
+        "DEPARTMENT": departments,
+        "EMPLOYEE": employees,
+        "PAYROLL_PERIOD": periods,
+        "PAYROLL_RECORD": payroll_records,
+        "LEAVE": employees * 2,
+    }
+
+
+def _dates(rng, n: int, start: str, days: int):
+    base = np.datetime64(start)
+    return (base + rng.integers(0, days, n).astype("timedelta64[D]")).astype(str)
+
+
+def gen_departments(scale: dict):
+    rows = []
+    for i in range(scale["DEPARTMENT"]):
+        name = DEPARTMENT_NAMES[i % len(DEPARTMENT_NAMES)]
+        rows.append((i + 1, name if i < len(DEPARTMENT_NAMES) else f"{name} {i // len(DEPARTMENT_NAMES) + 1}"))
+    yield rows
+
+
+def gen_employees(rng, scale: dict):
+    n, deps = scale["EMPLOYEE"], scale["DEPARTMENT"]
+    for lo in range(0, n, CHUNK):
+        hi = min(n, lo + CHUNK)
+        ids = np.arange(lo, hi) + 1
+        firsts = rng.integers(0, len(FIRST_NAMES), hi - lo)
+        lasts = rng.integers(0, len(LAST_NAMES), hi - lo)
+        dep_ids = rng.integers(1, deps + 1, hi - lo)
+        titles = rng.integers(0, len(JOB_TITLES), hi - lo)
+        hired = _dates(rng, hi - lo, "2000-01-01", 9000)
+        rows = []
+        for k, emp_id in enumerate(ids.tolist()):
+            first, last = FIRST_NAMES[firsts[k]], LAST_NAMES[lasts[k]]
+            rows.append((emp_id, int(dep_ids[k]), first, last, JOB_TITLES[titles[k]], hired[k],
+                         10_000_000 + emp_id, f"{first.lower()}.{last.lower()}{emp_id}@work.com"))
+        yield rows
+
+
+def gen_periods(scale: dict):
+    n = scale["PAYROLL_PERIOD"]
+    start = np.datetime64("2024-01-01")
+    rows = []
+    for i in range(n):
+        s = start + np.timedelta64(14 * i, "D")
+        rows.append((i + 1, "Bi-Weekly", str(s), str(s + np.timedelta64(13, "D"))))
+    yield rows
+
+
+def gen_leave(rng, scale: dict):
+    n, emps = scale["LEAVE"], scale["EMPLOYEE"]
+    for lo in range(0, n, CHUNK):
+        hi = min(n, lo + CHUNK)
+        emp_ids = rng.integers(1, emps + 1, hi - lo)
+        types = rng.integers(0, len(LEAVE_TYPES), hi - lo)
+        statuses = rng.choice(len(REQUEST_STATUSES), hi - lo, p=[0.6, 0.15, 0.25])
+        starts = np.datetime64("2024-01-01") + rng.integers(0, 700, hi - lo).astype("timedelta64[D]")
+        lengths = rng.integers(1, 15, hi - lo).astype("timedelta64[D]")
+        requested = starts - rng.integers(7, 60, hi - lo).astype("timedelta64[D]")
+        ends = starts + lengths
+        yield [(lo + k + 1, int(emp_ids[k]), LEAVE_TYPES[types[k]], REQUEST_STATUSES[statuses[k]],
+                str(requested[k]), str(ends[k]), str(starts[k])) for k in range(hi - lo)]
+
+
+# PAYROLL_RECORD and ADJUSTMENT chunks together so the totals match the adjustments
+def gen_payroll(rng, scale: dict):
+    n, emps, periods = scale["PAYROLL_RECORD"], scale["EMPLOYEE"], scale["PAYROLL_PERIOD"]
+    period_start = np.datetime64("2024-01-01")
+    next_adjustment = 1
+    for lo in range(0, n, CHUNK):
+        hi = min(n, lo + CHUNK)
+        m = hi - lo
+        idx = np.arange(lo, hi)
+        record_ids = idx + 1
+        # every employee once per period: record i -> employee i % emps, period i // emps
+        emp_ids = idx % emps + 1
+        period_ids = np.minimum(idx // emps, periods - 1) + 1
+        gross = np.round(rng.normal(2600, 700, m).clip(800, 9000), 2)
+        # paid 4 days after the period ends
+        payout = (period_start + (14 * (period_ids - 1) + 17).astype("timedelta64[D]")).astype(str)
+
+        amounts = {
+            "CPP": -np.round(gross * 0.0595, 2),
+            "Tax": -np.round(gross * rng.uniform(0.12, 0.30, m), 2),
+            "Insurance": -np.round(rng.uniform(40, 250, m), 2),
+            "Overtime": np.round(rng.uniform(100, 1200, m), 2),
+        }
+        total = np.zeros(m)
+        adj_rows = []
+        for adj_type, rate in ADJUSTMENT_RATES.items():
+            mask = rng.random(m) < rate
+            total += np.where(mask, amounts[adj_type], 0.0)
+            for k in np.nonzero(mask)[0].tolist():
+                adj_rows.append((adj_type, int(record_ids[k]), float(amounts[adj_type][k])))
+        total = np.round(total, 2)
+        net = np.round(gross + total, 2)
+        records = [(int(record_ids[k]), int(emp_ids[k]), int(period_ids[k]), float(gross[k]), float(net[k]),
+                    float(total[k]), payout[k]) for k in range(m)]
+        # order adjustments by payroll record like a real payroll run would write them
+        adj_rows.sort(key=lambda r: r[1])
+        adjustments = []
+        for adj_type, record_id, amount in adj_rows:
+            adjustments.append((next_adjustment, adj_type, record_id, amount))
+            next_adjustment += 1
+        yield records, adjustments
+
+
+COLUMNS = {
+    "DEPARTMENT": ["Department_Id", "Department_Name"],
+    "EMPLOYEE": ["Employee_Id", "Department_Id", "First_Name", "Last_Name", "Job_Title", "Hire_Date",
+                 "Bank_Account", "Email"],
+    "LEAVE": ["Leave_Id", "Employee_Id", "Leave_Type", "Request_Status", "Request_Date", "End_Date", "Start_Date"],
+    "PAYROLL_PERIOD": ["Payroll_Period_Id", "Period_Name", "Start_Date", "End_Date"],
+    "PAYROLL_RECORD": ["Payroll_Record_Id", "Employee_Id", "Payroll_Period_Id", "Gross_Pay", "Net_Pay",
+                       "Total_Adjustment", "Payout_Date"],
+    "ADJUSTMENT": ["Adjustment_Id", "Adjustment_Type", "Payroll_Record_Id", "Amount"],
+}
+
+
+# Every (table, rows) chunk in foreign-key order
+def generate(payroll_records: int, periods: int = 26, seed: int = 510):
+    rng = np.random.default_rng(seed)
+    scale = plan_scale(payroll_records, periods)
+    for rows in gen_departments(scale):
+        yield "DEPARTMENT", rows
+    for rows in gen_employees(rng, scale):
+        yield "EMPLOYEE", rows
+    for rows in gen_periods(scale):
+        yield "PAYROLL_PERIOD", rows
+    for rows in gen_leave(rng, scale):
+        yield "LEAVE", rows
+    for records, adjustments in gen_payroll(rng, scale):
+        yield "PAYROLL_RECORD", records
+        yield "ADJUSTMENT", adjustments
+
+
+def _insert_sql(table: str):
+    cols = COLUMNS[table]
+    return f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(['?'] * len(cols))})"
+
+
+# Recreate the schema in db_path and fill it; returns row counts per table
+def build_database(db_path: str, payroll_records: int, periods: int = 26, seed: int = 510):
+    for suffix in ("", "-wal", "-shm"):
+        Path(db_path + suffix).unlink(missing_ok=True)
+    pool = db.ConnectionPool(db_path)
+    errors, _ = sql_loader.load_sql_file("create.sql", pool=pool)
+    if errors:
+        raise RuntimeError("; ".join(errors))
+    counts = {t: 0 for t in COLUMNS}
+    with pool.write() as conn:
+        conn.execute("BEGIN;")
+        for table, rows in generate(payroll_records, periods, seed):
+            conn.executemany(_insert_sql(table), rows)
+            counts[table] += len(rows)
+    with pool.write() as conn:
+        indexes.analyze(conn)
+    pool.close_all()
+    return counts
+
+
+def _sql_literal(v):
+    if v is None:
+        return "NULL"
+    if isinstance(v, str):
+        return "'" + v.replace("'", "''") + "'"
+    return repr(v)
+
+
+# Write a populate.sql-style script (one INSERT statement per row) for benchmarking run_sql_file
+def write_sql(path: str, payroll_records: int, periods: int = 26, seed: int = 510):
+    counts = {t: 0 for t in COLUMNS}
+    with open(path, "w", encoding="utf-8") as f:
+        for table, rows in generate(payroll_records, periods, seed):
+            head = f"INSERT INTO {table} ({', '.join(COLUMNS[table])}) VALUES "
+            f.writelines(head + "(" + ", ".join(_sql_literal(v) for v in r) + ");\n" for r in rows)
+            counts[table] += len(rows)
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic payroll data")
+    parser.add_argument("--payroll-records", type=int, default=10_000)
+    parser.add_argument("--periods", type=int, default=26)
+    parser.add_argument("--seed", type=int, default=510)
+    parser.add_argument("--db", default=None, help="SQLite file to (re)create and fill")
+    parser.add_argument("--sql-out", default=None, help="write INSERT statements to this .sql file instead")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    if args.sql_out:
+        counts = write_sql(args.sql_out, args.payroll_records, args.periods, args.seed)
+        target = args.sql_out
+    else:
+        target = args.db or "bench.db"
+        counts = build_database(target, args.payroll_records, args.periods, args.seed)
+    print(f"Wrote {target} in {time.perf_counter() - start:.1f}s")
+    for table, n in counts.items():
+        print(f"  {table:<15} {n:>12,}")
@@ -0,0 +1,275 @@
+import argparse
+import re
+import sqlite3
+import threading
+
+import db
+import schema
+
+'''
+-- INDEXES AND THE INDEX ADVISOR -- :
+1. create.sql indexes every foreign key column and PAYROLL_RECORD.Payroll_Period_Id, together with the
+   column the reports filter on (e.g. PAYROLL_RECORD(Employee_Id, Net_Pay)), so foreign key checks on
+   delete, the joins of queries.sql and per-employee lookups are searches instead of table scans.
+   ensure_fk_indexes() adds an index for any foreign key that still has none (e.g. a local.db created
+   with an older create.sql).
+2. Every query run on a pooled read connection is recorded by `log` (literals replaced by ?, so the
+   same query with other values is counted once). The writer is not traced (see db.py), so statements
+   run inside pool.write() (e.g. the SELECT of Commit's diff) are not part of the advice.
+3. advise() runs EXPLAIN QUERY PLAN on the recorded queries and flags full scans of tables the query
+   compares with a value, and joins for which SQLite has to build an automatic index on every run.
+   The plans are taken on an in-memory copy of the schema and planner statistics (no rows), read through
+   a pooled read connection: a candidate index on the flagged columns is created in the copy and the plan
+   checked again, so only indexes that remove the scan are suggested and asking for advice never writes
+   to, or waits for, the database. advise(apply=True) creates the suggestions on the writer; the app only
+   does that for a POST to /index-advice.
+4. analyze() refreshes the query planner statistics (ANALYZE, then PRAGMA optimize); sql_loader runs it
+   after every bulk load.
+
+The advice for this worker is served at GET /index-advice (POST creates the indexes); `python indexes.py [--apply]` checks queries.sql.
+'''
+
+# Distinct queries kept by the log (later new queries are only counted in `dropped`)
+MAX_QUERIES = 500
+
+# Rows ANALYZE looks at per index (approximate statistics, fast on large tables)
+ANALYSIS_LIMIT = 1000
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)", re.I)
+_RECORDED_RE = re.compile(r"^\s*(SELECT|UPDATE|DELETE|WITH)\b", re.I)
+_SCAN_RE = re.compile(r"^SCAN (\w+)")
+# "SEARCH l USING AUTOMATIC COVERING INDEX (Employee_Id=?)" / "BLOOM FILTER ON l (Employee_Id=?)"
+_AUTO_INDEX_RE = re.compile(r"^(?:SEARCH|BLOOM FILTER ON) (\w+)(?: USING AUTOMATIC (?:PARTIAL )?(?:COVERING )?INDEX)? \(([^)]*)\)")
+_AUTO_COLUMN_RE = re.compile(r"(\w+)[=<>]")
+# "FROM t", "JOIN t AS x", ", t x" (table references and their aliases)
+_TABLE_REF_RE = re.compile(r"(?:\bFROM|\bJOIN|,)\s+\"?(\w+)\"?(?:\s+(?:AS\s+)?(\w+))?", re.I)
+_KEYWORDS = {"WHERE", "ON", "JOIN", "LEFT", "INNER", "CROSS", "GROUP", "ORDER", "LIMIT", "USING", "SET",
+             "UNION", "EXCEPT", "INTERSECT", "HAVING", "NATURAL", "OUTER", "WINDOW"}
+
+
+# Replace literal values with ? (and "IN (?, ?, ...)" with "IN (?)"), drop comments
+def normalize(sql: str):
+    sql = _STRING_RE.sub("?", sql)
+    sql = _COMMENT_RE.sub(" ", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("IN (?)", sql)
+    return " ".join(sql.split())
+
+
+# Counts of the queries run on pooled read connections
+class QueryLog:
+    def __init__(self, max_queries: int = MAX_QUERIES):
+        self.max_queries = max_queries
+        self._counts = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def record(self, sql: str):
+        if not _RECORDED_RE.match(sql):
+            return
+        query = normalize(sql)
+        with self._lock:
+            if query in self._counts:
+                self._counts[query] += 1
+            elif len(self._counts) < self.max_queries:
+                self._counts[query] = 1
+            else:
+                self.dropped += 1
+
+    # Most frequent queries first: [(query, count)]
+    def top(self, n: int = 50):
+        with self._lock:
+            return sorted(self._counts.items(), key=lambda item: -item[1])[:n]
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+            self.dropped = 0
+
+
+# Shared log for this worker
+log = QueryLog()
+db.statement_listeners.append(log.record)
+
+
+# CREATE INDEX statements for the foreign key columns that are not the first column of an existing index
+def missing_fk_indexes(conn):
+    statements = []
+    for table in schema.cache.tables(conn).values():
+        leading = {ix["columns"][0] for ix in table.indexes if ix["columns"]}
+        for fk in table.foreign_keys:
+            if fk["column"] in leading:
+                continue
+            statements.append(f'CREATE INDEX IF NOT EXISTS "FK_{table.name}_{fk["column"]}" '
+                              f'ON {table.name}("{fk["column"]}");')
+            leading.add(fk["column"])
+    return statements
+
+
+# Create an index on every foreign key column that is not the first column of an existing index
+# Returns the CREATE INDEX statements that were run
+def ensure_fk_indexes(pool: db.ConnectionPool = db.pool):
+    with pool.write() as conn:
+        created = missing_fk_indexes(conn)
+        for sql in created:
+            conn.execute(sql)
+    if created:
+        schema.cache.refresh()
+    return created
+
+
+# Refresh the query planner statistics (run after bulk loads)
+def analyze(conn):
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT};")
+    conn.execute("ANALYZE;")
+    conn.execute("PRAGMA optimize;")
+
+
+# EXPLAIN QUERY PLAN details of a normalized query (every ? is bound to NULL)
+def query_plan(conn, query: str):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, [None] * query.count("?")).fetchall()]
+
+
+# Columns of `table` (referenced as `ref`) the query compares with a value: equality first, then one range
+def _filter_columns(query: str, table, ref: str, single_table: bool):
+    equality, ranges = [], []
+    for col in table.column_names:
+        name = rf"\b{re.escape(ref)}\.\"?{re.escape(col)}\b\"?"
+        if single_table:
+            name = rf"(?:\b{re.escape(ref)}\.)?\"?\b{re.escape(col)}\b\"?"
+        if re.search(rf"{name}\s*(?:==?|\bIS\b)\s*\?|\?\s*==?\s*{name}|{name}\s+IN\s*\(\s*\?", query, re.I):
+            equality.append(col)
+        elif re.search(rf"{name}\s*[<>]=?\s*\?|{name}\s+BETWEEN\s+\?", query, re.I):
+            ranges.append(col)
+    return equality + ranges[:1]
+
+
+# Table references of a query: {alias or table name: TableSchema}
+def _table_refs(query: str, tables: dict):
+    refs = {}
+    for name, alias in _TABLE_REF_RE.findall(query):
+        table = tables.get(name.upper())
+        if table is None:
+            continue
+        refs[name] = table
+        if alias and alias.upper() not in _KEYWORDS:
+            refs[alias] = table
+    return refs
+
+
+# An empty in-memory database with the tables, views and indexes of conn and its planner statistics
+# (sqlite_stat1), so EXPLAIN QUERY PLAN gives the same plans as on conn and candidate indexes can be
+# created without touching the database
+def schema_copy(conn):
+    copy = sqlite3.connect(":memory:")
+    for (sql,) in conn.execute("SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+                               "AND type IN ('table', 'view', 'index') ORDER BY rowid;").fetchall():
+        try:
+            copy.execute(sql)
+        except sqlite3.OperationalError:
+            # shadow table of a virtual table (already created with it)
+            pass
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1';").fetchone():
+        stats = conn.execute("SELECT tbl, idx, stat FROM sqlite_stat1;").fetchall()
+        copy.execute("ANALYZE;")
+        copy.execute("DELETE FROM sqlite_stat1;")
+        copy.executemany("INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (?, ?, ?);", stats)
+        # reload the statistics into the planner
+        copy.execute("ANALYZE sqlite_master;")
+    return copy
+
+
+# Would an index remove the scan? Create it in the schema copy, look at the new plan and roll it back
+def _index_helps(copy, query: str, ref: str, sql: str):
+    copy.execute("SAVEPOINT index_advice;")
+    try:
+        copy.execute(sql)
+        plan = query_plan(copy, query)
+    finally:
+        copy.execute("ROLLBACK TO index_advice;")
+        copy.execute("RELEASE index_advice;")
+    return not any(_SCAN_RE.match(step) and _SCAN_RE.match(step).group(1) == ref or
+                   _AUTO_INDEX_RE.search(step) and _AUTO_INDEX_RE.search(step).group(1) == ref for step in plan)
+
+
+# Check queries for table scans and automatic indexes, and suggest (or create) indexes that remove them
+def advise(queries: list = None, apply: bool = False, pool: db.ConnectionPool = db.pool):
+    """
+    queries is a list of (query, count) (default: the most frequent recorded queries).
+
+    Flags a "SCAN" of a table the query compares with a value, and every automatic
+    index SQLite has to build for a join. Returns one dict per flagged step: the
+    query, how often it ran, the table, the plan step, the suggested CREATE INDEX
+    (None if no index on those columns avoids the scan) and whether it was created.
+    Only apply=True writes to the database.
+    """
+    if queries is None:
+        queries = log.top()
+    advice = []
+    with pool.read() as conn:
+        tables = schema.cache.tables(conn)
+        copy = schema_copy(conn)
+    try:
+        for query, count in queries:
+            try:
+                plan = query_plan(copy, query)
+            except Exception:
+                # e.g. the table was dropped since the query ran
+                continue
+            refs = _table_refs(query, tables)
+            single_table = len({t.name for t in refs.values()}) == 1
+            for step in plan:
+                if "VIRTUAL TABLE" in step:
+                    # e.g. the full-text search index: cannot be indexed
+                    continue
+                auto = _AUTO_INDEX_RE.search(step)
+                scan = _SCAN_RE.match(step)
+                if auto and auto.group(1) in refs:
+                    # join without an index: SQLite builds a temporary one on every run
+                    ref = auto.group(1)
+                    columns = [c for c in _AUTO_COLUMN_RE.findall(auto.group(2)) if c in refs[ref].columns]
+                elif scan and scan.group(1) in refs:
+                    ref = scan.group(1)
+                    columns = _filter_columns(query, refs[ref], ref, single_table)
+                    if not columns:
+                        # reads the whole table anyway (no filter on it)
+                        continue
+                else:
+                    continue
+                table = refs[ref]
+                entry = {"query": query, "count": count, "table": table.name, "plan": step,
+                         "suggestion": None, "applied": False}
+                advice.append(entry)
+                if not columns:
+                    continue
+                sql = (f'CREATE INDEX IF NOT EXISTS "IDX_{table.name}_{"_".join(columns)}" ON {table.name}('
+                       + ", ".join(f'"{c}"' for c in columns) + ");")
+                if _index_helps(copy, query, ref, sql):
+                    entry["suggestion"] = sql
+    finally:
+        copy.close()
+    suggestions = list(dict.fromkeys(e["suggestion"] for e in advice if e["suggestion"]))
+    if apply and suggestions:
+        with pool.write() as conn:
+            for sql in suggestions:
+                conn.execute(sql)
+        for entry in advice:
+            entry["applied"] = entry["suggestion"] is not None
+        schema.cache.refresh()
+    return advice
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the queries of a .sql file for table scans")
+    parser.add_argument("sql_file", nargs="?", default="queries.sql")
+    parser.add_argument("--apply", action="store_true", help="create the suggested indexes")
+    args = parser.parse_args()
+    import sql_loader
+    with open(args.sql_file, encoding="utf-8") as f:
+        queries = [(normalize(stmt), 1) for stmt in sql_loader.split_statements(f.read())]
+    for entry in advise(queries, apply=args.apply):
+        print(f"{entry['plan']:<40} {entry['suggestion'] or '(no index on its filter columns helps)'}"
+              f"{' [created]' if entry['applied'] else ''}\n    {entry['query'][:160]}")
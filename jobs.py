@@ -0,0 +1,83 @@
+import os
+import time
+
+from dash import DiskcacheManager
+from dash_iconify import DashIconify
+
+'''
+-- BACKGROUND JOBS -- :
+Drop / Create / Populate and Commit run as Dash background callbacks instead of inside the request:
+
+1. DiskcacheManager starts every job in its own process and passes results and progress through a
+   diskcache directory (JOBS_DIR), so there is no broker to run and the web worker is free as soon as
+   the job has started (the browser polls for the result every POLL_INTERVAL_MS).
+2. Jobs report progress (statements or rows done out of the total) as a notification that is
+   updated in place; Progress throttles the updates to one every PROGRESS_INTERVAL seconds.
+3. The "Cancel Job" button cancels running jobs: the job process is killed, so its open transaction
+   is never committed and SQLite rolls it back.
+'''
+
+# Directory of the diskcache used for job results and progress
+JOBS_DIR = os.environ.get("PAYROLL_JOBS_DIR", ".jobs")
+
+# How often the browser polls a running job, and how often a job publishes progress
+POLL_INTERVAL_MS = 500
+PROGRESS_INTERVAL = 0.25
+
+# Notification updated with the progress of the running job
+PROGRESS_NOTIF_ID = "job-progress"
+
+
+# Background callback manager for the app (a disk-backed queue, no outside broker)
+def make_manager(path: str = JOBS_DIR):
+    import diskcache
+    return DiskcacheManager(diskcache.Cache(path))
+
+
+# Notification (in dmc.NotificationContainer format) showing or updating the job's progress
+def progress_notification(title: str, message: str, action: str = "update", loading: bool = True):
+    notif = dict(
+        id=PROGRESS_NOTIF_ID,
+        action=action,
+        title=title,
+        message=message,
+        color="blue",
+        loading=loading,
+        autoClose=False if loading else 3000,
+    )
+    if not loading:
+        notif["icon"] = DashIconify(icon="mdi:check-circle-outline")
+    return notif
+
+
+# Throttled progress reporting from inside a job (call it as progress(done, total))
+class Progress:
+    def __init__(self, set_progress, title: str, unit: str):
+        self.set_progress = set_progress
+        self.title = title
+        self.unit = unit
+        self._shown = False
+        self._last = 0.0
+
+    def start(self, message: str = "Starting..."):
+        self.set_progress(([progress_notification(self.title, message, action="show")],))
+        self._shown = True
+        self._last = time.monotonic()
+
+    # total may be None when it is not known in advance (e.g. rows of a CSV file being read)
+    def __call__(self, done: int, total: int):
+        now = time.monotonic()
+        if (total is None or done < total) and now - self._last < PROGRESS_INTERVAL:
+            return
+        self._last = now
+        if total is None:
+            message = f"{done:,} {self.unit}"
+        else:
+            pct = f" ({done / total:.0%})" if total else ""
+            message = f"{done:,} / {total:,} {self.unit}{pct}"
+        self.set_progress(([progress_notification(self.title, message, action="update" if self._shown else "show")],))
+        self._shown = True
+
+    # Final state of the progress notification (part of the job's result)
+    def finished(self, message: str = "Done"):
+        return progress_notification(self.title, message, loading=False)
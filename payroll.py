@@ -0,0 +1,203 @@
+import argparse
+import time
+
+import db
+
+'''
+-- PAYROLL RUN ENGINE -- :
+Recomputes the stored PAYROLL_RECORD.Total_Adjustment and Net_Pay of a payroll period from its ADJUSTMENT rows:
+
+    Total_Adjustment = SUM(Amount) of the record's adjustments (deductions are negative amounts)
+    Net_Pay          = Gross_Pay + Total_Adjustment            (both rounded to cents)
+
+1. The period's records and adjustments are read column-wise into pandas and the adjustments are summed
+   per record with a group-by; nothing loops over rows in Python.
+2. Only records whose values actually change are written, with executemany batches of BATCH_SIZE in one
+   transaction (the report triggers see ordinary updates).
+3. Incremental runs: triggers on ADJUSTMENT (insert / delete / amount or record change) and on PAYROLL_RECORD
+   (new record, Gross_Pay change) add the record id to PAYROLL_DIRTY. An incremental run only recomputes
+   the period's dirty records and clears them. A period that never had a full run is run in full.
+4. Every run is logged in PAYROLL_RUN (period, mode, records recomputed / updated, duration).
+
+ensure() installs the tables and triggers (after Create, or from db_objects.py) like reports.ensure().
+numpy and pandas are only imported when a period is run (the app imports this module at start-up).
+    python payroll.py --period 3 [--full]
+'''
+
+# Rows per UPDATE executemany batch
+BATCH_SIZE = 5000
+
+# Amounts are money: values closer than this are considered equal
+CENT = 0.005
+
+ENGINE_SQL = """
+CREATE TABLE IF NOT EXISTS PAYROLL_DIRTY (
+    Payroll_Record_Id NUMBER PRIMARY KEY
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS PAYROLL_RUN (
+    Run_Id INTEGER PRIMARY KEY AUTOINCREMENT,
+    Payroll_Period_Id NUMBER NOT NULL,
+    Mode TEXT NOT NULL CHECK (Mode IN ('full', 'incremental')),
+    Records INTEGER NOT NULL,
+    Updated INTEGER NOT NULL,
+    Duration_Ms REAL NOT NULL,
+    Run_At TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+"""
+
+ENGINE_TABLES = ("PAYROLL_DIRTY", "PAYROLL_RUN")
+
+# Tables the engine tracks changes of
+SOURCE_TABLES = ("PAYROLL_RECORD", "ADJUSTMENT")
+
+
+def _mark(row: str, column: str):
+    return f"""
+    INSERT OR IGNORE INTO PAYROLL_DIRTY SELECT {row}.{column} WHERE {row}.{column} IS NOT NULL;"""
+
+
+# Trigger name -> (table, event, WHEN condition or None, body)
+TRIGGERS = {
+    "PAYROLL_ADJUSTMENT_INSERT": ("ADJUSTMENT", "INSERT", None, _mark("NEW", "Payroll_Record_Id")),
+    "PAYROLL_ADJUSTMENT_DELETE": ("ADJUSTMENT", "DELETE", None, _mark("OLD", "Payroll_Record_Id")),
+    "PAYROLL_ADJUSTMENT_UPDATE": ("ADJUSTMENT", "UPDATE OF Payroll_Record_Id, Amount",
+                                  "OLD.Payroll_Record_Id IS NOT NEW.Payroll_Record_Id OR OLD.Amount IS NOT NEW.Amount",
+                                  _mark("OLD", "Payroll_Record_Id") + _mark("NEW", "Payroll_Record_Id")),
+    "PAYROLL_RECORD_INSERT": ("PAYROLL_RECORD", "INSERT", None, _mark("NEW", "Payroll_Record_Id")),
+    "PAYROLL_RECORD_GROSS": ("PAYROLL_RECORD", "UPDATE OF Gross_Pay", "OLD.Gross_Pay IS NOT NEW.Gross_Pay",
+                             _mark("NEW", "Payroll_Record_Id")),
+}
+
+
+def _trigger_sql(name: str):
+    table, event, when, body = TRIGGERS[name]
+    when_sql = f" WHEN {when}" if when else ""
+    return f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table}{when_sql}\nBEGIN{body}\nEND;"
+
+
+def _existing(conn, kind: str):
+    return {name.upper() for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = ?;", (kind,)).fetchall()}
+
+
+# Create the dirty-record tracking and run log if PAYROLL_RECORD and ADJUSTMENT exist, drop them if not
+# Returns "installed", "dropped" or None when nothing had to change
+def ensure(pool: db.ConnectionPool = db.pool):
+    with pool.write() as conn:
+        tables = _existing(conn, "table")
+        triggers = _existing(conn, "trigger")
+        if not all(t in tables for t in SOURCE_TABLES):
+            if not any(t in tables for t in ENGINE_TABLES):
+                return None
+            for name in TRIGGERS:
+                conn.execute(f"DROP TRIGGER IF EXISTS {name};")
+            for table in ENGINE_TABLES:
+                conn.execute(f"DROP TABLE IF EXISTS {table};")
+            return "dropped"
+        if all(t in tables for t in ENGINE_TABLES) and all(name in triggers for name in TRIGGERS):
+            return None
+        conn.execute("BEGIN;")
+        for stmt in ENGINE_SQL.split(";"):
+            if stmt.strip():
+                conn.execute(stmt)
+        for name in TRIGGERS:
+            conn.execute(_trigger_sql(name))
+        # changes made while the triggers did not exist are unknown: the next run of every period is a full run
+        conn.execute("DELETE FROM PAYROLL_RUN;")
+    return "installed"
+
+
+# Stored records of a period (all of them, or only the dirty ones) and their adjustments, column-wise
+def _read_period(conn, period_id, dirty_only: bool):
+    import pandas as pd
+    # CROSS JOIN fixes the join order: dirty set (small), then the period's records, then their adjustments by index
+    source = "PAYROLL_DIRTY d CROSS JOIN PAYROLL_RECORD p ON p.Payroll_Record_Id = d.Payroll_Record_Id" if dirty_only \
+        else "PAYROLL_RECORD p"
+    records = pd.read_sql_query(
+        f"SELECT p.Payroll_Record_Id, p.Gross_Pay, p.Total_Adjustment, p.Net_Pay FROM {source} "
+        f"WHERE p.Payroll_Period_Id = ?;", conn, params=(period_id,))
+    adjustments = pd.read_sql_query(
+        f"SELECT a.Payroll_Record_Id, a.Amount FROM {source} "
+        f"CROSS JOIN ADJUSTMENT a ON a.Payroll_Record_Id = p.Payroll_Record_Id WHERE p.Payroll_Period_Id = ?;",
+        conn, params=(period_id,))
+    return records, adjustments
+
+
+# New Total_Adjustment / Net_Pay of the records, and which of them differ from the stored values
+def compute(records, adjustments):
+    import numpy as np
+    totals = adjustments.groupby("Payroll_Record_Id")["Amount"].sum()
+    ids = records["Payroll_Record_Id"].to_numpy()
+    total = np.round(totals.reindex(ids, fill_value=0.0).to_numpy(dtype=float), 2)
+    net = np.round(records["Gross_Pay"].to_numpy(dtype=float) + total, 2)
+
+    def differs(new, old):
+        old = old.to_numpy(dtype=float)
+        return ~((np.abs(new - old) < CENT) | (np.isnan(new) & np.isnan(old)))
+
+    changed = differs(total, records["Total_Adjustment"]) | differs(net, records["Net_Pay"])
+    return ids, total, net, changed
+
+
+def _sql_values(values):
+    import numpy as np
+    # NaN (e.g. no Gross_Pay) is stored as NULL
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+# Recompute Total_Adjustment and Net_Pay of one payroll period
+def run_period(period_id, incremental: bool = True, pool: db.ConnectionPool = db.pool, progress=None):
+    """
+    Recompute the period's records from their adjustments and write the ones that
+    changed. incremental=True only looks at records marked dirty since the last run
+    (a period without a full run yet is run in full).
+
+    Returns {"period", "mode", "records", "updated", "ms"}; progress, if given, is
+    called as progress(records written, records to write) after every batch.
+    """
+    start = time.perf_counter()
+    with pool.write() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN;")
+        if incremental:
+            full_runs = cur.execute("SELECT COUNT(*) FROM PAYROLL_RUN WHERE Payroll_Period_Id = ? AND Mode = 'full';",
+                                    (period_id,)).fetchone()[0]
+            incremental = full_runs > 0
+        records, adjustments = _read_period(conn, period_id, dirty_only=incremental)
+        ids, total, net, changed = compute(records, adjustments)
+
+        update_ids = ids[changed].tolist()
+        params = list(zip(_sql_values(total[changed]), _sql_values(net[changed]), update_ids))
+        for i in range(0, len(params), BATCH_SIZE):
+            cur.executemany("UPDATE PAYROLL_RECORD SET Total_Adjustment = ?, Net_Pay = ? WHERE Payroll_Record_Id = ?;",
+                            params[i:i + BATCH_SIZE])
+            if progress is not None:
+                progress(min(i + BATCH_SIZE, len(params)), len(params))
+
+        # the period's records are up to date now
+        if incremental:
+            cur.executemany("DELETE FROM PAYROLL_DIRTY WHERE Payroll_Record_Id = ?;", [(i,) for i in ids.tolist()])
+        else:
+            cur.execute("DELETE FROM PAYROLL_DIRTY WHERE Payroll_Record_Id IN "
+                        "(SELECT Payroll_Record_Id FROM PAYROLL_RECORD WHERE Payroll_Period_Id = ?);", (period_id,))
+        result = {"period": period_id, "mode": "incremental" if incremental else "full",
+                  "records": len(ids), "updated": len(params), "ms": round((time.perf_counter() - start) * 1000, 1)}
+        cur.execute("INSERT INTO PAYROLL_RUN (Payroll_Period_Id, Mode, Records, Updated, Duration_Ms) VALUES (?, ?, ?, ?, ?);",
+                    (period_id, result["mode"], result["records"], result["updated"], result["ms"]))
+    return result
+
+
+# Every payroll period id
+def period_ids(pool: db.ConnectionPool = db.pool):
+    with pool.read() as conn:
+        return [p for (p,) in conn.execute("SELECT Payroll_Period_Id FROM PAYROLL_PERIOD ORDER BY Payroll_Period_Id;")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute Total_Adjustment and Net_Pay of payroll periods")
+    parser.add_argument("--period", type=int, action="append", help="period id (default: every period)")
+    parser.add_argument("--full", action="store_true", help="recompute every record, not only changed ones")
+    args = parser.parse_args()
+    ensure()
+    for period in args.period or period_ids():
+        print(run_period(period, incremental=not args.full))
@@ -1,3 +1,9 @@
+--Populate Department Table
+INSERT INTO Department (Department_Id, Department_Name) VALUES (1, 'Marketing');
+INSERT INTO Department (Department_Id, Department_Name) VALUES (2, 'Engineering');
+INSERT INTO Department (Department_Id, Department_Name) VALUES (3, 'Operations');
+INSERT INTO Department (Department_Id, Department_Name) VALUES (4, 'Human Resources');
+
 --Populate Employee Table
 INSERT INTO Employee (Employee_Id, Department_Id, First_Name, Last_Name, Job_Title,
 Hire_Date, Bank_Account, Email) VALUES (4506, 3, 'Bob', 'Johnson', 'Manager', '2006-10-19', 48832065, 'bob.johnson@work.com');
@@ -20,12 +26,6 @@ Hire_Date, Bank_Account, Email) VALUES (4514, 4, 'Andy', 'Willow', 'Recuiter', '
 INSERT INTO Employee (Employee_Id, Department_Id, First_Name, Last_Name, Job_Title,
 Hire_Date, Bank_Account, Email) VALUES (4515, 1, 'Sofia', 'Cain', 'Consultant', '2022-10-21', 45028691, 'sofia.cain@work.com');
 
---Populate Department Table
-INSERT INTO Department (Department_Id, Department_Name) VALUES (1, 'Marketing');
-INSERT INTO Department (Department_Id, Department_Name) VALUES (2, 'Engineering');
-INSERT INTO Department (Department_Id, Department_Name) VALUES (3, 'Operations');
-INSERT INTO Department (Department_Id, Department_Name) VALUES (4, 'Human Resources');
-
 --Populate Leave Table
 INSERT INTO Leave (Leave_Id, Employee_Id, Leave_Type, Request_Status, Request_Date,
 Start_Date, End_Date) VALUES (86742, 4506, 'Paid', 'Approved', '2025-05-12', '2025-08-10','2025-08-14');
@@ -36,11 +36,11 @@ Start_Date, End_Date) VALUES (435675, 4508, 'Unpaid', 'Pending', '2025-09-09', '
 INSERT INTO Leave (Leave_Id, Employee_Id, Leave_Type, Request_Status, Request_Date,
 Start_Date, End_Date) VALUES (86741, 4513, 'Paid', 'Denied', '2025-05-12', '2025-05-10', '2025-05-14');
 INSERT INTO Leave (Leave_Id, Employee_Id, Leave_Type, Request_Status, Request_Date,
-Start_Date, End_Date) VALUES (86744, 4509, 'Sick', 'Approved','25-01-05', '2025-01-21', '2025-01-19');
+Start_Date, End_Date) VALUES (86744, 4509, 'Sick', 'Approved','2025-01-05', '2025-01-21', '2025-01-19');
 INSERT INTO Leave (Leave_Id, Employee_Id, Leave_Type, Request_Status, Request_Date,
 Start_Date, End_Date) VALUES (86739, 4511, 'Unpaid', 'Approved', '2025-03-01', '2025-04-02', '2025-03-29');
 INSERT INTO Leave (Leave_Id, Employee_Id, Leave_Type, Request_Status, Request_Date,
-Start_Date, End_Date) VALUES (86738, 4514, 'Paid', 'Approved', '25-04-05', '25-05-20', '2025-05-08');
+Start_Date, End_Date) VALUES (86738, 4514, 'Paid', 'Approved', '2025-04-05', '2025-05-20', '2025-05-08');
 
 --Populate Payroll_Record Table
 INSERT INTO Payroll_Record (Payroll_Record_Id, Employee_Id, Payroll_Period_Id, Gross_Pay,
@@ -5,9 +5,10 @@ SELECT e.first_name, e.last_name, d.department_name, l.leave_type FROM departmen
 WHERE d.department_name = 'Marketing' AND l.request_status = 'Approved' );
 
 -- Query 2: Employees who DON'T have approved leave, removing empoyees with approved leave (from subquery)
-(SELECT * FROM employee)
-MINUS
-(SELECT e.* FROM leave l, employee e WHERE l.employee_id = e.employee_id AND l.request_status = 'Approved');
+-- (SQLite has no MINUS and no parentheses around compound SELECTs: EXCEPT is its MINUS)
+SELECT * FROM employee
+EXCEPT
+SELECT e.* FROM leave l, employee e WHERE l.employee_id = e.employee_id AND l.request_status = 'Approved';
 
 --Query 3: union of all employees who have approved leave requests and an adjustment type
 SELECT e.first_name, e.last_name, e.job_title, l.request_status
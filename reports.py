@@ -0,0 +1,310 @@
+import db
+import tracing
+
+'''
+-- MATERIALIZED PAYROLL REPORTS -- :
+The reports of queries.sql, served from small summary tables instead of re-joining the payroll history:
+
+    RPT_DEPARTMENT_HEADCOUNT   employees per department                     (Query 4)
+    RPT_EMPLOYEE_PAY           payroll records, net pay total and max per employee  (Queries 5 and 6)
+    RPT_EMPLOYEE_LEAVE         approved leave requests per employee         (Queries 1, 2 and 3)
+    RPT_EMPLOYEE_ADJUSTMENT    adjustments per employee and adjustment type (Query 3)
+
+1. The summaries are kept current by triggers on EMPLOYEE, PAYROLL_RECORD, LEAVE and ADJUSTMENT, so every
+   writer (Commit, write-through edits, Populate, the sqlite3 shell) updates them in the same transaction.
+   A trigger only adds or subtracts the changed row's contribution; the maximum net pay is recomputed
+   for one employee only when the row holding it is removed or lowered.
+2. ensure() installs the summaries and triggers (and fills them once with rebuild()) when the tables
+   exist but the triggers do not, e.g. after Create, which recreates the tables without triggers.
+   After Drop the summaries are dropped too.
+3. run(name) reads a report from the summaries; REPORTS also keeps the equivalent SQLite query over the
+   base tables (live_sql) to check the summaries against and to benchmark them.
+
+queries.sql is written for Oracle; the live queries are its SQLite versions (MINUS -> EXCEPT, the
+uncorrelated EXISTS of Query 1 and the cross join of Query 6 joined on the employee).
+'''
+
+# Tables the summaries are computed from
+SOURCE_TABLES = ("EMPLOYEE", "DEPARTMENT", "PAYROLL_RECORD", "LEAVE", "ADJUSTMENT")
+
+SUMMARY_SQL = """
+CREATE TABLE IF NOT EXISTS RPT_DEPARTMENT_HEADCOUNT (
+    Department_Id NUMBER PRIMARY KEY,
+    Employee_Count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS RPT_EMPLOYEE_PAY (
+    Employee_Id NUMBER PRIMARY KEY,
+    Record_Count INTEGER NOT NULL,
+    Net_Pay_Total NUMBER NOT NULL,
+    Max_Net_Pay NUMBER
+);
+CREATE TABLE IF NOT EXISTS RPT_EMPLOYEE_LEAVE (
+    Employee_Id NUMBER PRIMARY KEY,
+    Approved_Leaves INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS RPT_EMPLOYEE_ADJUSTMENT (
+    Employee_Id NUMBER NOT NULL,
+    Adjustment_Type TEXT NOT NULL,
+    Adjustment_Count INTEGER NOT NULL,
+    PRIMARY KEY (Employee_Id, Adjustment_Type)
+);
+"""
+
+SUMMARY_TABLES = ("RPT_DEPARTMENT_HEADCOUNT", "RPT_EMPLOYEE_PAY", "RPT_EMPLOYEE_LEAVE", "RPT_EMPLOYEE_ADJUSTMENT")
+
+# Full recompute of every summary (run once when the triggers are installed)
+REBUILD_SQL = """
+DELETE FROM RPT_DEPARTMENT_HEADCOUNT;
+INSERT INTO RPT_DEPARTMENT_HEADCOUNT
+SELECT Department_Id, COUNT(*) FROM EMPLOYEE WHERE Department_Id IS NOT NULL GROUP BY Department_Id;
+
+DELETE FROM RPT_EMPLOYEE_PAY;
+INSERT INTO RPT_EMPLOYEE_PAY
+SELECT Employee_Id, COUNT(*), SUM(Net_Pay), MAX(Net_Pay) FROM PAYROLL_RECORD
+WHERE Employee_Id IS NOT NULL AND Net_Pay IS NOT NULL GROUP BY Employee_Id;
+
+DELETE FROM RPT_EMPLOYEE_LEAVE;
+INSERT INTO RPT_EMPLOYEE_LEAVE
+SELECT Employee_Id, COUNT(*) FROM LEAVE
+WHERE Employee_Id IS NOT NULL AND Request_Status = 'Approved' GROUP BY Employee_Id;
+
+DELETE FROM RPT_EMPLOYEE_ADJUSTMENT;
+INSERT INTO RPT_EMPLOYEE_ADJUSTMENT
+SELECT p.Employee_Id, a.Adjustment_Type, COUNT(*) FROM ADJUSTMENT a
+JOIN PAYROLL_RECORD p ON p.Payroll_Record_Id = a.Payroll_Record_Id
+WHERE p.Employee_Id IS NOT NULL AND a.Adjustment_Type IS NOT NULL GROUP BY p.Employee_Id, a.Adjustment_Type;
+"""
+
+
+# Statements adding a row's contribution (row is "NEW" or "OLD")
+def _headcount_add(row):
+    return f"""
+    INSERT INTO RPT_DEPARTMENT_HEADCOUNT SELECT {row}.Department_Id, 1 WHERE {row}.Department_Id IS NOT NULL
+    ON CONFLICT (Department_Id) DO UPDATE SET Employee_Count = Employee_Count + 1;"""
+
+
+def _headcount_sub(row):
+    return f"""
+    UPDATE RPT_DEPARTMENT_HEADCOUNT SET Employee_Count = Employee_Count - 1 WHERE Department_Id = {row}.Department_Id;
+    DELETE FROM RPT_DEPARTMENT_HEADCOUNT WHERE Department_Id = {row}.Department_Id AND Employee_Count <= 0;"""
+
+
+def _pay_add(row):
+    return f"""
+    INSERT INTO RPT_EMPLOYEE_PAY SELECT {row}.Employee_Id, 1, {row}.Net_Pay, {row}.Net_Pay
+    WHERE {row}.Employee_Id IS NOT NULL AND {row}.Net_Pay IS NOT NULL
+    ON CONFLICT (Employee_Id) DO UPDATE SET Record_Count = Record_Count + 1,
+        Net_Pay_Total = Net_Pay_Total + excluded.Net_Pay_Total,
+        Max_Net_Pay = MAX(Max_Net_Pay, excluded.Max_Net_Pay);"""
+
+
+def _pay_sub(row):
+    # the maximum can only be recomputed from the records (only when the removed value was the maximum)
+    return f"""
+    UPDATE RPT_EMPLOYEE_PAY SET Record_Count = Record_Count - 1, Net_Pay_Total = Net_Pay_Total - {row}.Net_Pay
+    WHERE Employee_Id = {row}.Employee_Id AND {row}.Net_Pay IS NOT NULL;
+    DELETE FROM RPT_EMPLOYEE_PAY WHERE Employee_Id = {row}.Employee_Id AND Record_Count <= 0;
+    UPDATE RPT_EMPLOYEE_PAY SET Max_Net_Pay = (
+        SELECT MAX(Net_Pay) FROM PAYROLL_RECORD WHERE Employee_Id = {row}.Employee_Id)
+    WHERE Employee_Id = {row}.Employee_Id AND Max_Net_Pay <= {row}.Net_Pay;"""
+
+
+def _leave_add(row):
+    return f"""
+    INSERT INTO RPT_EMPLOYEE_LEAVE SELECT {row}.Employee_Id, 1
+    WHERE {row}.Employee_Id IS NOT NULL AND {row}.Request_Status = 'Approved'
+    ON CONFLICT (Employee_Id) DO UPDATE SET Approved_Leaves = Approved_Leaves + 1;"""
+
+
+def _leave_sub(row):
+    return f"""
+    UPDATE RPT_EMPLOYEE_LEAVE SET Approved_Leaves = Approved_Leaves - 1
+    WHERE Employee_Id = {row}.Employee_Id AND {row}.Request_Status = 'Approved';
+    DELETE FROM RPT_EMPLOYEE_LEAVE WHERE Employee_Id = {row}.Employee_Id AND Approved_Leaves <= 0;"""
+
+
+def _adjustment_add(row):
+    return f"""
+    INSERT INTO RPT_EMPLOYEE_ADJUSTMENT
+    SELECT p.Employee_Id, {row}.Adjustment_Type, 1 FROM PAYROLL_RECORD p
+    WHERE p.Payroll_Record_Id = {row}.Payroll_Record_Id AND p.Employee_Id IS NOT NULL AND {row}.Adjustment_Type IS NOT NULL
+    ON CONFLICT (Employee_Id, Adjustment_Type) DO UPDATE SET Adjustment_Count = Adjustment_Count + 1;"""
+
+
+def _adjustment_sub(row):
+    employee = f"(SELECT Employee_Id FROM PAYROLL_RECORD WHERE Payroll_Record_Id = {row}.Payroll_Record_Id)"
+    return f"""
+    UPDATE RPT_EMPLOYEE_ADJUSTMENT SET Adjustment_Count = Adjustment_Count - 1
+    WHERE Employee_Id = {employee} AND Adjustment_Type = {row}.Adjustment_Type;
+    DELETE FROM RPT_EMPLOYEE_ADJUSTMENT WHERE Employee_Id = {employee} AND Adjustment_Count <= 0;"""
+
+
+# A payroll record moved to another employee takes its adjustments with it
+_MOVE_ADJUSTMENTS = """
+    UPDATE RPT_EMPLOYEE_ADJUSTMENT SET Adjustment_Count = Adjustment_Count - (
+        SELECT COUNT(*) FROM ADJUSTMENT a WHERE a.Payroll_Record_Id = OLD.Payroll_Record_Id
+        AND a.Adjustment_Type = RPT_EMPLOYEE_ADJUSTMENT.Adjustment_Type)
+    WHERE Employee_Id = OLD.Employee_Id;
+    DELETE FROM RPT_EMPLOYEE_ADJUSTMENT WHERE Employee_Id = OLD.Employee_Id AND Adjustment_Count <= 0;
+    INSERT INTO RPT_EMPLOYEE_ADJUSTMENT
+    SELECT NEW.Employee_Id, Adjustment_Type, COUNT(*) FROM ADJUSTMENT
+    WHERE Payroll_Record_Id = NEW.Payroll_Record_Id AND Adjustment_Type IS NOT NULL AND NEW.Employee_Id IS NOT NULL
+    GROUP BY Adjustment_Type
+    ON CONFLICT (Employee_Id, Adjustment_Type) DO UPDATE SET Adjustment_Count = Adjustment_Count + excluded.Adjustment_Count;"""
+
+# Trigger name -> (table, event, WHEN condition or None, body)
+TRIGGERS = {
+    "RPT_EMPLOYEE_INSERT": ("EMPLOYEE", "INSERT", None, _headcount_add("NEW")),
+    "RPT_EMPLOYEE_DELETE": ("EMPLOYEE", "DELETE", None, _headcount_sub("OLD")),
+    "RPT_EMPLOYEE_UPDATE": ("EMPLOYEE", "UPDATE OF Department_Id", "OLD.Department_Id IS NOT NEW.Department_Id",
+                            _headcount_sub("OLD") + _headcount_add("NEW")),
+    "RPT_PAYROLL_RECORD_INSERT": ("PAYROLL_RECORD", "INSERT", None, _pay_add("NEW")),
+    "RPT_PAYROLL_RECORD_DELETE": ("PAYROLL_RECORD", "DELETE", None, _pay_sub("OLD")),
+    "RPT_PAYROLL_RECORD_UPDATE": ("PAYROLL_RECORD", "UPDATE OF Employee_Id, Net_Pay",
+                                  "OLD.Employee_Id IS NOT NEW.Employee_Id OR OLD.Net_Pay IS NOT NEW.Net_Pay",
+                                  _pay_sub("OLD") + _pay_add("NEW")),
+    "RPT_PAYROLL_RECORD_MOVE": ("PAYROLL_RECORD", "UPDATE OF Employee_Id", "OLD.Employee_Id IS NOT NEW.Employee_Id",
+                                _MOVE_ADJUSTMENTS),
+    "RPT_LEAVE_INSERT": ("LEAVE", "INSERT", None, _leave_add("NEW")),
+    "RPT_LEAVE_DELETE": ("LEAVE", "DELETE", None, _leave_sub("OLD")),
+    "RPT_LEAVE_UPDATE": ("LEAVE", "UPDATE OF Employee_Id, Request_Status",
+                         "OLD.Employee_Id IS NOT NEW.Employee_Id OR OLD.Request_Status IS NOT NEW.Request_Status",
+                         _leave_sub("OLD") + _leave_add("NEW")),
+    "RPT_ADJUSTMENT_INSERT": ("ADJUSTMENT", "INSERT", None, _adjustment_add("NEW")),
+    "RPT_ADJUSTMENT_DELETE": ("ADJUSTMENT", "DELETE", None, _adjustment_sub("OLD")),
+    "RPT_ADJUSTMENT_UPDATE": ("ADJUSTMENT", "UPDATE OF Payroll_Record_Id, Adjustment_Type",
+                              "OLD.Payroll_Record_Id IS NOT NEW.Payroll_Record_Id OR OLD.Adjustment_Type IS NOT NEW.Adjustment_Type",
+                              _adjustment_sub("OLD") + _adjustment_add("NEW")),
+}
+
+
+def _trigger_sql(name: str):
+    table, event, when, body = TRIGGERS[name]
+    when_sql = f" WHEN {when}" if when else ""
+    return f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table}{when_sql}\nBEGIN{body}\nEND;"
+
+
+# Report name -> (title, SQL over the summaries, equivalent SQL over the base tables)
+REPORTS = {
+    "headcount": (
+        "Employees per department",
+        """SELECT d.Department_Name, h.Employee_Count FROM RPT_DEPARTMENT_HEADCOUNT h
+           JOIN DEPARTMENT d ON d.Department_Id = h.Department_Id ORDER BY d.Department_Name;""",
+        """SELECT d.Department_Name, COUNT(e.Employee_Id) AS Employee_Count FROM EMPLOYEE e
+           JOIN DEPARTMENT d ON d.Department_Id = e.Department_Id
+           GROUP BY e.Department_Id, d.Department_Name ORDER BY d.Department_Name;""",
+    ),
+    "net_pay": (
+        "Average net pay by department",
+        """SELECT d.Department_Name, SUM(p.Record_Count) AS Payroll_Records,
+                  ROUND(SUM(p.Net_Pay_Total) * 1.0 / SUM(p.Record_Count), 2) AS Average_Net_Pay,
+                  SUM(p.Net_Pay_Total * 1.0 / p.Record_Count > 1000) AS Employees_Averaging_Over_1000
+           FROM RPT_EMPLOYEE_PAY p JOIN EMPLOYEE e ON e.Employee_Id = p.Employee_Id
+           JOIN DEPARTMENT d ON d.Department_Id = e.Department_Id
+           GROUP BY d.Department_Id, d.Department_Name ORDER BY d.Department_Name;""",
+        """SELECT Department_Name, SUM(Records) AS Payroll_Records,
+                  ROUND(SUM(Total) * 1.0 / SUM(Records), 2) AS Average_Net_Pay,
+                  SUM(Total * 1.0 / Records > 1000) AS Employees_Averaging_Over_1000
+           FROM (SELECT d.Department_Id, d.Department_Name, COUNT(p.Net_Pay) AS Records, SUM(p.Net_Pay) AS Total
+                 FROM EMPLOYEE e JOIN DEPARTMENT d ON d.Department_Id = e.Department_Id
+                 JOIN PAYROLL_RECORD p ON p.Employee_Id = e.Employee_Id
+                 WHERE p.Net_Pay IS NOT NULL GROUP BY e.Employee_Id)
+           GROUP BY Department_Id, Department_Name ORDER BY Department_Name;""",
+    ),
+    "max_pay": (
+        "Max net pay of consultants and managers",
+        """SELECT p.Max_Net_Pay AS Max_Pay, e.First_Name, e.Last_Name, e.Job_Title
+           FROM RPT_EMPLOYEE_PAY p JOIN EMPLOYEE e ON e.Employee_Id = p.Employee_Id
+           WHERE e.Job_Title IN ('Consultant', 'Manager') ORDER BY Max_Pay, e.Employee_Id;""",
+        """SELECT MAX(p.Net_Pay) AS Max_Pay, e.First_Name, e.Last_Name, e.Job_Title
+           FROM EMPLOYEE e JOIN PAYROLL_RECORD p ON p.Employee_Id = e.Employee_Id
+           WHERE e.Job_Title IN ('Consultant', 'Manager')
+           GROUP BY e.Employee_Id HAVING Max_Pay IS NOT NULL ORDER BY Max_Pay, e.Employee_Id;""",
+    ),
+    "marketing_consultants_on_leave": (
+        "Marketing consultants with approved leave",
+        """SELECT e.First_Name, e.Last_Name FROM EMPLOYEE e
+           JOIN DEPARTMENT d ON d.Department_Id = e.Department_Id
+           JOIN RPT_EMPLOYEE_LEAVE l ON l.Employee_Id = e.Employee_Id
+           WHERE e.Job_Title = 'Consultant' AND d.Department_Name = 'Marketing' ORDER BY e.Employee_Id;""",
+        """SELECT e.First_Name, e.Last_Name FROM EMPLOYEE e
+           JOIN DEPARTMENT d ON d.Department_Id = e.Department_Id
+           WHERE e.Job_Title = 'Consultant' AND d.Department_Name = 'Marketing' AND EXISTS (
+               SELECT 1 FROM LEAVE l WHERE l.Employee_Id = e.Employee_Id AND l.Request_Status = 'Approved')
+           ORDER BY e.Employee_Id;""",
+    ),
+    "no_approved_leave": (
+        "Employees without approved leave",
+        """SELECT e.* FROM EMPLOYEE e
+           WHERE NOT EXISTS (SELECT 1 FROM RPT_EMPLOYEE_LEAVE l WHERE l.Employee_Id = e.Employee_Id)
+           ORDER BY e.Employee_Id;""",
+        """SELECT * FROM EMPLOYEE
+           EXCEPT
+           SELECT e.* FROM LEAVE l, EMPLOYEE e WHERE l.Employee_Id = e.Employee_Id AND l.Request_Status = 'Approved'
+           ORDER BY Employee_Id;""",
+    ),
+    "leave_or_adjustment": (
+        "Approved leave and adjustment types per employee",
+        """SELECT e.First_Name, e.Last_Name, e.Job_Title, 'Approved' AS Request_Status FROM EMPLOYEE e
+           JOIN RPT_EMPLOYEE_LEAVE l ON l.Employee_Id = e.Employee_Id
+           UNION
+           SELECT e.First_Name, e.Last_Name, e.Job_Title, a.Adjustment_Type FROM EMPLOYEE e
+           JOIN RPT_EMPLOYEE_ADJUSTMENT a ON a.Employee_Id = e.Employee_Id;""",
+        """SELECT e.First_Name, e.Last_Name, e.Job_Title, l.Request_Status
+           FROM EMPLOYEE e, LEAVE l WHERE e.Employee_Id = l.Employee_Id AND l.Request_Status = 'Approved'
+           UNION
+           SELECT e.First_Name, e.Last_Name, e.Job_Title, a.Adjustment_Type
+           FROM EMPLOYEE e, ADJUSTMENT a, PAYROLL_RECORD p
+           WHERE e.Employee_Id = p.Employee_Id AND p.Payroll_Record_Id = a.Payroll_Record_Id;""",
+    ),
+}
+
+
+def _existing(conn, kind: str):
+    return {name.upper() for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = ?;", (kind,)).fetchall()}
+
+
+# Recompute every summary from the base tables (inside the caller's transaction)
+def rebuild(conn):
+    for stmt in REBUILD_SQL.split(";"):
+        if stmt.strip():
+            conn.execute(stmt)
+
+
+# Create the summaries and triggers if the base tables exist (filling them once), drop them if not
+# Returns "installed", "dropped" or None when nothing had to change
+def ensure(pool: db.ConnectionPool = db.pool):
+    with pool.write() as conn:
+        tables = _existing(conn, "table")
+        triggers = _existing(conn, "trigger")
+        if not all(t in tables for t in SOURCE_TABLES):
+            if not any(t in tables for t in SUMMARY_TABLES):
+                return None
+            for name in TRIGGERS:
+                conn.execute(f"DROP TRIGGER IF EXISTS {name};")
+            for table in SUMMARY_TABLES:
+                conn.execute(f"DROP TABLE IF EXISTS {table};")
+            return "dropped"
+        if all(t in tables for t in SUMMARY_TABLES) and all(name in triggers for name in TRIGGERS):
+            return None
+        conn.execute("BEGIN;")
+        for stmt in SUMMARY_SQL.split(";"):
+            if stmt.strip():
+                conn.execute(stmt)
+        for name in TRIGGERS:
+            conn.execute(_trigger_sql(name))
+        # the summaries may be missing changes made while the triggers did not exist
+        rebuild(conn)
+    return "installed"
+
+
+# Run a report: (column names, rows as dicts); live=True computes it from the base tables instead
+def run(name: str, live: bool = False, pool: db.ConnectionPool = db.pool):
+    _, summary_sql, live_sql = REPORTS[name]
+    with pool.read() as conn, tracing.span("sql", f"report:{name}") as span:
+        cur = conn.execute(live_sql if live else summary_sql)
+        columns = [d[0] for d in cur.description]
+        rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+        span.rows = len(rows)
+        return columns, rows
@@ -0,0 +1,232 @@
+import threading
+from collections import OrderedDict
+
+import db
+import schema
+import tracing
+from table_cache import cache as table_cache
+
+'''
+-- SERVER-SIDE (INFINITE) ROW MODEL -- :
+The grids can run with rowModelType="infinite". The browser then asks for blocks
+of rows through the grid's getRowsRequest prop ({startRow, endRow, sortModel, filterModel})
+and the server answers through getRowsResponse ({rowData, rowCount}).
+
+1. Sorting and filtering are translated into the SQL ORDER BY / WHERE clauses and run in SQLite.
+2. Blocks are read with keyset pagination: the last sort key of every block that was
+   served is remembered, so the next block is "WHERE (sort key) > (last key) LIMIT n"
+   instead of "OFFSET n" (which re-reads every skipped row).
+   A jump to a block with no remembered key (dragging the scrollbar) falls back to OFFSET.
+3. The primary key is always appended to the ORDER BY so the ordering is total and stable.
+4. Remembered keys and counts are tied to the table's version (table_cache.py), so they are not reused
+   after the table changes, even when the change was made by another process (e.g. a background job).
+'''
+
+# Rows per block requested by the grid and number of blocks the browser keeps
+BLOCK_SIZE = 100
+MAX_BLOCKS_IN_CACHE = 10
+
+# Upper bound on remembered block boundaries / row counts
+MAX_CURSORS = 512
+
+
+# Small thread-safe LRU used for keyset cursors and row counts
+class _LRU:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_cursors = _LRU(MAX_CURSORS)  # (table, version, sort, filter, row index) -> sort key of the row before it
+_counts = _LRU(MAX_CURSORS)   # (table, version, filter) -> total matching rows
+
+
+# Forget remembered cursors and counts (call after the table contents change)
+def reset_cursors():
+    _cursors.clear()
+    _counts.clear()
+
+
+# Column names/types and primary key of a table (from the schema cache, see schema.py)
+def table_columns(conn, table_name: str):
+    table = schema.cache.table(table_name, conn)
+    if table is None:
+        raise ValueError(f"no such table: {table_name}")
+    return dict(table.types), list(table.pk)
+
+
+# Translate one (simple) AG Grid filter condition into SQL
+def _condition_sql(col: str, cond: dict):
+    kind = cond.get("filterType", "text")
+    op = cond.get("type", "equals")
+    if kind == "date":
+        # date filter sends "YYYY-MM-DD hh:mm:ss"; stored dates are "YYYY-MM-DD"
+        value = (cond.get("dateFrom") or "")[:10] or None
+        value_to = (cond.get("dateTo") or "")[:10] or None
+    else:
+        value = cond.get("filter")
+        value_to = cond.get("filterTo")
+    q = f'"{col}"'
+    if op == "blank":
+        return f"({q} IS NULL OR {q} = '')", []
+    if op == "notBlank":
+        return f"({q} IS NOT NULL AND {q} != '')", []
+    if kind == "text":
+        value = "" if value is None else str(value)
+        like = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        text_ops = {
+            "contains": (f"{q} LIKE ? ESCAPE '\\'", f"%{like}%"),
+            "notContains": (f"({q} IS NULL OR {q} NOT LIKE ? ESCAPE '\\')", f"%{like}%"),
+            "startsWith": (f"{q} LIKE ? ESCAPE '\\'", f"{like}%"),
+            "endsWith": (f"{q} LIKE ? ESCAPE '\\'", f"%{like}"),
+            "equals": (f"lower({q}) = lower(?)", value),
+            "notEqual": (f"({q} IS NULL OR lower({q}) != lower(?))", value),
+        }
+        if op not in text_ops:
+            raise ValueError(f"Unsupported text filter: {op}")
+        sql, param = text_ops[op]
+        return sql, [param]
+    # number and date filters
+    cmp_ops = {
+        "equals": "=", "notEqual": "!=", "lessThan": "<", "lessThanOrEqual": "<=",
+        "greaterThan": ">", "greaterThanOrEqual": ">=",
+    }
+    if op == "inRange":
+        return f"{q} BETWEEN ? AND ?", [value, value_to]
+    if op not in cmp_ops:
+        raise ValueError(f"Unsupported {kind} filter: {op}")
+    return f"{q} {cmp_ops[op]} ?", [value]
+
+
+# Translate a grid filterModel into a WHERE clause (without the WHERE keyword) and parameters
+def filter_to_sql(filter_model: dict, columns: dict):
+    clauses, params = [], []
+    for col, model in (filter_model or {}).items():
+        if col not in columns:
+            raise ValueError(f"Unknown filter column: {col}")
+        if "conditions" in model:
+            joiner = " OR " if model.get("operator") == "OR" else " AND "
+            parts = [_condition_sql(col, c) for c in model["conditions"]]
+            clauses.append("(" + joiner.join(p[0] for p in parts) + ")")
+            for p in parts:
+                params.extend(p[1])
+        else:
+            sql, p = _condition_sql(col, model)
+            clauses.append(sql)
+            params.extend(p)
+    return " AND ".join(clauses), params
+
+
+# Normalized ORDER BY as a list of (column, "asc"/"desc"), primary key appended as tie breaker
+def sort_columns(sort_model: list, columns: dict, pk: list):
+    order = []
+    for s in sort_model or []:
+        col = s.get("colId")
+        if col not in columns:
+            raise ValueError(f"Unknown sort column: {col}")
+        order.append((col, "desc" if s.get("sort") == "desc" else "asc"))
+    used = {c for c, _ in order}
+    order.extend((k, "asc") for k in pk if k not in used)
+    return order
+
+
+# WHERE clause selecting rows strictly after `key` in the given ordering (SQLite sorts NULLs first)
+def keyset_to_sql(order: list, key: tuple):
+    if not order:
+        return "1", []
+    (col, direction), rest = order[0], order[1:]
+    value = key[0]
+    q = f'"{col}"' if col != "rowid" else "rowid"
+    tail_sql, tail_params = keyset_to_sql(rest, key[1:]) if rest else ("0", [])
+    if direction == "asc":
+        if value is None:
+            return f"({q} IS NOT NULL OR ({q} IS NULL AND {tail_sql}))", tail_params
+        return f"({q} > ? OR ({q} = ? AND {tail_sql}))", [value, value] + tail_params
+    if value is None:
+        return f"({q} IS NULL AND {tail_sql})", tail_params
+    return f"({q} < ? OR {q} IS NULL OR ({q} = ? AND {tail_sql}))", [value, value] + tail_params
+
+
+# Answer one getRowsRequest for a table
+def fetch_block(conn, table_name: str, request: dict):
+    """
+    Run the SQL for one block of an infinite-model grid and return the
+    getRowsResponse dict ({"rowData": [...], "rowCount": n}).
+    """
+    columns, pk = table_columns(conn, table_name)
+    start = int(request.get("startRow") or 0)
+    end = int(request.get("endRow") or start + BLOCK_SIZE)
+    filter_model = request.get("filterModel") or {}
+    order = sort_columns(request.get("sortModel"), columns, pk)
+
+    where_sql, where_params = filter_to_sql(filter_model, columns)
+    filter_sig = repr(sorted(filter_model.items()))
+    sort_sig = repr(order)
+    version = table_cache.version(table_name.upper())
+
+    # Row count is computed once per (table, filter) and re-read when the grid restarts at row 0
+    count_key = (table_name, version, filter_sig)
+    row_count = None if start == 0 else _counts.get(count_key)
+    if row_count is None:
+        sql = f"SELECT COUNT(*) FROM {table_name}" + (f" WHERE {where_sql}" if where_sql else "")
+        row_count = conn.execute(sql, where_params).fetchone()[0]
+        _counts.put(count_key, row_count)
+
+    clauses, params = ([where_sql], list(where_params)) if where_sql else ([], [])
+    offset = 0
+    cursor_key = _cursors.get((table_name, version, sort_sig, filter_sig, start)) if start > 0 else None
+    if cursor_key is not None:
+        seek_sql, seek_params = keyset_to_sql(order, cursor_key)
+        clauses.append(seek_sql)
+        params.extend(seek_params)
+    else:
+        offset = start
+
+    key_cols = [c for c, _ in order]
+    select_cols = list(columns) + [c for c in key_cols if c not in columns]
+    select_sql = ", ".join(f'"{c}"' if c != "rowid" else "rowid" for c in select_cols)
+    order_sql = ", ".join((f'"{c}"' if c != "rowid" else "rowid") + f" {d.upper()}" for c, d in order)
+    sql = f"SELECT {select_sql} FROM {table_name}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" ORDER BY {order_sql} LIMIT ? OFFSET ?"
+    params.extend([end - start, offset])
+
+    rows = conn.execute(sql, params).fetchall()
+    if rows:
+        last = dict(zip(select_cols, rows[-1]))
+        _cursors.put((table_name, version, sort_sig, filter_sig, start + len(rows)), tuple(last[c] for c in key_cols))
+    row_data = [dict(zip(columns, r[:len(columns)])) for r in rows]
+
+    if len(rows) < end - start:
+        # reached the end of the result: the exact count is known
+        row_count = start + len(rows)
+        _counts.put(count_key, row_count)
+    return {"rowData": row_data, "rowCount": row_count}
+
+
+# Answer a getRowsRequest using a pooled read connection
+def get_rows(table_name: str, request: dict, pool: db.ConnectionPool = db.pool):
+    with pool.read() as conn, tracing.span("sql", table_name) as span:
+        block = fetch_block(conn, table_name, request)
+        span.rows = len(block["rowData"])
+        return block
@@ -0,0 +1,156 @@
+import os
+import re
+import threading
+
+import db
+
+'''
+-- SCHEMA INTROSPECTION CACHE -- :
+Column names, types, primary keys, foreign keys, indexes and CHECK (... IN (...)) enumerations of
+every table, read once from the PRAGMAs and sqlite_master instead of scanning a table to learn its columns.
+
+    t = schema.cache.table("LEAVE")
+    t.column_names, t.pk, t.enums["Leave_Type"]   # ['Leave_Id', ...], ['Leave_Id'], ['Paid', 'Unpaid', 'Sick']
+
+1. Everything is loaded in one pass (PRAGMA table_info / foreign_key_list / index_list per table).
+2. The cache is refreshed after Drop / Create (cache.refresh()) and whenever PRAGMA schema_version
+   changes (e.g. another process altered the schema), which costs one PRAGMA per lookup.
+3. column_defs() turns the metadata into typed AG Grid column definitions: number / date columns get
+   the matching cellDataType and filter, CHECK enumerations get a dropdown editor. AG Grid's date editor
+   only reads 'YYYY-MM-DD': date columns holding other values (text_dates) are shown as plain text.
+'''
+
+# SQLite type names treated as numbers
+NUMBER_TYPES = ("INT", "NUMBER", "FLOAT", "REAL", "DOUBLE", "NUMERIC", "DECIMAL")
+
+# AG Grid filter for each column kind
+FILTERS = {"number": "agNumberColumnFilter", "date": "agDateColumnFilter", "text": "agTextColumnFilter"}
+
+# CHECK(<column> IN ('a', 'b', ...)) in a CREATE TABLE statement
+_CHECK_IN_RE = re.compile(r"CHECK\s*\(\s*\"?(\w+)\"?\s+IN\s*\(([^()]*)\)\s*\)", re.I | re.S)
+_QUOTED_RE = re.compile(r"'((?:[^']|'')*)'")
+
+
+class Column:
+    def __init__(self, name: str, sql_type: str, notnull: bool, default, pk: int):
+        self.name = name
+        self.sql_type = (sql_type or "").upper()
+        self.notnull = notnull
+        self.default = default
+        self.pk = pk  # position in the primary key (0 = not part of it)
+
+    @property
+    def kind(self):
+        if self.sql_type.startswith("DATE"):
+            return "date"
+        if any(t in self.sql_type for t in NUMBER_TYPES):
+            return "number"
+        return "text"
+
+
+class TableSchema:
+    def __init__(self, name: str, columns: list, foreign_keys: list, indexes: list, enums: dict):
+        self.name = name
+        self.columns = {c.name: c for c in columns}
+        self.column_names = [c.name for c in columns]
+        self.types = {c.name: c.sql_type for c in columns}
+        # primary key columns in declared order (rowid for tables without one)
+        self.pk = [c.name for c in sorted(columns, key=lambda c: c.pk) if c.pk > 0] or ["rowid"]
+        self.foreign_keys = foreign_keys  # [{"column", "table", "to"}]
+        self.indexes = indexes            # [{"name", "unique", "origin", "columns"}]
+        self.enums = enums                # {column: [allowed values]}
+
+
+# Allowed values of every "CHECK(col IN (...))" in a CREATE TABLE statement
+def parse_enums(create_sql: str):
+    enums = {}
+    for col, values in _CHECK_IN_RE.findall(create_sql or ""):
+        enums[col] = [v.replace("''", "'") for v in _QUOTED_RE.findall(values)]
+    return enums
+
+
+# Read the metadata of every table from a connection
+def load_schema(conn):
+    tables = {}
+    found = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%';").fetchall()
+    for name, create_sql in found:
+        # row layout: (cid, name, type, notnull, dflt_value, pk)
+        columns = [Column(r[1], r[2], bool(r[3]), r[4], r[5])
+                   for r in conn.execute(f'PRAGMA table_info("{name}")').fetchall()]
+        # row layout: (id, seq, table, from, to, on_update, on_delete, match)
+        foreign_keys = [{"column": r[3], "table": r[2].upper(), "to": r[4]}
+                        for r in conn.execute(f'PRAGMA foreign_key_list("{name}")').fetchall()]
+        indexes = []
+        # row layout: (seq, name, unique, origin, partial)
+        for r in conn.execute(f'PRAGMA index_list("{name}")').fetchall():
+            cols = [c[2] for c in conn.execute(f'PRAGMA index_info("{r[1]}")').fetchall()]
+            indexes.append({"name": r[1], "unique": bool(r[2]), "origin": r[3], "columns": cols})
+        # CHECK column names are matched case-insensitively against the real column names
+        by_upper = {c.name.upper(): c.name for c in columns}
+        enums = {by_upper[c.upper()]: v for c, v in parse_enums(create_sql).items() if c.upper() in by_upper}
+        tables[name.upper()] = TableSchema(name, columns, foreign_keys, indexes, enums)
+    return tables
+
+
+class SchemaCache:
+    def __init__(self, pool: db.ConnectionPool = db.pool):
+        self.pool = pool
+        self._tables = None
+        self._schema_version = None
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    # Reload on next use (call after statements that change the schema)
+    def refresh(self):
+        with self._lock:
+            self._tables = None
+
+    def _current(self, conn):
+        schema_version = conn.execute("PRAGMA schema_version;").fetchone()[0]
+        with self._lock:
+            if self._tables is None or schema_version != self._schema_version:
+                self._tables = load_schema(conn)
+                self._schema_version = schema_version
+                self.loads += 1
+            return self._tables
+
+    # Metadata of every table: {upper-case name: TableSchema}
+    def tables(self, conn=None):
+        if conn is not None:
+            return self._current(conn)
+        with self.pool.read() as conn:
+            return self._current(conn)
+
+    # Metadata of one table (None if it does not exist)
+    def table(self, table_name: str, conn=None):
+        return self.tables(conn).get(table_name.upper())
+
+
+# Shared cache for local.db
+cache = SchemaCache()
+# a forked child (background job) may inherit the lock while held by another thread
+os.register_at_fork(after_in_child=lambda: setattr(cache, "_lock", threading.Lock()))
+
+
+# Typed AG Grid column definitions for a table
+def column_defs(table: TableSchema, editable: bool = True, sortable: bool = False, text_dates=()):
+    defs = []
+    for col in table.columns.values():
+        d = {"headerName": col.name, "field": col.name, "editable": editable, "filter": FILTERS[col.kind]}
+        if sortable:
+            d["sortable"] = True
+        if col.name in table.enums:
+            # CHECK (... IN (...)) column: pick one of the allowed values
+            d["cellDataType"] = "text"
+            d["cellEditor"] = "agSelectCellEditor"
+            d["cellEditorParams"] = {"values": ([] if col.notnull else [None]) + table.enums[col.name]}
+        elif col.kind == "number":
+            d["cellDataType"] = "number"
+        elif col.kind == "date" and col.name not in text_dates:
+            # dates are stored as 'YYYY-MM-DD' strings
+            d["cellDataType"] = "dateString"
+        else:
+            d["cellDataType"] = "text"
+        defs.append(d)
+    return defs
@@ -0,0 +1,240 @@
+import argparse
+import re
+
+import db
+import tracing
+
+'''
+-- GLOBAL FULL-TEXT SEARCH -- :
+SEARCH_INDEX is an SQLite FTS5 index over
+
+    EMPLOYEE     first and last name, email, job title
+    DEPARTMENT   department name
+    LEAVE        leave type and request status
+    ADJUSTMENT   adjustment type
+
+1. The FTS rowid of a row is <primary key> * 8 + <table code> (SOURCES), so a trigger finds the entry of a
+   changed row by rowid; deleting by an UNINDEXED column would scan the whole index.
+2. Triggers on the four tables keep the index current on insert, update and delete, in the writer's
+   transaction. ensure() installs the index and triggers (after Create, or from db_objects.py) and fills
+   the index once, like reports.ensure(); after Drop they are dropped.
+3. search(text, page) turns the words typed into prefix terms ("pri coo" -> "pri"* AND "coo"*) and returns
+   one page of matches ranked with bm25 (WEIGHTS: name, then email, job title, type). Ranking has to score
+   every match, so matches are only counted up to RANK_LIMIT: a search with more (e.g. "sick" on millions of
+   leave rows) is listed in rowid order instead, its total is shown as "5000+" and only its first
+   RANK_LIMIT matches can be paged through. Either way a lookup reads at most RANK_LIMIT index entries.
+4. Clicking a result opens the row's tab and SHOW_ROW_JS (a clientside callback per grid) scrolls the grid to
+   the row and selects it, once the grid has its rows. With the infinite row model the rows are not all in the
+   browser, so FILTER_ROW_JS filters the grid down to the row instead (row_model.py applies the filter in SQL).
+'''
+
+# Results per page
+PAGE_SIZE = 20
+
+# Matches counted per search; searches with more are not ranked (see 3.)
+RANK_LIMIT = 5000
+
+# Words of a search used (the rest are ignored)
+MAX_TERMS = 8
+
+# bm25 weight of each indexed column, in INDEX_COLUMNS order
+INDEX_COLUMNS = ("Name", "Email", "Title", "Kind")
+WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+
+# Marks around the matched words in result labels (see label_parts())
+MATCH_START, MATCH_END = "\x02", "\x03"
+
+# Table -> (code, primary key, base columns, {index column: expression over the row})
+SOURCES = {
+    "EMPLOYEE": (1, "Employee_Id", ("First_Name", "Last_Name", "Email", "Job_Title"), {
+        "Name": "trim(coalesce({r}.First_Name, '') || ' ' || coalesce({r}.Last_Name, ''))",
+        "Email": "{r}.Email",
+        "Title": "{r}.Job_Title"}),
+    "DEPARTMENT": (2, "Department_Id", ("Department_Name",), {
+        "Name": "{r}.Department_Name"}),
+    "LEAVE": (3, "Leave_Id", ("Leave_Type", "Request_Status"), {
+        "Kind": "trim(coalesce({r}.Leave_Type, '') || ' ' || coalesce({r}.Request_Status, ''))"}),
+    "ADJUSTMENT": (4, "Adjustment_Id", ("Adjustment_Type",), {
+        "Kind": "{r}.Adjustment_Type"}),
+}
+TABLE_CODES = {code: table for table, (code, _, _, _) in SOURCES.items()}
+
+INDEX_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS SEARCH_INDEX USING fts5({", ".join(INDEX_COLUMNS)}, prefix='2 3');
+INSERT INTO SEARCH_INDEX (SEARCH_INDEX, rank) VALUES ('rank', 'bm25({", ".join(map(str, WEIGHTS))})');
+"""
+
+INDEX_TABLES = ("SEARCH_INDEX",)
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def _insert(table: str, row: str):
+    code, pk, _, columns = SOURCES[table]
+    values = ", ".join(expr.format(r=row) for expr in columns.values())
+    return f"""
+    INSERT INTO SEARCH_INDEX (rowid, {", ".join(columns)})
+    SELECT {row}.{pk} * 8 + {code}, {values} WHERE typeof({row}.{pk}) = 'integer';"""
+
+
+def _delete(table: str, row: str):
+    code, pk, _, _ = SOURCES[table]
+    return f"""
+    DELETE FROM SEARCH_INDEX WHERE rowid = {row}.{pk} * 8 + {code} AND typeof({row}.{pk}) = 'integer';"""
+
+
+# Trigger name -> (table, event, WHEN condition or None, body)
+TRIGGERS = {}
+for _table, (_, _pk, _columns, _) in SOURCES.items():
+    TRIGGERS[f"SEARCH_{_table}_INSERT"] = (_table, "INSERT", None, _insert(_table, "NEW"))
+    TRIGGERS[f"SEARCH_{_table}_DELETE"] = (_table, "DELETE", None, _delete(_table, "OLD"))
+    TRIGGERS[f"SEARCH_{_table}_UPDATE"] = (_table, f"UPDATE OF {', '.join((_pk,) + _columns)}", None,
+                                           _delete(_table, "OLD") + _insert(_table, "NEW"))
+
+
+def _trigger_sql(name: str):
+    table, event, when, body = TRIGGERS[name]
+    when_sql = f" WHEN {when}" if when else ""
+    return f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table}{when_sql}\nBEGIN{body}\nEND;"
+
+
+def _existing(conn, kind: str):
+    return {name.upper() for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = ?;", (kind,)).fetchall()}
+
+
+# Refill the index from the four tables
+def rebuild(conn):
+    conn.execute("DELETE FROM SEARCH_INDEX;")
+    for table, (code, pk, _, columns) in SOURCES.items():
+        values = ", ".join(expr.format(r=table) for expr in columns.values())
+        conn.execute(f"INSERT INTO SEARCH_INDEX (rowid, {', '.join(columns)}) "
+                     f"SELECT {pk} * 8 + {code}, {values} FROM {table} WHERE typeof({pk}) = 'integer';")
+    # merge the index segments written by the bulk insert
+    conn.execute("INSERT INTO SEARCH_INDEX (SEARCH_INDEX) VALUES ('optimize');")
+
+
+# Create the index and its triggers if the searched tables exist, drop them if not
+# Returns "installed", "dropped" or None when nothing had to change
+def ensure(pool: db.ConnectionPool = db.pool):
+    with pool.write() as conn:
+        tables = _existing(conn, "table")
+        triggers = _existing(conn, "trigger")
+        if not all(t in tables for t in SOURCES):
+            if not any(t in tables for t in INDEX_TABLES):
+                return None
+            for name in TRIGGERS:
+                conn.execute(f"DROP TRIGGER IF EXISTS {name};")
+            for table in reversed(INDEX_TABLES):
+                conn.execute(f"DROP TABLE IF EXISTS {table};")
+            return "dropped"
+        if all(t in tables for t in INDEX_TABLES) and all(name in triggers for name in TRIGGERS):
+            return None
+        conn.execute("BEGIN;")
+        for stmt in INDEX_SQL.split(";"):
+            if stmt.strip():
+                conn.execute(stmt)
+        for name in TRIGGERS:
+            conn.execute(_trigger_sql(name))
+        # changes made while the triggers did not exist are not in the index
+        rebuild(conn)
+    return "installed"
+
+
+# Words of a search as FTS5 prefix terms
+def terms(text: str):
+    return _WORD_RE.findall((text or "").lower())[:MAX_TERMS]
+
+
+# One page of search results
+def search(text: str, page: int = 1, page_size: int = PAGE_SIZE, pool: db.ConnectionPool = db.pool):
+    """
+    Search the index for rows containing every word of `text` (as a prefix).
+
+    Returns {"total", "more", "pages", "page", "results"}; every result is
+    {"table", "id", "label"} where label holds the row's indexed text with the
+    matched words between MATCH_START and MATCH_END. "more" is True when
+    the search matched more than RANK_LIMIT rows: total is then RANK_LIMIT and
+    the results are in index order.
+    """
+    words = terms(text)
+    found = {"total": 0, "more": False, "pages": 0, "page": 1, "results": []}
+    if not words:
+        return found
+    match = " AND ".join(f'"{w}"*' for w in words)
+    highlights = ", ".join(f"highlight(SEARCH_INDEX, {i}, ?, ?)" for i in range(len(INDEX_COLUMNS)))
+    with pool.read() as conn, tracing.span("sql", "search") as span:
+        # count the matches, but stop after RANK_LIMIT + 1
+        total = conn.execute("SELECT count(*) FROM (SELECT 1 FROM SEARCH_INDEX WHERE SEARCH_INDEX MATCH ? LIMIT ?);",
+                             (match, RANK_LIMIT + 1)).fetchone()[0]
+        ranked = total <= RANK_LIMIT
+        total = min(total, RANK_LIMIT)
+        pages = max(1, -(-total // page_size))
+        page = min(max(1, int(page or 1)), pages)
+        offset = (page - 1) * page_size
+        rows = conn.execute(
+            f"SELECT rowid, {highlights} FROM SEARCH_INDEX WHERE SEARCH_INDEX MATCH ? "
+            f"ORDER BY {'rank' if ranked else 'rowid'} LIMIT ? OFFSET ?;",
+            [MATCH_START, MATCH_END] * len(INDEX_COLUMNS) + [match, min(page_size, total - offset), offset]).fetchall()
+        span.rows = len(rows)
+    found.update(total=total, more=not ranked, pages=pages, page=page)
+    for rowid, *texts in rows:
+        found["results"].append({"table": TABLE_CODES.get(rowid & 7), "id": rowid >> 3,
+                                 "label": " · ".join(t for t in texts if t)})
+    return found
+
+
+# A result label as [(text, matched)] pieces
+def label_parts(label: str):
+    parts = []
+    for i, piece in enumerate(re.split(f"[{MATCH_START}{MATCH_END}]", label)):
+        if piece:
+            # pieces alternate: outside, inside the marks, outside, ...
+            parts.append((piece, i % 2 == 1))
+    return parts
+
+
+# Clientside callback: (search target, grid rowData, grid id) -> the grid's scrollTo and selectedRows, and
+# clears the target once the grid has its rows (a grid built columnar gets them in a second step, see wire.py)
+SHOW_ROW_JS = """
+function (target, rowData, gridId) {
+    const no_update = window.dash_clientside.no_update;
+    if (!target || target.grid !== gridId || !rowData || !rowData.length) {
+        return [no_update, no_update, no_update];
+    }
+    const found = rowData.some(function (row) {
+        return String(row[target.column]) === target.row_id;
+    });
+    if (!found) {
+        // e.g. the row was removed in the grid since the search
+        return [no_update, no_update, null];
+    }
+    return [{rowId: target.row_id, rowPosition: "middle"}, {ids: [target.row_id]}, null];
+}
+"""
+
+# Clientside callback: (search target, grid columnDefs, grid id) -> the grid's filterModel (infinite row model)
+FILTER_ROW_JS = """
+function (target, columnDefs, gridId) {
+    const no_update = window.dash_clientside.no_update;
+    if (!target || target.grid !== gridId || !columnDefs) {
+        return [no_update, no_update];
+    }
+    const filterModel = {};
+    filterModel[target.column] = {filterType: "number", type: "equals", filter: target.id};
+    return [filterModel, null];
+}
+"""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search employees, departments, leave and adjustments")
+    parser.add_argument("text")
+    parser.add_argument("--page", type=int, default=1)
+    args = parser.parse_args()
+    ensure()
+    result = search(args.text, args.page)
+    print(f"{result['total']}{'+' if result['more'] else ''} match(es), page {result['page']} of {result['pages']}")
+    for r in result["results"]:
+        label = "".join(f"[{text}]" if matched else text for text, matched in label_parts(r["label"]))
+        print(f"{r['table']:<12} {r['id']:>10}  {label}")
@@ -0,0 +1,301 @@
+import re
+from pathlib import Path
+
+import db
+import indexes
+
+'''
+-- TRANSACTIONAL BULK SQL LOADER -- :
+Used by the Drop / Create / Populate buttons (through run_sql_file in app.py).
+
+1. The script is parsed once: it is split on semicolons that are outside quotes and comments.
+2. The whole script runs in ONE transaction (one fsync at COMMIT instead of one per statement).
+   Every statement / batch runs inside a SAVEPOINT, so a failing statement is undone on its own
+   and the rest of the script still loads, like before.
+3. Runs of consecutive "INSERT INTO t (cols) VALUES (...)" statements with the same table and
+   column list are collapsed into one prepared statement run with executemany.
+   If a batch fails it is replayed statement by statement to report which statements failed.
+4. By default foreign keys are checked on every statement, so a violating statement fails and is reported
+   like any other error. Optionally (defer_foreign_keys) they are checked once at the end instead: rows the
+   script inserted that still violate a foreign key are then skipped and reported, and if a row that existed
+   before the load violates one (e.g. the script deleted its parent) the whole load is rolled back.
+   Optionally secondary indexes of the loaded tables are dropped during the load and rebuilt afterwards.
+5. progress(done, total) is called after every statement / batch with the number of statements run so far.
+6. After a load that inserted rows the query planner statistics are refreshed (indexes.analyze).
+
+Errors keep the same format as before: "Stmt #<n> error: <message> -- preview: <first 200 chars>".
+'''
+
+# Statements per executemany batch
+BATCH_SIZE = 5000
+
+# Quoted strings, identifiers and comments (where a semicolon does not end a statement), or a semicolon
+_TOKEN_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/|;", re.S)
+_LEADING_COMMENTS_RE = re.compile(r"^(?:\s*(?:--[^\n]*(?:\n|$)|/\*.*?\*/))*\s*", re.S)
+_INSERT_RE = re.compile(r"(INSERT\s+INTO\s+([\w\".\[\]`]+)\s*\(([^()]*)\)\s*VALUES\s*)(.*)$", re.I | re.S)
+_LITERAL = r"'(?:[^']|'')*'|NULL\b|[-+]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?"
+_TUPLE = rf"\(\s*(?:{_LITERAL})(?:\s*,\s*(?:{_LITERAL}))*\s*\)"
+_VALUES_RE = re.compile(rf"\s*{_TUPLE}(?:\s*,\s*{_TUPLE})*\s*", re.I)
+_LITERAL_RE = re.compile(rf"({_LITERAL})|\)", re.I)
+
+# One-row "(v, v, ...)" pattern per column count, capturing each literal
+_row_patterns = {}
+
+
+def _row_pattern(n: int):
+    pattern = _row_patterns.get(n)
+    if pattern is None:
+        pattern = re.compile(r"\(\s*" + r"\s*,\s*".join([f"({_LITERAL})"] * n) + r"\s*\)\s*", re.I)
+        _row_patterns[n] = pattern
+    return pattern
+
+
+def _literal(tok: str):
+    c = tok[0]
+    if c == "'":
+        return tok[1:-1].replace("''", "'")
+    if c in "nN":
+        return None
+    if "." in tok or "e" in tok or "E" in tok:
+        return float(tok)
+    return int(tok)
+
+
+# Split script text into statements (semicolons inside strings or comments are ignored)
+def split_statements(text: str):
+    statements = []
+    start = 0
+    for m in _TOKEN_RE.finditer(text):
+        if m.group(0) == ";":
+            stmt = text[start:m.start()].strip()
+            if stmt:
+                statements.append(stmt)
+            start = m.end()
+    tail = text[start:].strip()
+    if tail:
+        statements.append(tail)
+    return statements
+
+
+# Parse "(v, v), (v, v)" into a list of tuples; None if anything is not a plain literal
+def parse_values(text: str):
+    if _VALUES_RE.fullmatch(text) is None:
+        return None
+    rows, row = [], []
+    for m in _LITERAL_RE.finditer(text):
+        tok = m.group(1)
+        if tok is None:
+            # closing parenthesis ends a row
+            rows.append(tuple(row))
+            row = []
+        else:
+            row.append(_literal(tok))
+    return rows
+
+
+# Rows of the VALUES part of an INSERT with n columns; None if not made of plain literals
+def _parse_rows(text: str, n: int):
+    m = _row_pattern(n).fullmatch(text)
+    if m is not None:
+        # common case: a single row
+        return [tuple(_literal(tok) for tok in m.groups())]
+    rows = parse_values(text)
+    if not rows or any(len(r) != n for r in rows):
+        return None
+    return rows
+
+
+# (header, table, columns, rows) for a batchable INSERT statement, else None
+# header is the statement text up to and including VALUES
+def parse_insert(stmt: str, known_header=None):
+    if known_header is not None and stmt.startswith(known_header[0]):
+        # same text as the previous INSERT up to VALUES: skip re-parsing the header
+        header, table, cols = known_header
+        rows = _parse_rows(stmt[len(header):], len(cols))
+        return (header, table, cols, rows) if rows else None
+    m = _INSERT_RE.match(stmt)
+    if m is None and stmt[:1] in "-/":
+        m = _INSERT_RE.match(_LEADING_COMMENTS_RE.sub("", stmt, count=1))
+    if m is None:
+        return None
+    header, table, col_text, values = m.groups()
+    cols = tuple(c.strip() for c in col_text.split(","))
+    rows = _parse_rows(values, len(cols))
+    return (header, table, cols, rows) if rows else None
+
+
+# Group parsed statements into ("sql", i, stmt) and ("batch", table, insert_sql, [(i, stmt, rows), ...]) steps
+def plan(statements: list, batch_size: int = BATCH_SIZE):
+    steps = []
+    run_key, run = None, []
+
+    def flush():
+        if run:
+            table, cols = run_key
+            insert_sql = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(['?'] * len(cols))})"
+            steps.append(("batch", table, insert_sql, list(run)))
+            run.clear()
+
+    known_header = None
+    for i, stmt in enumerate(statements, start=1):
+        parsed = parse_insert(stmt, known_header)
+        if parsed is None:
+            flush()
+            run_key = None
+            steps.append(("sql", i, stmt))
+            continue
+        header, table, cols, rows = parsed
+        known_header = (header, table, cols)
+        key = (table, cols)
+        if key != run_key or len(run) >= batch_size:
+            flush()
+            run_key = key
+        run.append((i, stmt, rows))
+    flush()
+    return steps
+
+
+def _error(i: int, e: Exception, stmt: str):
+    return f"Stmt #{i} error: {e} -- preview: {stmt[:200]!r}"
+
+
+# Run a batch of INSERT statements; on failure replay it one statement at a time
+def _run_batch(cur, insert_sql: str, run: list, errors: list):
+    cur.execute("SAVEPOINT load_batch;")
+    try:
+        cur.executemany(insert_sql, [row for _, _, rows in run for row in rows])
+        cur.execute("RELEASE load_batch;")
+        return
+    except Exception:
+        cur.execute("ROLLBACK TO load_batch;")
+    for i, stmt, rows in run:
+        cur.execute("SAVEPOINT load_stmt;")
+        try:
+            cur.executemany(insert_sql, rows)
+            cur.execute("RELEASE load_stmt;")
+        except Exception as e:
+            cur.execute("ROLLBACK TO load_stmt;")
+            cur.execute("RELEASE load_stmt;")
+            errors.append(_error(i, e, stmt))
+    cur.execute("RELEASE load_batch;")
+
+
+def _run_statement(cur, i: int, stmt: str, errors: list):
+    cur.execute("SAVEPOINT load_stmt;")
+    try:
+        cur.execute(stmt)
+        cur.execute("RELEASE load_stmt;")
+    except Exception as e:
+        cur.execute("ROLLBACK TO load_stmt;")
+        cur.execute("RELEASE load_stmt;")
+        errors.append(_error(i, e, stmt))
+
+
+# Highest rowid of every (rowid) table before a load: rows above it are the ones the script inserted
+def _max_rowids(cur):
+    found = {}
+    tables = cur.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%';").fetchall()
+    for name, sql in tables:
+        if sql.upper().startswith("CREATE VIRTUAL") or "WITHOUT ROWID" in sql.upper():
+            continue
+        found[name.upper()] = cur.execute(f'SELECT coalesce(max(rowid), 0) FROM "{name}";').fetchone()[0]
+    return found
+
+
+# At the end of a deferred load: skip (delete) the rows the script inserted that still violate a foreign key,
+# reporting each; raises if a row that existed before the load violates one (the load is then rolled back)
+def _skip_fk_violations(cur, before: dict, errors: list):
+    while True:
+        violations = cur.execute("PRAGMA foreign_key_check;").fetchall()
+        if not violations:
+            return
+        existing = []
+        for table, rowid, parent, _ in violations:
+            row = cur.execute(f"SELECT * FROM {table} WHERE rowid = ?;", (rowid,)).fetchone()
+            if rowid is None or rowid <= before.get(table.upper(), 0):
+                existing.append(f"Foreign key error: {table} row {row!r} (not loaded by this script) "
+                                f"references a missing {parent} row")
+                continue
+            errors.append(f"Foreign key error: {table} row {row!r} references a missing {parent} row; skipped")
+            cur.execute(f"DELETE FROM {table} WHERE rowid = ?;", (rowid,))
+        if existing:
+            errors.extend(existing)
+            raise ValueError(f"{len(existing)} row(s) that existed before the load would violate a foreign key")
+
+
+# Secondary (explicitly created) indexes on the given tables: [(name, create_sql)]
+def _secondary_indexes(cur, tables: set):
+    found = cur.execute(
+        "SELECT name, tbl_name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL;").fetchall()
+    return [(name, sql) for name, tbl, sql in found if tbl.upper() in tables]
+
+
+# Load a script of SQL statements in one transaction
+def load_sql(text: str, pool: db.ConnectionPool = db.pool, defer_foreign_keys: bool = False,
+             defer_indexes: bool = False, batch_size: int = BATCH_SIZE, progress=None, analyze: bool = True):
+    """
+    Run every statement of `text` in a single transaction, batching same-shape
+    INSERTs with executemany.
+
+    Returns (errors, stats): errors uses the "Stmt #n error: ... -- preview: ..."
+    format, stats counts statements, batches and inserted rows.
+    progress, if given, is called as progress(statements done, total statements).
+    """
+    statements = split_statements(text)
+    steps = plan(statements, batch_size)
+    errors = []
+    stats = {"statements": len(statements), "batches": 0, "rows": 0}
+    with pool.write() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN;")
+        try:
+            if defer_foreign_keys:
+                before = _max_rowids(cur)
+                cur.execute("PRAGMA defer_foreign_keys = ON;")
+            dropped = []
+            if defer_indexes:
+                tables = {re.sub(r'[\"\[\]`]', "", s[1]).upper() for s in steps if s[0] == "batch"}
+                dropped = _secondary_indexes(cur, tables)
+                for name, _ in dropped:
+                    cur.execute(f'DROP INDEX "{name}";')
+            done = 0
+            for step in steps:
+                if step[0] == "batch":
+                    _, _, insert_sql, run = step
+                    _run_batch(cur, insert_sql, run, errors)
+                    stats["batches"] += 1
+                    stats["rows"] += sum(len(rows) for _, _, rows in run)
+                    done += len(run)
+                else:
+                    _, i, stmt = step
+                    _run_statement(cur, i, stmt, errors)
+                    done += 1
+                if progress is not None:
+                    progress(done, len(statements))
+            for name, sql in dropped:
+                try:
+                    cur.execute(sql)
+                except Exception as e:
+                    errors.append(f"Rebuilding index {name} failed: {e}")
+            if defer_foreign_keys:
+                _skip_fk_violations(cur, before, errors)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            errors.append(f"Load rolled back: {e}")
+            return errors, stats
+        if analyze and stats["rows"]:
+            # row counts changed a lot: let the planner see them (a failure here does not undo the load)
+            try:
+                indexes.analyze(conn)
+            except Exception as e:
+                errors.append(f"ANALYZE failed: {e}")
+    return errors, stats
+
+
+# Load a .sql file (see load_sql)
+def load_sql_file(path: str, **kwargs):
+    p = Path(path)
+    if not p.exists():
+        return [f"SQL file not found: {path}"], {"statements": 0, "batches": 0, "rows": 0}
+    return load_sql(p.read_text(encoding="utf-8"), **kwargs)
@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+
+import db
+
+'''
+-- PER-TABLE VERSIONED QUERY CACHE -- :
+1. Every table has a version counter. Writes made by the app (commit / populate / drop / create)
+   call bump(table) so only that table's cached result is invalidated.
+2. Writes made outside this process (another worker, the sqlite3 shell) are caught with
+   PRAGMA data_version, which changes on a connection whenever another connection commits.
+   Since it does not say which table changed, every table is bumped in that case.
+3. Cached results are evicted least-recently-used once max_entries or max_rows is exceeded.
+4. Versions are strings "<process epoch>:<counter>" so a version seen by the browser can be
+   compared safely even when requests are served by different workers.
+   A forked child (background job) starts a new epoch and drops the cached results.
+'''
+
+
+class TableCache:
+    def __init__(self, db_path: str = db.DB_PATH, max_entries: int = 16, max_rows: int = 500_000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._epoch = uuid.uuid4().hex[:8]
+        self._counter = 0
+        self._versions = {}         # table -> version string
+        self._entries = OrderedDict()  # table -> (version, value, rows)
+        self._rows = 0
+        self._lock = threading.RLock()
+        self._watch_conn = None
+        self._data_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # PRAGMA data_version of a long-lived connection (changes when any other connection commits)
+    def _read_data_version(self):
+        if self._watch_conn is None:
+            self._watch_conn = db.connect(self.db_path)
+        return self._watch_conn.execute("PRAGMA data_version;").fetchone()[0]
+
+    def _next_version(self):
+        self._counter += 1
+        return f"{self._epoch}:{self._counter}"
+
+    # Bump every table if the database was changed by someone else since we last looked
+    def _check_external_writes(self):
+        try:
+            dv = self._read_data_version()
+        except sqlite3.Error:
+            return
+        if self._data_version is not None and dv != self._data_version:
+            self._bump_all()
+        self._data_version = dv
+
+    def _bump_all(self):
+        for table in list(self._versions):
+            self._versions[table] = self._next_version()
+        self._entries.clear()
+        self._rows = 0
+
+    # Current version of a table
+    def version(self, table_name: str):
+        with self._lock:
+            self._check_external_writes()
+            if table_name not in self._versions:
+                self._versions[table_name] = self._next_version()
+            return self._versions[table_name]
+
+    # Mark tables as changed by this process (no tables = all tables)
+    def bump(self, *table_names):
+        with self._lock:
+            if table_names:
+                for table in table_names:
+                    table = table.upper()
+                    self._versions[table] = self._next_version()
+                    entry = self._entries.pop(table, None)
+                    if entry is not None:
+                        self._rows -= entry[2]
+            else:
+                self._bump_all()
+            # our own commit also moved data_version; absorb it so it is not seen as an outside write
+            try:
+                self._data_version = self._read_data_version()
+            except sqlite3.Error:
+                pass
+
+    # Cached value for a table, calling loader(table_name) on a miss; loader errors are not cached
+    def get(self, table_name: str, loader, size=len):
+        table_name = table_name.upper()
+        with self._lock:
+            version = self.version(table_name)
+            entry = self._entries.get(table_name)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                self._entries.move_to_end(table_name)
+                return entry[1]
+            self.misses += 1
+        value = loader(table_name)
+        rows = size(value) if value is not None else 0
+        with self._lock:
+            # the table may have been bumped while loading; only store a result for the version we read
+            if self._versions.get(table_name) == version and rows <= self.max_rows:
+                old = self._entries.pop(table_name, None)
+                if old is not None:
+                    self._rows -= old[2]
+                self._entries[table_name] = (version, value, rows)
+                self._rows += rows
+                while self._entries and (len(self._entries) > self.max_entries or self._rows > self.max_rows):
+                    _, (_, _, evicted_rows) = self._entries.popitem(last=False)
+                    self._rows -= evicted_rows
+                    self.evictions += 1
+        return value
+
+    # In a forked child: new epoch and lock, no cached results, own watcher connection
+    def _reset_after_fork(self):
+        self._lock = threading.RLock()
+        self._epoch = uuid.uuid4().hex[:8]
+        self._versions = {t: self._next_version() for t in self._versions}
+        self._entries.clear()
+        self._rows = 0
+        if self._watch_conn is not None:
+            # the parent's connection must not be used (or closed) here
+            _inherited.append(self._watch_conn)
+            self._watch_conn = None
+        self._data_version = None
+
+    # Hit/miss counters and current size
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "rows": self._rows,
+            }
+
+
+# Watcher connections inherited from the parent process (kept referenced so they are never closed)
+_inherited = []
+
+# Shared cache for local.db
+cache = TableCache()
+os.register_at_fork(after_in_child=cache._reset_after_fork)
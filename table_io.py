@@ -0,0 +1,277 @@
+import argparse
+import csv
+import io
+from pathlib import Path
+
+import db
+import indexes
+import schema
+
+'''
+-- STREAMING TABLE IMPORT / EXPORT (CSV, PARQUET) -- :
+Tables are moved in chunks of CHUNK_ROWS rows, so memory use is one chunk whatever the table size.
+
+1. Export iterates a cursor with fetchmany(): CSV text is produced chunk by chunk (iter_csv, the /export
+   route streams it), Parquet gets one row group per chunk. Parquet column types follow what the column
+   actually stores (SQLite columns are not strictly typed): text, else real, else integer. In a text
+   column that also holds numbers, the numbers are written as text.
+2. Import reads the file chunk by chunk (csv.reader / pyarrow ParquetFile.iter_batches) and inserts every
+   chunk with one executemany, all in ONE transaction. The header names the columns (any order, missing
+   columns get their default); empty CSV fields are NULL and SQLite's column affinity turns numeric text
+   into numbers.
+3. A chunk that fails (FOREIGN KEY, CHECK, UNIQUE, NOT NULL) is rolled back to its savepoint and replayed
+   row by row: each bad row is reported as "Chunk <c>, row <n>: <error>" (n counts data rows from 1, i.e.
+   CSV line n + 1) and skipped, the rest of the file is still loaded.
+4. progress(rows done, total rows or None if unknown) is called after every chunk.
+
+Parquet needs pyarrow, which is only imported when a Parquet file is read or written.
+    python table_io.py export EMPLOYEE employees.csv
+    python table_io.py import EMPLOYEE employees.parquet
+'''
+
+# Rows per chunk (one fetchmany / one executemany)
+CHUNK_ROWS = 5000
+
+# Failed rows reported one by one (the rest are only counted)
+MAX_ERRORS = 100
+
+FORMATS = ("csv", "parquet")
+
+
+# File format from the file name's extension
+def file_format(path: str):
+    fmt = Path(path).suffix.lower().lstrip(".")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported file type {Path(path).suffix!r} (expected .csv or .parquet)")
+    return fmt
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet files need pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+def _table(table_name: str, conn=None):
+    table = schema.cache.table(table_name, conn)
+    if table is None:
+        raise ValueError(f"Table {table_name} does not exist")
+    return table
+
+
+def _select_sql(table):
+    return "SELECT " + ", ".join(f'"{c}"' for c in table.column_names) + f" FROM {table.name};"
+
+
+# CSV text of a table (header first) and the number of rows in it, one chunk of rows at a time
+def _csv_chunks(table_name: str, pool: db.ConnectionPool, chunk_rows: int):
+    with pool.read() as conn:
+        table = _table(table_name, conn)
+        cur = conn.execute(_select_sql(table))
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(table.column_names)
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if rows:
+                writer.writerows(rows)
+            yield out.getvalue(), len(rows)
+            if not rows:
+                return
+            out.seek(0)
+            out.truncate()
+
+
+# CSV text of a table (header first), one chunk of rows at a time
+def iter_csv(table_name: str, pool: db.ConnectionPool = db.pool, chunk_rows: int = CHUNK_ROWS):
+    for text, _ in _csv_chunks(table_name, pool, chunk_rows):
+        yield text
+
+
+# Arrow schema of a table from the values its columns hold
+def _arrow_schema(conn, table):
+    pa = _pyarrow()
+    checks = ", ".join(f"max(typeof(\"{c}\") IN ('text', 'blob')), max(typeof(\"{c}\") = 'real'), "
+                       f"max(typeof(\"{c}\") = 'integer')" for c in table.column_names)
+    found = conn.execute(f"SELECT {checks} FROM {table.name};").fetchone()
+    fields = []
+    for i, name in enumerate(table.column_names):
+        text, real, integer = found[3 * i:3 * i + 3]
+        if text:
+            kind = pa.string()
+        elif real:
+            kind = pa.float64()
+        elif integer:
+            kind = pa.int64()
+        else:
+            # only NULLs: use the declared type
+            kind = pa.float64() if table.columns[name].kind == "number" else pa.string()
+        fields.append(pa.field(name, kind))
+    return pa.schema(fields)
+
+
+# Values of one column as its Arrow type takes them: SQLite does not enforce the declared types, so a string
+# column can also hold numbers (and blobs), which are written as their text
+def _arrow_values(values, kind, pa):
+    if kind != pa.string():
+        return values
+    return [v if v is None or isinstance(v, str) else
+            v.decode("utf-8", "replace") if isinstance(v, bytes) else str(v) for v in values]
+
+
+# Write a table to a Parquet file (path or binary file object), one row group per chunk
+def write_parquet(table_name: str, sink, pool: db.ConnectionPool = db.pool, chunk_rows: int = CHUNK_ROWS):
+    pa = _pyarrow()
+    rows_written = 0
+    with pool.read() as conn:
+        table = _table(table_name, conn)
+        arrow_schema = _arrow_schema(conn, table)
+        cur = conn.execute(_select_sql(table))
+        with pa.parquet.ParquetWriter(sink, arrow_schema) as writer:
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                columns = list(zip(*rows))
+                writer.write_batch(pa.RecordBatch.from_arrays(
+                    [pa.array(_arrow_values(values, field.type, pa), type=field.type)
+                     for values, field in zip(columns, arrow_schema)],
+                    schema=arrow_schema))
+                rows_written += len(rows)
+    return rows_written
+
+
+# Export a table to a .csv or .parquet file; returns the number of rows written
+def export_table(table_name: str, path: str, pool: db.ConnectionPool = db.pool, chunk_rows: int = CHUNK_ROWS):
+    if file_format(path) == "parquet":
+        return write_parquet(table_name, path, pool, chunk_rows)
+    rows_written = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for text, rows in _csv_chunks(table_name, pool, chunk_rows):
+            f.write(text)
+            rows_written += rows
+    return rows_written
+
+
+# Header and chunks of rows of a CSV file (a path or a text file object)
+def _read_csv(source, chunk_rows: int):
+    f = open(source, newline="", encoding="utf-8-sig") if isinstance(source, (str, Path)) else source
+    try:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        yield header, None
+        chunk = []
+        for row in reader:
+            # empty fields are NULL
+            chunk.append([v if v != "" else None for v in row])
+            if len(chunk) == chunk_rows:
+                yield chunk, None
+                chunk = []
+        if chunk:
+            yield chunk, None
+    finally:
+        if f is not source:
+            f.close()
+
+
+# Header, total row count and chunks of rows of a Parquet file (a path or a binary file object)
+def _read_parquet(source, chunk_rows: int):
+    pa = _pyarrow()
+    parquet = pa.parquet.ParquetFile(source)
+    yield parquet.schema_arrow.names, parquet.metadata.num_rows
+    for batch in parquet.iter_batches(batch_size=chunk_rows):
+        yield list(zip(*(column.to_pylist() for column in batch.columns))), None
+
+
+# Insert one chunk; if it fails, replay it row by row to report (and skip) the failing rows
+def _insert_chunk(cur, sql: str, rows: list, chunk_no: int, first_row: int, errors: list, stats: dict):
+    cur.execute("SAVEPOINT import_chunk;")
+    try:
+        cur.executemany(sql, rows)
+        cur.execute("RELEASE import_chunk;")
+        stats["inserted"] += len(rows)
+        return
+    except Exception:
+        cur.execute("ROLLBACK TO import_chunk;")
+    for n, row in enumerate(rows, start=first_row):
+        try:
+            cur.execute(sql, row)
+            stats["inserted"] += 1
+        except Exception as e:
+            # e.g. a constraint failed, or the row has the wrong number of values
+            stats["failed"] += 1
+            if stats["failed"] <= MAX_ERRORS:
+                errors.append(f"Chunk {chunk_no}, row {n}: {e}")
+    cur.execute("RELEASE import_chunk;")
+
+
+# Import a CSV or Parquet file into a table in one transaction
+def import_table(table_name: str, source, fmt: str = None, pool: db.ConnectionPool = db.pool,
+                 chunk_rows: int = CHUNK_ROWS, progress=None, analyze: bool = True):
+    """
+    Insert the rows of `source` (a path, or a file object with fmt given) into
+    table_name, CHUNK_ROWS rows per executemany, in a single transaction.
+
+    Returns (errors, stats): errors lists the rows that were skipped
+    ("Chunk <c>, row <n>: <error>"), stats counts rows read, inserted and
+    failed and the chunks. progress, if given, is called as
+    progress(rows done, total rows or None) after every chunk.
+    """
+    fmt = fmt or file_format(str(source))
+    errors = []
+    stats = {"rows": 0, "inserted": 0, "failed": 0, "chunks": 0}
+    try:
+        chunks = _read_parquet(source, chunk_rows) if fmt == "parquet" else _read_csv(source, chunk_rows)
+        header, total = next(chunks)
+    except Exception as e:
+        return [f"Could not read {fmt} file: {e}"], stats
+    with pool.write() as conn:
+        try:
+            table = _table(table_name, conn)
+            by_name = {c.upper(): c for c in table.column_names}
+            unknown = [h for h in header if h.upper() not in by_name]
+            if unknown or not header:
+                return [f"{table_name} has no column(s) {', '.join(map(repr, unknown)) or '(empty header)'}; "
+                        f"nothing imported"], stats
+            columns = [by_name[h.upper()] for h in header]
+            sql = (f"INSERT INTO {table.name} (" + ", ".join(f'"{c}"' for c in columns) + ") VALUES ("
+                   + ", ".join(["?"] * len(columns)) + ");")
+            cur = conn.cursor()
+            cur.execute("BEGIN;")
+            for rows, _ in chunks:
+                stats["chunks"] += 1
+                _insert_chunk(cur, sql, rows, stats["chunks"], stats["rows"] + 1, errors, stats)
+                stats["rows"] += len(rows)
+                if progress is not None:
+                    progress(stats["rows"], total)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            stats["inserted"] = 0
+            return [f"Import rolled back: {e}"], stats
+        if stats["failed"] > MAX_ERRORS:
+            errors.append(f"... and {stats['failed'] - MAX_ERRORS} more row(s) skipped")
+        if analyze and stats["inserted"]:
+            try:
+                indexes.analyze(conn)
+            except Exception as e:
+                errors.append(f"ANALYZE failed: {e}")
+    return errors, stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a table to, or import it from, a .csv or .parquet file")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("table")
+    parser.add_argument("path")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+    if args.action == "export":
+        print(f"{export_table(args.table, args.path, chunk_rows=args.chunk_rows)} row(s) written to {args.path}")
+    else:
+        errors, stats = import_table(args.table, args.path, chunk_rows=args.chunk_rows)
+        print("\n".join(errors))
+        print(stats)
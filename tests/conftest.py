@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+'''
+-- TEST DATABASE -- :
+The app's modules share one pool (db.pool) for the file named by PAYROLL_DB, read when db.py is first
+imported. PAYROLL_DB is pointed at a temporary file here, before any test imports the app's modules, and
+the `database` fixture rebuilds that file from create.sql + populate.sql for every test that uses it.
+'''
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="payroll-tests-"), "test.db")
+os.environ["PAYROLL_DB"] = DB_PATH
+
+
+# A fresh database with the tables of create.sql and the rows of populate.sql
+@pytest.fixture
+def database():
+    import db
+    import schema
+    import sql_loader
+    from table_cache import cache as table_cache
+
+    db.pool.close_all()
+    if table_cache._watch_conn is not None:
+        table_cache._watch_conn.close()
+        table_cache._watch_conn = None
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(DB_PATH + suffix):
+            os.remove(DB_PATH + suffix)
+    for name in ("create.sql", "populate.sql"):
+        errors, _ = sql_loader.load_sql_file(str(ROOT / name))
+        assert errors == [], errors
+    schema.cache.refresh()
+    table_cache.bump()
+    yield db.pool
+    db.pool.close_all()
+
+
+# All rows of a table as {primary key: row dict}
+def rows_by_key(pool, table_name: str, key: str):
+    with pool.read() as conn:
+        cur = conn.execute(f"SELECT * FROM {table_name};")
+        cols = [d[0] for d in cur.description]
+        return {r[cols.index(key)]: dict(zip(cols, r)) for r in cur.fetchall()}
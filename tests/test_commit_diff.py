@@ -0,0 +1,110 @@
+import pytest
+
+from conftest import rows_by_key
+
+app = pytest.importorskip("app")
+
+
+def _grid(pool):
+    rows = rows_by_key(pool, "LEAVE", "Leave_Id")
+    return rows, [dict(r) for r in rows.values()], [app.grid_row_key([k]) for k in rows]
+
+
+def test_only_changed_rows_are_written(database):
+    stored, grid, loaded = _grid(database)
+    first = grid[0]
+    first["Request_Status"] = "Denied" if first["Request_Status"] != "Denied" else "Approved"
+    # edited cells come back from the grid as strings
+    first["Leave_Id"] = str(first["Leave_Id"])
+    errors, counts = app.commit_table_diff("LEAVE", grid, pool=database, loaded_keys=loaded)
+    assert errors == []
+    assert counts == {"inserted": 0, "updated": 1, "deleted": 0}
+    after = rows_by_key(database, "LEAVE", "Leave_Id")
+    assert after[int(first["Leave_Id"])]["Request_Status"] == first["Request_Status"]
+    assert len(after) == len(stored)
+
+
+def test_rows_removed_in_the_grid_are_deleted(database):
+    stored, grid, loaded = _grid(database)
+    removed = grid.pop()
+    new_row = dict(grid[0], Leave_Id=999)
+    errors, counts = app.commit_table_diff("LEAVE", grid + [new_row], pool=database, loaded_keys=loaded)
+    assert errors == []
+    assert counts == {"inserted": 1, "updated": 0, "deleted": 1}
+    after = rows_by_key(database, "LEAVE", "Leave_Id")
+    assert removed["Leave_Id"] not in after and 999 in after
+
+
+def test_rows_added_by_someone_else_are_kept(database):
+    stored, grid, loaded = _grid(database)
+    with database.write() as conn:
+        conn.execute("INSERT INTO LEAVE (Leave_Id, Employee_Id, Leave_Type, Request_Status) "
+                     "SELECT 777, Employee_Id, 'Sick', 'Pending' FROM EMPLOYEE LIMIT 1;")
+    errors, counts = app.commit_table_diff("LEAVE", grid, pool=database, loaded_keys=loaded)
+    assert errors == []
+    assert counts["deleted"] == 0
+    assert 777 in rows_by_key(database, "LEAVE", "Leave_Id")
+
+
+def test_without_loaded_keys_nothing_is_deleted(database):
+    stored, grid, _ = _grid(database)
+    errors, counts = app.commit_table_diff("LEAVE", grid[:1], pool=database)
+    assert errors == [] and counts["deleted"] == 0
+    assert len(rows_by_key(database, "LEAVE", "Leave_Id")) == len(stored)
+
+
+def test_rows_deleted_by_someone_else_are_not_inserted_again(database):
+    stored, grid, loaded = _grid(database)
+    gone = grid[0]["Leave_Id"]
+    with database.write() as conn:
+        conn.execute("DELETE FROM LEAVE WHERE Leave_Id = ?;", (gone,))
+    errors, counts = app.commit_table_diff("LEAVE", grid, pool=database, loaded_keys=loaded)
+    assert counts["inserted"] == 0
+    assert len(errors) == 1 and f"Row {gone} " in errors[0]
+    assert gone not in rows_by_key(database, "LEAVE", "Leave_Id")
+
+
+def test_grid_panel_sends_the_loaded_keys(database):
+    grid, keys = app.grid_panel("LEAVE", "lev-grid")[:2]
+    assert keys.id == "lev-grid-loaded-keys"
+    assert sorted(keys.data) == sorted(_grid(database)[2])
+
+
+def test_added_rows_get_the_next_key_once(database):
+    stored, grid, loaded = _grid(database)
+    new_row = dict(grid[0], Leave_Id=None)
+    new_row[app.NEW_ROW_FIELD] = "abc"
+    errors, counts = app.commit_table_diff("LEAVE", grid + [new_row], pool=database, loaded_keys=loaded)
+    assert errors == [] and counts["inserted"] == 1
+    assert new_row["Leave_Id"] == max(stored) + 1
+    # the grid gets the key back: committing again inserts nothing
+    loaded = loaded + [app.grid_row_key([new_row["Leave_Id"]])]
+    errors, counts = app.commit_table_diff("LEAVE", grid + [new_row], pool=database, loaded_keys=loaded)
+    assert errors == [] and counts == {"inserted": 0, "updated": 0, "deleted": 0}
+    after = rows_by_key(database, "LEAVE", "Leave_Id")
+    assert len(after) == len(stored) + 1 and None not in after
+
+
+def test_rows_without_a_key_that_were_not_added_are_not_saved(database):
+    stored, grid, loaded = _grid(database)
+    errors, counts = app.commit_table_diff("LEAVE", grid + [dict(grid[0], Leave_Id="")], pool=database,
+                                           loaded_keys=loaded)
+    assert len(errors) == 1 and "no primary key" in errors[0]
+    assert counts["inserted"] == 0
+    assert len(rows_by_key(database, "LEAVE", "Leave_Id")) == len(stored)
+
+
+def test_only_the_rows_of_the_grid_are_read(database):
+    stored, grid, loaded = _grid(database)
+    statements = []
+    with database.write() as conn:
+        conn.set_trace_callback(statements.append)
+    try:
+        app.commit_table_diff("LEAVE", grid[:2], pool=database, loaded_keys=loaded[:3])
+    finally:
+        with database.write() as conn:
+            conn.set_trace_callback(None)
+    reads = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+    assert reads and all("commit_keys" in s for s in reads)
+    # the third loaded row was removed in the grid
+    assert len(rows_by_key(database, "LEAVE", "Leave_Id")) == len(stored) - 1
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+import db
+from conftest import rows_by_key
+
+
+def test_nested_reads_share_one_connection(database):
+    with database.read() as outer, database.read() as inner:
+        assert inner is outer
+    assert database.stats()["readers_open"] == 1
+
+
+def test_a_failed_write_is_rolled_back(database):
+    with pytest.raises(ZeroDivisionError):
+        with database.write() as conn:
+            conn.execute("BEGIN;")
+            conn.execute("DELETE FROM ADJUSTMENT;")
+            1 / 0
+    assert rows_by_key(database, "ADJUSTMENT", "Adjustment_Id")
+
+
+def test_connections_get_the_standard_pragmas(database):
+    with database.read() as conn:
+        assert conn.execute("PRAGMA foreign_keys;").fetchone() == (1,)
+        assert conn.execute("PRAGMA journal_mode;").fetchone() == ("wal",)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_a_forked_child_opens_its_own_connections(database):
+    with database.read() as conn:
+        conn.execute("SELECT 1;")
+    with database.write() as conn:
+        parent_writer = conn
+    pid = os.fork()
+    if pid == 0:
+        # child: the inherited connections are forgotten, new ones are opened on first use
+        status = 1
+        try:
+            if database.stats()["readers_open"] == 0 and database._writer is None:
+                with database.write() as conn:
+                    conn.execute("UPDATE DEPARTMENT SET Department_Name = 'Sales' WHERE Department_Id = 1;")
+                with database.read() as conn:
+                    status = 0 if conn.execute("SELECT Department_Name FROM DEPARTMENT WHERE Department_Id = 1;"
+                                               ).fetchone() == ("Sales",) else 2
+        finally:
+            os._exit(status)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    # the parent's pool is untouched and sees the child's commit
+    with database.write() as conn:
+        assert conn is parent_writer
+    assert rows_by_key(database, "DEPARTMENT", "Department_Id")[1]["Department_Name"] == "Sales"
+    assert db.pool is database
@@ -0,0 +1,32 @@
+import db_objects
+
+
+def test_a_fresh_database_has_everything_pending(database):
+    assert db_objects.pending(database) == ["reports", "payroll", "search"]
+
+
+def test_ensure_all_builds_what_is_pending(database):
+    done = db_objects.ensure_all(database)
+    assert done == {"reports": "installed", "payroll": "installed", "search": "installed", "fk_indexes": None}
+    assert db_objects.pending(database) == []
+    with database.write() as conn:
+        conn.execute("DROP TRIGGER SEARCH_LEAVE_UPDATE;")
+        conn.execute("DROP INDEX LEAVE_EMPLOYEE;")
+    assert db_objects.pending(database) == ["search", "fk_indexes"]
+
+
+def test_missing_objects_are_built_in_the_background(database):
+    thread = db_objects.ensure_in_background(database)
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert db_objects.pending(database) == []
+    assert db_objects.ensure_in_background(database) is None
+
+
+def test_nothing_is_pending_without_the_tables(database):
+    with database.write() as conn:
+        conn.execute("PRAGMA foreign_keys = OFF;")
+        for table in ("ADJUSTMENT", "PAYROLL_RECORD", "LEAVE", "EMPLOYEE", "DEPARTMENT", "PAYROLL_PERIOD"):
+            conn.execute(f"DROP TABLE {table};")
+        conn.execute("PRAGMA foreign_keys = ON;")
+    assert db_objects.pending(database) == []
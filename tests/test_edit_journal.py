@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+import edit_journal
+from conftest import rows_by_key
+
+
+@pytest.fixture
+def journal(database):
+    edit_journal.ensure_journal(database)
+    return database
+
+
+def _edit(key, value, version=0, table="EMPLOYEE", column="Job_Title"):
+    return {"table": table, "column": column, "key": [key], "old": None, "new": value, "version": version}
+
+
+def _employee_ids(pool):
+    return sorted(rows_by_key(pool, "EMPLOYEE", "Employee_Id"))
+
+
+def test_edits_are_written_and_journaled(journal):
+    writer = edit_journal.EditWriter(journal)
+    key = _employee_ids(journal)[0]
+    [result] = writer.submit([_edit(key, "Architect")])
+    assert result["status"] == "ok" and result["version"] == 1
+    assert rows_by_key(journal, "EMPLOYEE", "Employee_Id")[key]["Job_Title"] == "Architect"
+    with journal.read() as conn:
+        assert edit_journal.row_versions(conn, "EMPLOYEE") == {str(key): 1}
+
+
+def test_stale_edits_are_rejected(journal):
+    writer = edit_journal.EditWriter(journal)
+    key = _employee_ids(journal)[0]
+    writer.submit([_edit(key, "Architect")])
+    [result] = writer.submit([_edit(key, "Intern", version=0)])
+    assert result["status"] == "stale" and result["version"] == 1
+    assert rows_by_key(journal, "EMPLOYEE", "Employee_Id")[key]["Job_Title"] == "Architect"
+
+
+def test_concurrent_submissions_are_coalesced(journal):
+    writer = edit_journal.EditWriter(journal, flush_ms=50)
+    keys = _employee_ids(journal)
+    results = {}
+
+    def submit(key):
+        results[key] = writer.submit([_edit(key, f"Title {key}")])
+
+    threads = [threading.Thread(target=submit, args=(key,)) for key in keys]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(r[0]["status"] == "ok" for r in results.values())
+    assert writer.edits == len(keys) and writer.flushes < len(keys)
+    titles = {k: r["Job_Title"] for k, r in rows_by_key(journal, "EMPLOYEE", "Employee_Id").items()}
+    assert titles == {k: f"Title {k}" for k in keys}
+
+
+def test_a_bad_edit_only_fails_itself(journal):
+    writer = edit_journal.EditWriter(journal)
+    key = _employee_ids(journal)[0]
+    results = writer.submit([_edit(key, "x", table="NO_SUCH_TABLE"), _edit(key, "Architect"),
+                             _edit(key, "y", column="No_Such_Column")])
+    assert [r["status"] for r in results] == ["error", "ok", "error"]
+    assert "NO_SUCH_TABLE" in results[0]["error"]
+    assert rows_by_key(journal, "EMPLOYEE", "Employee_Id")[key]["Job_Title"] == "Architect"
+
+
+def test_undo_restores_the_old_value(journal):
+    writer = edit_journal.EditWriter(journal)
+    key = _employee_ids(journal)[0]
+    old = rows_by_key(journal, "EMPLOYEE", "Employee_Id")[key]["Job_Title"]
+    writer.submit([{**_edit(key, "Architect"), "old": old}], group="g1")
+    with journal.read() as conn:
+        assert edit_journal.undoable_groups(conn, "EMPLOYEE") == ["g1"]
+    [result] = edit_journal.undo_group("g1", journal)
+    assert result["status"] == "ok" and result["version"] == 2
+    assert rows_by_key(journal, "EMPLOYEE", "Employee_Id")[key]["Job_Title"] == old
+    with journal.read() as conn:
+        assert edit_journal.undoable_groups(conn, "EMPLOYEE") == []
+
+
+def test_delete_rows_by_key(journal):
+    ids = sorted(rows_by_key(journal, "LEAVE", "Leave_Id"))
+    assert edit_journal.delete_rows("LEAVE", [[k] for k in ids[:3]], journal) == 3
+    assert sorted(rows_by_key(journal, "LEAVE", "Leave_Id")) == ids[3:]
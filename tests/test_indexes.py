@@ -0,0 +1,71 @@
+import sqlite3
+import time
+
+import conftest
+import indexes
+import search
+
+SCAN_QUERY = "SELECT * FROM PAYROLL_RECORD WHERE Gross_Pay > ?"
+
+
+def _indexes(pool):
+    with pool.read() as conn:
+        return {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index';")}
+
+
+def test_read_queries_are_recorded_without_their_values(database):
+    indexes.log.clear()
+    with database.read() as conn:
+        conn.execute("SELECT * FROM PAYROLL_RECORD WHERE Gross_Pay > 100;").fetchall()
+        conn.execute("SELECT * FROM PAYROLL_RECORD WHERE Gross_Pay > 2500.5;").fetchall()
+    # statements run on the writer are not traced
+    with database.write() as conn:
+        conn.execute("SELECT * FROM EMPLOYEE WHERE Employee_Id = 4506;").fetchall()
+    assert indexes.log.top() == [(SCAN_QUERY + ";", 2)]
+
+
+def test_advice_suggests_an_index_without_creating_it(database):
+    before = _indexes(database)
+    [entry] = indexes.advise([(SCAN_QUERY, 3)], pool=database)
+    assert entry["table"] == "PAYROLL_RECORD" and entry["plan"].startswith("SCAN")
+    assert entry["suggestion"] == 'CREATE INDEX IF NOT EXISTS "IDX_PAYROLL_RECORD_Gross_Pay" ON PAYROLL_RECORD("Gross_Pay");'
+    assert not entry["applied"]
+    assert _indexes(database) == before
+
+
+def test_advice_does_not_wait_for_the_writer(database):
+    # another process holds the write lock: the advice only reads
+    other = sqlite3.connect(conftest.DB_PATH)
+    other.execute("BEGIN IMMEDIATE;")
+    try:
+        started = time.perf_counter()
+        [entry] = indexes.advise([(SCAN_QUERY, 1)], pool=database)
+        assert time.perf_counter() - started < 1
+        assert entry["suggestion"]
+    finally:
+        other.rollback()
+        other.close()
+
+
+def test_apply_creates_the_suggested_index(database):
+    [entry] = indexes.advise([(SCAN_QUERY, 1)], apply=True, pool=database)
+    assert entry["applied"]
+    assert "IDX_PAYROLL_RECORD_Gross_Pay" in _indexes(database)
+    # the scan is gone
+    assert indexes.advise([(SCAN_QUERY, 1)], pool=database) == []
+
+
+def test_schema_copy_plans_like_the_database(database):
+    search.ensure(database)
+    with database.write() as conn:
+        indexes.analyze(conn)
+    queries = [SCAN_QUERY, "SELECT rowid FROM SEARCH_INDEX WHERE SEARCH_INDEX MATCH ?",
+               "SELECT * FROM EMPLOYEE e JOIN LEAVE l ON l.Employee_Id = e.Employee_Id WHERE l.Request_Status = ?"]
+    with database.read() as conn:
+        copy = indexes.schema_copy(conn)
+        try:
+            assert copy.execute("SELECT count(*) FROM EMPLOYEE;").fetchone() == (0,)
+            for query in queries:
+                assert indexes.query_plan(copy, query) == indexes.query_plan(conn, query)
+        finally:
+            copy.close()
@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip("pandas")
+
+import payroll
+from conftest import rows_by_key
+
+
+@pytest.fixture
+def engine(database):
+    payroll.ensure(database)
+    return database
+
+
+def _records(pool):
+    return rows_by_key(pool, "PAYROLL_RECORD", "Payroll_Record_Id")
+
+
+def _dirty(pool):
+    with pool.read() as conn:
+        return {r for (r,) in conn.execute("SELECT Payroll_Record_Id FROM PAYROLL_DIRTY;")}
+
+
+def test_full_run_recomputes_totals_from_adjustments(engine):
+    # record 11 has one adjustment of 800 but stores a total of 600
+    result = payroll.run_period(1, incremental=False, pool=engine)
+    assert result["mode"] == "full" and result["records"] == 1 and result["updated"] == 1
+    record = _records(engine)[11]
+    assert record["Total_Adjustment"] == 800 and record["Net_Pay"] == 9800
+    # nothing changed since: a second run writes nothing
+    assert payroll.run_period(1, incremental=False, pool=engine)["updated"] == 0
+
+
+def test_records_without_adjustments_get_a_zero_total(engine):
+    with engine.write() as conn:
+        conn.execute("DELETE FROM ADJUSTMENT WHERE Payroll_Record_Id = 11;")
+    payroll.run_period(1, incremental=False, pool=engine)
+    record = _records(engine)[11]
+    assert record["Total_Adjustment"] == 0 and record["Net_Pay"] == 9000
+
+
+def test_triggers_mark_changed_records_dirty(engine):
+    payroll.run_period(3, incremental=False, pool=engine)
+    assert _dirty(engine) == set()
+    with engine.write() as conn:
+        conn.execute("UPDATE ADJUSTMENT SET Amount = -250 WHERE Adjustment_Id = 503;")
+        conn.execute("INSERT INTO ADJUSTMENT (Adjustment_Id, Adjustment_Type, Payroll_Record_Id, Amount) "
+                     "VALUES (600, 'Tax', 14, -100);")
+    assert _dirty(engine) == {13, 14}
+
+
+def test_incremental_run_only_recomputes_dirty_records(engine):
+    first = payroll.run_period(3, pool=engine)
+    # a period without a full run is run in full
+    assert first["mode"] == "full" and first["records"] == 2
+    with engine.write() as conn:
+        conn.execute("UPDATE ADJUSTMENT SET Amount = -250 WHERE Adjustment_Id = 503;")
+    result = payroll.run_period(3, pool=engine)
+    assert result["mode"] == "incremental" and result["records"] == 1 and result["updated"] == 1
+    assert _records(engine)[13]["Net_Pay"] == 5250
+    assert _dirty(engine) == set()
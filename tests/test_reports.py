@@ -0,0 +1,82 @@
+import pytest
+
+import reports
+
+
+@pytest.fixture
+def summaries(database):
+    assert reports.ensure(database) == "installed"
+    return database
+
+
+def _rows(name, live, pool):
+    _, rows = reports.run(name, live=live, pool=pool)
+    return sorted(tuple(row.values()) for row in rows)
+
+
+def _assert_reports_match(pool):
+    for name in reports.REPORTS:
+        assert _rows(name, False, pool) == _rows(name, True, pool), name
+
+
+def test_summaries_match_the_base_tables_after_install(summaries):
+    _assert_reports_match(summaries)
+    # nothing to do on a second call
+    assert reports.ensure(summaries) is None
+
+
+def test_employee_changes_reach_the_summaries(summaries):
+    with summaries.write() as conn:
+        conn.execute("""INSERT INTO EMPLOYEE (Employee_Id, Department_Id, First_Name, Last_Name, Job_Title,
+                        Hire_Date, Bank_Account, Email)
+                        VALUES (4600, 1, 'Ada', 'Byron', 'Consultant', '2026-01-05', 11112222, 'ada@work.com');""")
+        conn.execute("UPDATE EMPLOYEE SET Department_Id = 2 WHERE Employee_Id = 4508;")
+        conn.execute("UPDATE EMPLOYEE SET Job_Title = 'Consultant' WHERE Employee_Id = 4506;")
+    _assert_reports_match(summaries)
+    with summaries.write() as conn:
+        conn.execute("DELETE FROM EMPLOYEE WHERE Employee_Id = 4600;")
+    _assert_reports_match(summaries)
+
+
+def test_payroll_record_changes_reach_the_summaries(summaries):
+    with summaries.write() as conn:
+        conn.execute("""INSERT INTO PAYROLL_RECORD (Payroll_Record_Id, Employee_Id, Payroll_Period_Id,
+                        Gross_Pay, Net_Pay, Total_Adjustment, Payout_Date)
+                        VALUES (900, 4513, 1, 5000, 99999, 0, '2026-01-31');""")
+        (top,) = conn.execute("SELECT Payroll_Record_Id FROM PAYROLL_RECORD ORDER BY Net_Pay DESC LIMIT 1 OFFSET 1;").fetchone()
+        # lowering a maximum makes the summary fall back to the next largest value
+        conn.execute("UPDATE PAYROLL_RECORD SET Net_Pay = 1 WHERE Payroll_Record_Id = ?;", (top,))
+        conn.execute("UPDATE PAYROLL_RECORD SET Employee_Id = 4506 WHERE Payroll_Record_Id = 900;")
+        conn.execute("UPDATE PAYROLL_RECORD SET Net_Pay = NULL WHERE Payroll_Record_Id = 11;")
+    _assert_reports_match(summaries)
+    with summaries.write() as conn:
+        conn.execute("DELETE FROM ADJUSTMENT;")
+        conn.execute("DELETE FROM PAYROLL_RECORD WHERE Employee_Id = 4506;")
+    _assert_reports_match(summaries)
+
+
+def test_leave_and_adjustment_changes_reach_the_summaries(summaries):
+    with summaries.write() as conn:
+        conn.execute("""INSERT INTO LEAVE (Leave_Id, Employee_Id, Leave_Type, Request_Status, Request_Date,
+                        Start_Date, End_Date) VALUES (1, 4515, 'Sick', 'Approved', '2026-02-01', '2026-02-02', '2026-02-03');""")
+        conn.execute("UPDATE LEAVE SET Request_Status = 'Denied' WHERE Leave_Id = 86742;")
+        conn.execute("UPDATE LEAVE SET Request_Status = 'Approved' WHERE Leave_Id = 283357;")
+        (record,) = conn.execute("SELECT Payroll_Record_Id FROM PAYROLL_RECORD LIMIT 1;").fetchone()
+        conn.execute("INSERT INTO ADJUSTMENT (Adjustment_Id, Adjustment_Type, Payroll_Record_Id, Amount) "
+                     "VALUES (9000, 'Overtime', ?, 100);", (record,))
+        conn.execute("UPDATE ADJUSTMENT SET Adjustment_Type = 'Tax' WHERE Adjustment_Id = 9000;")
+    _assert_reports_match(summaries)
+    with summaries.write() as conn:
+        conn.execute("DELETE FROM LEAVE WHERE Employee_Id = 4515;")
+        conn.execute("DELETE FROM ADJUSTMENT WHERE Adjustment_Id = 9000;")
+    _assert_reports_match(summaries)
+
+
+def test_rebuild_repairs_summaries_changed_behind_the_triggers(summaries):
+    with summaries.write() as conn:
+        conn.execute("DELETE FROM RPT_EMPLOYEE_PAY;")
+    assert _rows("net_pay", False, summaries) != _rows("net_pay", True, summaries)
+    with summaries.write() as conn:
+        conn.execute("BEGIN;")
+        reports.rebuild(conn)
+    _assert_reports_match(summaries)
@@ -0,0 +1,66 @@
+import pytest
+
+import row_model
+
+
+@pytest.fixture
+def records(database):
+    # 60 payroll records with repeated and missing Net_Pay values
+    with database.write() as conn:
+        conn.executemany(
+            "INSERT INTO PAYROLL_RECORD (Payroll_Record_Id, Employee_Id, Payroll_Period_Id, Gross_Pay, Net_Pay) "
+            "VALUES (?, NULL, ?, ?, ?);",
+            [(1000 + i, i % 3, 100.0 + i, None if i % 7 == 0 else (i * 37) % 11) for i in range(60)])
+    row_model.reset_cursors()
+    return database
+
+
+def _walk(pool, request: dict, block: int = 7):
+    rows, start = [], 0
+    while True:
+        got = row_model.get_rows("PAYROLL_RECORD", {**request, "startRow": start, "endRow": start + block}, pool)
+        rows.extend(got["rowData"])
+        start += block
+        if len(got["rowData"]) < block:
+            return rows, got["rowCount"]
+
+
+def test_keyset_blocks_match_a_full_sort(records):
+    request = {"sortModel": [{"colId": "Net_Pay", "sort": "desc"}], "filterModel": {}}
+    rows, count = _walk(records, request)
+    with records.read() as conn:
+        expected = [r[0] for r in conn.execute(
+            "SELECT Payroll_Record_Id FROM PAYROLL_RECORD ORDER BY Net_Pay DESC, Payroll_Record_Id;")]
+    assert [r["Payroll_Record_Id"] for r in rows] == expected
+    assert count == len(expected)
+
+
+def test_later_blocks_seek_from_the_remembered_key(records):
+    request = {"sortModel": [{"colId": "Net_Pay", "sort": "asc"}], "filterModel": {}}
+    first = row_model.get_rows("PAYROLL_RECORD", {**request, "startRow": 0, "endRow": 10}, records)
+    statements = []
+    import db
+    db.statement_listeners.append(statements.append)
+    try:
+        second = row_model.get_rows("PAYROLL_RECORD", {**request, "startRow": 10, "endRow": 20}, records)
+    finally:
+        db.statement_listeners.remove(statements.append)
+    select = [s for s in statements if s.startswith("SELECT") and "LIMIT" in s][-1]
+    assert "OFFSET 0" in select
+    ids = [r["Payroll_Record_Id"] for r in first["rowData"] + second["rowData"]]
+    assert len(set(ids)) == 20
+
+
+def test_filter_runs_in_sql(records):
+    request = {"sortModel": [], "filterModel": {"Payroll_Period_Id": {"filterType": "number", "type": "equals", "filter": 1}}}
+    rows, count = _walk(records, request)
+    assert rows and all(r["Payroll_Period_Id"] == 1 for r in rows)
+    assert count == len(rows)
+
+
+def test_infinite_grid_is_read_only_without_write_through(database):
+    app = pytest.importorskip("app")
+    if app.WRITE_THROUGH:
+        pytest.skip("GRID_EDIT_MODE=writethrough")
+    grid = app.make_infinite_grid("EMPLOYEE", "emp-grid")
+    assert grid.columnDefs and not any(c["editable"] for c in grid.columnDefs)
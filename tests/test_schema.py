@@ -0,0 +1,39 @@
+import re
+
+import pytest
+
+import schema
+
+
+def _defs(table_name, **kwargs):
+    return {d["field"]: d for d in schema.column_defs(schema.cache.table(table_name), **kwargs)}
+
+
+def test_column_types_follow_the_schema(database):
+    defs = _defs("LEAVE")
+    assert defs["Leave_Id"]["cellDataType"] == "number"
+    assert defs["Start_Date"]["cellDataType"] == "dateString"
+    assert defs["Leave_Type"]["cellEditor"] == "agSelectCellEditor"
+    assert defs["Leave_Type"]["cellEditorParams"]["values"] == [None, "Paid", "Unpaid", "Sick"]
+
+
+def test_dates_that_are_not_iso_are_shown_as_text(database):
+    assert _defs("LEAVE", text_dates=["Start_Date"])["Start_Date"]["cellDataType"] == "text"
+
+
+def test_populate_stores_iso_dates(database):
+    for table in schema.cache.tables().values():
+        dates = [c.name for c in table.columns.values() if c.kind == "date"]
+        with database.read() as conn:
+            for col in dates:
+                for (value,) in conn.execute(f"SELECT {col} FROM {table.name} WHERE {col} IS NOT NULL;"):
+                    assert re.fullmatch(r"\d{4}-\d{2}-\d{2}", value), (table.name, col, value)
+
+
+def test_grids_only_use_date_cells_for_iso_columns(database):
+    app = pytest.importorskip("app")
+    table = schema.cache.table("LEAVE")
+    assert app.non_iso_dates(table, app.read_table("LEAVE")) == []
+    with database.write() as conn:
+        conn.execute("UPDATE LEAVE SET End_Date = '25-05-20' WHERE Leave_Id = 86742;")
+    assert app.non_iso_dates(table, app.read_table("LEAVE")) == ["End_Date"]
@@ -0,0 +1,89 @@
+import pytest
+
+import search
+
+
+@pytest.fixture
+def index(database):
+    assert search.ensure(database) == "installed"
+    return database
+
+
+def _hits(text, pool, **kwargs):
+    return [(r["table"], r["id"]) for r in search.search(text, pool=pool, **kwargs)["results"]]
+
+
+def test_terms_are_lowercase_prefix_words():
+    assert search.terms("Pri, COO-k") == ["pri", "coo", "k"]
+    assert search.terms(None) == [] and search.terms("  ") == []
+
+
+def test_every_word_has_to_match_as_a_prefix(index):
+    assert _hits("ali coo", index) == [("EMPLOYEE", 4507)]
+    assert _hits("alice smith", index) == []
+    assert search.search("", pool=index)["results"] == []
+
+
+def test_the_rowid_packs_table_code_and_primary_key(index):
+    with index.read() as conn:
+        rowids = {r for (r,) in conn.execute("SELECT rowid FROM SEARCH_INDEX;")}
+        counts = {t: conn.execute(f"SELECT count(*) FROM {t};").fetchone()[0] for t in search.SOURCES}
+    assert len(rowids) == sum(counts.values())
+    assert 4506 * 8 + search.SOURCES["EMPLOYEE"][0] in rowids
+    assert 86742 * 8 + search.SOURCES["LEAVE"][0] in rowids
+    assert {search.TABLE_CODES[r & 7] for r in rowids} == set(search.SOURCES)
+
+
+def test_name_matches_rank_above_job_title_matches(index):
+    with index.write() as conn:
+        conn.execute("INSERT INTO DEPARTMENT (Department_Id, Department_Name) VALUES (5, 'Consulting');")
+    hits = _hits("consult", index)
+    assert hits[0] == ("DEPARTMENT", 5)
+    assert sorted(hits[1:]) == [("EMPLOYEE", 4508), ("EMPLOYEE", 4513), ("EMPLOYEE", 4515)]
+
+
+def test_triggers_keep_the_index_current(index):
+    with index.write() as conn:
+        conn.execute("INSERT INTO EMPLOYEE (Employee_Id, Department_Id, First_Name, Last_Name, Bank_Account) "
+                     "VALUES (9001, 1, 'Zelda', 'Quark', 9001);")
+    assert _hits("zelda", index) == [("EMPLOYEE", 9001)]
+    with index.write() as conn:
+        conn.execute("UPDATE EMPLOYEE SET First_Name = 'Yara' WHERE Employee_Id = 9001;")
+    assert _hits("zelda", index) == [] and _hits("yara", index) == [("EMPLOYEE", 9001)]
+    # a new primary key moves the entry to a new rowid
+    with index.write() as conn:
+        conn.execute("UPDATE EMPLOYEE SET Employee_Id = 9002 WHERE Employee_Id = 9001;")
+    assert _hits("yara quark", index) == [("EMPLOYEE", 9002)]
+    with index.write() as conn:
+        conn.execute("DELETE FROM EMPLOYEE WHERE Employee_Id = 9002;")
+    assert _hits("yara", index) == []
+
+
+def test_searches_over_the_rank_limit_are_not_ranked(index, monkeypatch):
+    monkeypatch.setattr(search, "RANK_LIMIT", 3)
+    found = search.search("consultant", page_size=2, pool=index)
+    assert found["more"] is False and found["total"] == 3
+    with index.write() as conn:
+        conn.execute("UPDATE EMPLOYEE SET Job_Title = 'Consultant' WHERE Employee_Id = 4506;")
+    found = search.search("consultant", page_size=2, pool=index)
+    assert found["more"] is True and found["total"] == 3 and found["pages"] == 2
+    # listed in index (rowid) order, only the first RANK_LIMIT can be paged through
+    second = search.search("consultant", page=5, page_size=2, pool=index)
+    assert second["page"] == 2 and [r["id"] for r in found["results"] + second["results"]] == [4506, 4508, 4513]
+
+
+def test_labels_mark_the_matched_words(index):
+    [result] = search.search("shel", pool=index)["results"]
+    assert search.label_parts(result["label"])[0] == ("Shelly", True)
+    assert search.label_parts(f"a {search.MATCH_START}b{search.MATCH_END} c") == [("a ", False), ("b", True), (" c", False)]
+
+
+def test_ensure_drops_the_index_with_its_tables(index):
+    assert search.ensure(index) is None
+    with index.write() as conn:
+        conn.execute("PRAGMA foreign_keys = OFF;")
+        conn.execute("DROP TABLE ADJUSTMENT;")
+        conn.execute("PRAGMA foreign_keys = ON;")
+    assert search.ensure(index) == "dropped"
+    with index.read() as conn:
+        assert not conn.execute("SELECT 1 FROM sqlite_master WHERE name LIKE 'SEARCH%';").fetchall()
@@ -0,0 +1,49 @@
+import sql_loader
+from conftest import rows_by_key
+
+EMPLOYEE_SQL = ("INSERT INTO EMPLOYEE (Employee_Id, Department_Id, First_Name, Bank_Account) "
+                "VALUES ({id}, {dep}, 'Test', {id});")
+
+
+def test_split_statements_ignores_semicolons_in_strings_and_comments():
+    text = "INSERT INTO T VALUES ('a;b'); -- c;d\nSELECT 1; /* e; */ SELECT 2"
+    assert sql_loader.split_statements(text) == [
+        "INSERT INTO T VALUES ('a;b')", "-- c;d\nSELECT 1", "/* e; */ SELECT 2"]
+
+
+def test_inserts_are_batched(database):
+    text = "\n".join(EMPLOYEE_SQL.format(id=9000 + i, dep=1) for i in range(50))
+    errors, stats = sql_loader.load_sql(text, pool=database)
+    assert errors == []
+    assert stats == {"statements": 50, "batches": 1, "rows": 50}
+    assert len([k for k in rows_by_key(database, "EMPLOYEE", "Employee_Id") if k >= 9000]) == 50
+
+
+def test_a_failing_statement_is_reported_and_the_rest_loaded(database):
+    text = "\n".join([EMPLOYEE_SQL.format(id=9001, dep=1), EMPLOYEE_SQL.format(id=9002, dep=99),
+                      EMPLOYEE_SQL.format(id=9003, dep=2)])
+    errors, _ = sql_loader.load_sql(text, pool=database)
+    assert len(errors) == 1 and errors[0].startswith("Stmt #2 error: FOREIGN KEY")
+    employees = rows_by_key(database, "EMPLOYEE", "Employee_Id")
+    assert 9001 in employees and 9003 in employees and 9002 not in employees
+
+
+def test_deferred_load_accepts_forward_references_and_skips_orphans(database):
+    text = "\n".join([EMPLOYEE_SQL.format(id=9001, dep=50),
+                      "INSERT INTO DEPARTMENT (Department_Id, Department_Name) VALUES (50, 'Later');",
+                      EMPLOYEE_SQL.format(id=9002, dep=99)])
+    errors, _ = sql_loader.load_sql(text, pool=database, defer_foreign_keys=True)
+    assert len(errors) == 1 and "EMPLOYEE" in errors[0] and "skipped" in errors[0]
+    employees = rows_by_key(database, "EMPLOYEE", "Employee_Id")
+    assert 9001 in employees and 9002 not in employees
+
+
+def test_deferred_load_never_deletes_existing_rows(database):
+    before = rows_by_key(database, "EMPLOYEE", "Employee_Id")
+    department = next(iter(before.values()))["Department_Id"]
+    text = f"DELETE FROM DEPARTMENT WHERE Department_Id = {department};\n" + EMPLOYEE_SQL.format(id=9001, dep=1)
+    errors, _ = sql_loader.load_sql(text, pool=database, defer_foreign_keys=True)
+    assert any("not loaded by this script" in e for e in errors)
+    assert errors[-1].startswith("Load rolled back")
+    assert rows_by_key(database, "EMPLOYEE", "Employee_Id") == before
+    assert department in rows_by_key(database, "DEPARTMENT", "Department_Id")
@@ -0,0 +1,13 @@
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+
+# Importing the app must not pull in the heavy data modules (they are imported on first use)
+def test_app_import_does_not_load_pandas_or_numpy():
+    out = subprocess.run(
+        [sys.executable, "-c", "import sys, app; print(sorted(m for m in ('pandas', 'numpy', 'pyarrow') if m in sys.modules))"],
+        cwd=ROOT, capture_output=True, text=True, check=True, env=os.environ.copy())
+    assert out.stdout.strip().splitlines()[-1] == "[]"
@@ -0,0 +1,59 @@
+import io
+
+import pytest
+
+import table_io
+from conftest import rows_by_key
+
+
+def _employees(pool):
+    return rows_by_key(pool, "EMPLOYEE", "Employee_Id")
+
+
+def _clear_employees(pool):
+    with pool.write() as conn:
+        for table in ("ADJUSTMENT", "PAYROLL_RECORD", "LEAVE", "EMPLOYEE"):
+            conn.execute(f"DELETE FROM {table};")
+
+
+def test_csv_export_and_import_round_trip(database, tmp_path):
+    before = _employees(database)
+    path = str(tmp_path / "employees.csv")
+    assert table_io.export_table("EMPLOYEE", path, pool=database, chunk_rows=3) == len(before)
+    _clear_employees(database)
+    errors, stats = table_io.import_table("EMPLOYEE", path, pool=database, chunk_rows=3, analyze=False)
+    assert errors == []
+    assert stats == {"rows": len(before), "inserted": len(before), "failed": 0, "chunks": 4}
+    assert _employees(database) == before
+
+
+def test_csv_import_skips_and_reports_bad_rows(database):
+    source = io.StringIO("Employee_Id,Department_Id,Bank_Account\n9001,1,1\n9002,99,2\n9003,2,3\n9004,1,1\n")
+    errors, stats = table_io.import_table("EMPLOYEE", source, "csv", pool=database, chunk_rows=2, analyze=False)
+    assert [e.split(":")[0] for e in errors] == ["Chunk 1, row 2", "Chunk 2, row 4"]
+    assert "FOREIGN KEY" in errors[0] and "UNIQUE" in errors[1]
+    assert stats["inserted"] == 2 and stats["failed"] == 2
+    employees = _employees(database)
+    assert 9001 in employees and 9003 in employees and 9002 not in employees and 9004 not in employees
+
+
+def test_import_of_unknown_columns_is_refused(database):
+    errors, stats = table_io.import_table("EMPLOYEE", io.StringIO("Employee_Id,Salary\n1,2\n"), "csv", pool=database)
+    assert errors == ["EMPLOYEE has no column(s) 'Salary'; nothing imported"] and stats["inserted"] == 0
+
+
+def test_parquet_round_trip_with_a_mixed_text_and_integer_column(database, tmp_path):
+    pytest.importorskip("pyarrow")
+    with database.write() as conn:
+        # DATE has numeric affinity: an integer date stays an integer next to the text dates
+        conn.execute("INSERT INTO EMPLOYEE (Employee_Id, Department_Id, First_Name, Hire_Date, Bank_Account) "
+                     "VALUES (9001, 1, 'Test', 20240101, 9001);")
+    before = _employees(database)
+    path = str(tmp_path / "employees.parquet")
+    assert table_io.export_table("EMPLOYEE", path, pool=database, chunk_rows=4) == len(before)
+    _clear_employees(database)
+    errors, stats = table_io.import_table("EMPLOYEE", path, pool=database, chunk_rows=4, analyze=False)
+    assert errors == [] and stats["inserted"] == len(before)
+    # the integer date was written as text and numeric affinity turns it back into an integer
+    assert _employees(database) == before
+    assert before[9001]["Hire_Date"] == 20240101
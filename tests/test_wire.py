@@ -0,0 +1,32 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+import wire
+
+
+def test_encode_decode_round_trip():
+    df = pd.DataFrame({
+        "Id": [1, 2, 3, 4],
+        "Pay": [10.5, None, 3.0, 4.25],
+        "Type": ["Sick", "Paid", None, "Sick"],
+        "Email": ["a@x", "b@x", "c@x", "d@x"],
+    })
+    payload = wire.encode_frame(df)
+    assert payload["rows"] == 4
+    # few distinct values: dictionary encoded, -1 is null
+    assert payload["columns"]["Type"] == {"values": ["Sick", "Paid"], "codes": [0, 1, -1, 0]}
+    # all distinct: sent as a plain array
+    assert payload["columns"]["Email"] == ["a@x", "b@x", "c@x", "d@x"]
+    assert wire.decode(payload) == [
+        {"Id": 1, "Pay": 10.5, "Type": "Sick", "Email": "a@x"},
+        {"Id": 2, "Pay": None, "Type": "Paid", "Email": "b@x"},
+        {"Id": 3, "Pay": 3.0, "Type": None, "Email": "c@x"},
+        {"Id": 4, "Pay": 4.25, "Type": "Sick", "Email": "d@x"},
+    ]
+
+
+def test_empty_frame():
+    payload = wire.encode_frame(pd.DataFrame({"Id": []}))
+    assert payload == {"rows": 0, "columns": {"Id": []}}
+    assert wire.decode(payload) == []
@@ -0,0 +1,317 @@
+import cProfile
+import contextvars
+import functools
+import io
+import pstats
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import db
+
+'''
+-- REQUEST TRACING, METRICS AND PROFILING -- :
+1. Every Dash callback request (POST /_dash-update-component) is traced. The action is the input that
+   fired it (e.g. "emp-add-row-button.n_clicks"); spans inside the request time the hot paths:
+       callback      the callback function itself (@traced)
+       sql           query + fetch, with the rows read (read_table, row_model, reports)
+       dataframe     rows -> DataFrame
+       to_records    DataFrame -> rowData (to_dict("records"))
+       make_grid     building the AgGrid component
+   What the request took beyond its callback is Dash dispatch, mostly JSON serialization of the outputs.
+   The response carries a Server-Timing header with the spans (shown in the browser's network panel).
+2. SQLite statements on pooled read connections are timed through the connection trace callback: a
+   statement runs until the next one starts on the same thread or the enclosing span ends. The progress
+   handler counts virtual machine steps (in units of db.PROGRESS_STEPS), a measure of the work a query did.
+3. Durations, rows, payload bytes and VM steps are aggregated in `metrics` and served at /metrics in the
+   Prometheus text format. They are per worker process: background jobs (Drop / Create / Populate, Commit,
+   Run Payroll) run in their own process and only the request that starts or polls them is counted.
+4. Profiling: a request sent with the PROFILE_COOKIE cookie runs under pyinstrument (if installed, else
+   cProfile); the report is kept in `profiles` (served at /profiles/latest) and the cookie is cleared, so
+   exactly the next action is profiled. One request is profiled at a time.
+'''
+
+# Histogram bucket upper bounds
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+# Requests traced (Dash callbacks; background jobs are polled with ?cacheKey=...)
+TRACED_PATH = "/_dash-update-component"
+
+# Cookie set by the UI to profile the next callback request
+PROFILE_COOKIE = "payroll_profile"
+
+# Profile reports kept, and lines of a cProfile report
+MAX_PROFILES = 10
+PROFILE_LINES = 60
+
+METRIC_HELP = {
+    "payroll_request_seconds": ("histogram", "Duration of Dash callback requests"),
+    "payroll_response_bytes": ("histogram", "Size of Dash callback responses"),
+    "payroll_span_seconds": ("histogram", "Time spent in instrumented code paths"),
+    "payroll_rows_read_total": ("counter", "Rows read from SQLite"),
+    "payroll_sqlite_statement_seconds": ("histogram", "Duration of SQLite statements on read connections"),
+    "payroll_sqlite_vm_steps_total": ("counter", "SQLite virtual machine steps on read connections"),
+}
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _label_text(labels: tuple, le: str = None):
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+# Counters and histograms keyed by (metric name, labels)
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name: str, value: float, buckets: tuple = SECONDS_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    # Prometheus text exposition; extra is a list of (name, type, help, value) read at scrape time
+    def render(self, extra: list = ()):
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            counters = sorted(self._counters.items(), key=lambda item: item[0])
+            snapshot = [(key, h.buckets, list(h.counts), h.count, h.sum) for key, h in histograms]
+        described = set()
+
+        def describe(name: str, kind: str, text: str):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), buckets, counts, count, total in snapshot:
+            describe(name, *METRIC_HELP.get(name, ("histogram", name)))
+            cumulative = 0
+            for bound, n in zip(buckets, counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_label_text(labels, bound)} {cumulative}")
+            lines.append(f"{name}_bucket{_label_text(labels, '+Inf')} {count}")
+            lines.append(f"{name}_sum{_label_text(labels)} {total}")
+            lines.append(f"{name}_count{_label_text(labels)} {count}")
+        for (name, labels), value in counters:
+            describe(name, *METRIC_HELP.get(name, ("counter", name)))
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        for name, kind, text, value in extra:
+            describe(name, kind, text)
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared metrics of this worker
+metrics = Metrics()
+
+
+# One traced request: its action and the spans finished so far
+class Trace:
+    def __init__(self, action: str):
+        self.action = action
+        self.start = time.perf_counter()
+        self.spans = []          # (name, source, seconds)
+        self.statement = None    # (kind, start) of the SQLite statement running on this request's thread
+        self.profiler = None
+
+
+_current = contextvars.ContextVar("trace", default=None)
+
+
+# A timed section; set .rows to count the rows it read
+class Span:
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self.source = source
+        self.rows = None
+        self.seconds = 0.0
+
+
+@contextmanager
+def span(name: str, source: str = ""):
+    s = Span(name, source)
+    start = time.perf_counter()
+    try:
+        yield s
+    finally:
+        s.seconds = time.perf_counter() - start
+        trace = _current.get()
+        action = trace.action if trace is not None else ""
+        if trace is not None:
+            _close_statement(trace)
+            trace.spans.append((name, source, s.seconds))
+        metrics.observe("payroll_span_seconds", s.seconds, span=name, source=source, action=action)
+        if s.rows is not None:
+            metrics.inc("payroll_rows_read_total", s.rows, span=name, source=source)
+
+
+# Decorator: time a callback function as a "callback" span
+def traced(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span("callback", func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _close_statement(trace: Trace):
+    if trace.statement is not None:
+        kind, start = trace.statement
+        trace.statement = None
+        metrics.observe("payroll_sqlite_statement_seconds", time.perf_counter() - start, statement=kind, action=trace.action)
+
+
+# db.statement_listeners: a new statement ends the previous one (statements outside requests are not timed)
+def _on_statement(sql: str):
+    trace = _current.get()
+    if trace is None:
+        return
+    _close_statement(trace)
+    trace.statement = ((sql.split(None, 1) or ["?"])[0].upper(), time.perf_counter())
+
+
+# db.progress_listeners: called every db.PROGRESS_STEPS virtual machine steps
+def _on_progress():
+    trace = _current.get()
+    if trace is not None:
+        metrics.inc("payroll_sqlite_vm_steps_total", db.PROGRESS_STEPS, action=trace.action)
+
+
+db.statement_listeners.append(_on_statement)
+db.progress_listeners.append(_on_progress)
+
+
+# ---- profiling ----
+
+# Latest profile reports: {"id", "action", "ms", "profiler", "content_type", "report"}
+profiles = deque(maxlen=MAX_PROFILES)
+_profiling = threading.Lock()
+
+
+def _start_profiler():
+    if not _profiling.acquire(blocking=False):
+        # another request is being profiled
+        return None
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    profiler = Profiler()
+    profiler.start()
+    return profiler
+
+
+def _stop_profiler(profiler, action: str, seconds: float):
+    try:
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+            name, content_type, report = "cProfile", "text/plain", out.getvalue()
+        else:
+            profiler.stop()
+            name, content_type, report = "pyinstrument", "text/html", profiler.output_html()
+    finally:
+        _profiling.release()
+    profiles.append({"id": uuid.uuid4().hex[:8], "action": action, "ms": round(seconds * 1000, 1),
+                     "profiler": name, "content_type": content_type, "report": report})
+
+
+# ---- Flask request hooks ----
+
+def _request_action(request):
+    body = request.get_json(silent=True) or {}
+    action = ",".join(body.get("changedPropIds") or []) or body.get("output", "")
+    if "cacheKey" in request.args:
+        action += " (poll)"
+    return action
+
+
+# Trace Dash callback requests on a Flask server (and profile the one the UI asked for)
+def install(server):
+    from flask import request
+
+    @server.before_request
+    def start_trace():
+        if request.path != TRACED_PATH or request.method != "POST":
+            return
+        trace = Trace(_request_action(request))
+        if request.cookies.get(PROFILE_COOKIE) and "cacheKey" not in request.args:
+            trace.profiler = _start_profiler()
+        _current.set(trace)
+
+    @server.after_request
+    def finish_trace(response):
+        trace = _current.get()
+        if trace is None:
+            return response
+        _close_statement(trace)
+        seconds = time.perf_counter() - trace.start
+        if trace.profiler is not None:
+            _stop_profiler(trace.profiler, trace.action, seconds)
+            trace.profiler = None
+            response.delete_cookie(PROFILE_COOKIE)
+        size = response.calculate_content_length() or 0
+        metrics.observe("payroll_request_seconds", seconds, action=trace.action)
+        metrics.observe("payroll_response_bytes", size, BYTES_BUCKETS, action=trace.action)
+        # Server-Timing: total time per span name, and the rest of the request
+        totals = {}
+        for name, _, s in trace.spans:
+            totals[name] = totals.get(name, 0.0) + s
+        callback = totals.get("callback", seconds)
+        timings = [f"{name};dur={s * 1000:.1f}" for name, s in totals.items()]
+        timings.append(f"dispatch;desc=\"dash + json\";dur={max(seconds - callback, 0) * 1000:.1f}")
+        timings.append(f"total;dur={seconds * 1000:.1f}")
+        response.headers.add("Server-Timing", ", ".join(timings))
+        return response
+
+    @server.teardown_request
+    def end_trace(exc):
+        trace = _current.get()
+        if trace is not None and trace.profiler is not None:
+            # the request failed before after_request
+            _stop_profiler(trace.profiler, trace.action, time.perf_counter() - trace.start)
+        _current.set(None)
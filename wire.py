@@ -0,0 +1,94 @@
+'''
+-- COLUMNAR GRID PAYLOADS -- :
+With GRID_WIRE_FORMAT=columnar the grids' rows are not sent as df.to_dict("records") (every column name
+repeated in every row, every cell converted to a Python object one at a time) but as one array per column:
+
+    {"rows": 3, "columns": {"Employee_Id": [1, 2, 3],
+                            "Leave_Type": {"values": ["Paid", "Sick"], "codes": [0, 1, 0]}}}
+
+1. Numeric columns are converted with ndarray.tolist() (one C loop per column); NaN becomes null.
+2. Text columns with few distinct values (Job_Title, Leave_Type, Request_Status, dates, ...) are dictionary
+   encoded: the distinct values once, then an integer code per row (-1 = null). A column is encoded when it
+   has at most DICT_RATIO distinct values per row, otherwise it is sent as a plain array.
+3. The payload goes into a dcc.Store next to the grid; DECODE_JS (a clientside callback) rebuilds the row
+   objects in the browser and sets the grid's rowData, so the grid works exactly as with records.
+'''
+
+# Dictionary-encode a text column when distinct values / rows is at most this
+DICT_RATIO = 0.5
+
+
+# Values of one column as a JSON-ready list (NaN / None -> null)
+def _plain(column):
+    import numpy as np
+    values = column.to_numpy()
+    if values.dtype.kind == "f":
+        out = values.tolist()
+        if np.isnan(values).any():
+            out = [None if v != v else v for v in out]
+        return out
+    if values.dtype.kind in "iub":
+        return values.tolist()
+    return [None if v is None or v != v else v for v in values.tolist()]
+
+
+# Columnar payload of a DataFrame (see the module notes)
+def encode_frame(df, dict_ratio: float = DICT_RATIO):
+    import pandas as pd
+    n = len(df)
+    columns = {}
+    for name in df.columns:
+        column = df[name]
+        if not pd.api.types.is_numeric_dtype(column.dtype) and n:
+            codes, uniques = pd.factorize(column, use_na_sentinel=True)
+            if len(uniques) <= n * dict_ratio:
+                columns[name] = {"values": list(uniques), "codes": codes.tolist()}
+                continue
+        columns[name] = _plain(column)
+    return {"rows": n, "columns": columns}
+
+
+# Rows of a columnar payload (what DECODE_JS builds in the browser)
+def decode(payload: dict):
+    names = list(payload["columns"])
+    columns = []
+    for name in names:
+        column = payload["columns"][name]
+        if isinstance(column, dict):
+            values = column["values"]
+            column = [values[k] if k >= 0 else None for k in column["codes"]]
+        columns.append(column)
+    return [dict(zip(names, row)) for row in zip(*columns)] if names else [{} for _ in range(payload["rows"])]
+
+
+# Clientside callback: columnar payload (store data) -> the grid's rowData
+DECODE_JS = """
+function (payload) {
+    if (!payload) {
+        return window.dash_clientside.no_update;
+    }
+    const names = Object.keys(payload.columns);
+    const n = payload.rows;
+    const columns = names.map(function (name) {
+        const column = payload.columns[name];
+        if (Array.isArray(column)) {
+            return column;
+        }
+        // dictionary encoded: code per row into the distinct values, -1 is null
+        const values = column.values, codes = column.codes, out = new Array(n);
+        for (let i = 0; i < n; i++) {
+            out[i] = codes[i] < 0 ? null : values[codes[i]];
+        }
+        return out;
+    });
+    const rows = new Array(n);
+    for (let i = 0; i < n; i++) {
+        const row = {};
+        for (let j = 0; j < names.length; j++) {
+            row[names[j]] = columns[j][i];
+        }
+        rows[i] = row;
+    }
+    return rows;
+}
+"""